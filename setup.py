@@ -11,16 +11,20 @@ setup(
     author_email='ebtingey@byu.edu',
     url='https://github.com/byuflowlab/vawt-wake-model',
     package_dir={'': 'wake_model'},
-    py_modules=['vawtwake'],
+    py_modules=['vawtwake','VAWT_Wake_Model','vawt_backend','_vawtnumpy'],
     test_suite='test.test.py',
     license='MIT License',
     zip_safe=False
 )
 
-from numpy.distutils.core import setup, Extension
-setup(
-    name='vawtwake',
-    version='2.3.0',
-    package_dir={'': 'wake_model'},
-    ext_modules=[Extension('_vawtwake', ['wake_model/VAWT_Wake_Model.f90'], extra_compile_args=['-O2'])],
-)
+# the Fortran routines are optional: without gfortran the wake model uses the NumPy routines of _vawtnumpy.py
+try:
+    from numpy.distutils.core import setup, Extension
+    setup(
+        name='vawtwake',
+        version='2.3.0',
+        package_dir={'': 'wake_model'},
+        ext_modules=[Extension('_vawtwake', ['wake_model/VAWT_Wake_Model.f90'], extra_compile_args=['-O2'], extra_f90_compile_args=['-fopenmp'], extra_link_args=['-lgomp'])],
+    )
+except (Exception, SystemExit) as e:
+    print('**** _vawtwake could not be built (%s); the NumPy routines of _vawtnumpy.py are used instead ****' % e)
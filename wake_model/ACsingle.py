@@ -12,7 +12,7 @@ from scipy.integrate import quad
 from scipy.optimize import root
 import h5py
 
-import _vawtwake
+from vawt_backend import kernels as _vawtwake
 
 def panelIntegration(xvec,yvec,thetavec,ifunc):
 
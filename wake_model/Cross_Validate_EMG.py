@@ -6,7 +6,7 @@ from sklearn.cross_validation import train_test_split
 from scipy.optimize import curve_fit
 from sys import argv
 
-import _vawtwake
+from vawt_backend import kernels as _vawtwake
 
 def starccm_read_vel(fdata,dia,windd,length):
     start = length/30.
@@ -12,7 +12,7 @@ from sys import argv
 
 from joblib import Parallel, delayed
 
-import _vawtwake
+from vawt_backend import kernels as _vawtwake
 import _bpmvawtacoustic
 
 
@@ -85,7 +85,7 @@ def obj_func(xdict):
         wakex,wakey = vawt_wake(xw,yw,dia,rotw[d],ntheta,chord,B,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m,n)
 
         # calculating power (W)
-        res = Parallel(n_jobs=-1)(delayed(vawt_power)(i,dia,rotw[d],ntheta,chord,H,B,Vinf,af_data,cl_data,cd_data,twist,delta,rho,interp,wakex,wakey) for i in range(nturb) )
+        res = vwm.batch(vawt_power,[(i,dia,rotw[d],ntheta,chord,H,B,Vinf,af_data,cl_data,cd_data,twist,delta,rho,interp,wakex,wakey) for i in range(nturb)])
         for i in range(nturb):
             power_turb[i] = res[i]
         power_dir[d] = np.sum(power_turb)*windFrequencies[d]
@@ -117,34 +117,35 @@ def obj_func(xdict):
 
 def vawt_wake(xw,yw,dia,rotw,ntheta,chord,B,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m,n):
     global wake_method
+    global wake_sample
+    global wakex_buf
+    global wakey_buf
 
     t = np.size(xw) # number of turbines
 
-    for i in range(t):
-        xt = np.delete(xw,i)
-        yt = np.delete(yw,i)
-        diat = np.delete(dia,i)
-        rott = np.delete(rotw,i)
-
-        # xtd = np.delete(xw,i)
-        # ytd = np.delete(yw,i)
-        # diatd = np.delete(dia,i)
-        # rottd = np.delete(rotw,i)
-        # xt,yt,diat,rott = vwm.wake_order(xw[i],yw[i],dia[i],xtd,ytd,diatd,rottd)
-
-        if wake_method == 'simp':
-            wakexd,wakeyd = _vawtwake.overlap(ntheta,xt,yt,diat,rott,chord,B,xw[i],yw[i],dia[i],Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m,n,1,1)
-        elif wake_method == 'gskr':
-            wakexd,wakeyd = vwm.overlap(ntheta,xt,yt,diat,rott,chord,B,xw[i],yw[i],dia[i],Vinf,False)
-
-        if i == 0:
-            wakex = wakexd
-            wakey = wakeyd
-        else:
-            wakex = np.append(wakex,wakexd)
-            wakey = np.append(wakey,wakeyd)
+    if wake_method == 'simp':
+        # wakes around every turbine in one call written into the preallocated arrays
+        # (wake sources calculated once for each turbine type and rotation rate)
+        coef = (coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9)
+        vwm.overlap_farm(xw,yw,dia,rotw,chord,B,Vinf,wakex_buf,wakey_buf,m,n,coef=coef,nsample=wake_sample)
+
+    elif wake_method == 'gskr':
+        for i in range(t):
+            xt = np.delete(xw,i)
+            yt = np.delete(yw,i)
+            diat = np.delete(dia,i)
+            rott = np.delete(rotw,i)
 
-    return wakex,wakey
+            # xtd = np.delete(xw,i)
+            # ytd = np.delete(yw,i)
+            # diatd = np.delete(dia,i)
+            # rottd = np.delete(rotw,i)
+            # xt,yt,diat,rott = vwm.wake_order(xw[i],yw[i],dia[i],xtd,ytd,diatd,rottd)
+
+            wakex_buf[:,i],wakey_buf[:,i] = vwm.overlap(ntheta,xt,yt,diat,rott,chord,B,xw[i],yw[i],dia[i],Vinf,False,nsample=wake_sample)
+
+    # views of the wake arrays with the turbines one after another
+    return wakex_buf.ravel(order='F'),wakey_buf.ravel(order='F')
 
 
 def vawt_power(i,dia,rotw,ntheta,chord,H,B,Vinf,af_data,cl_data,cd_data,twist,delta,rho,interp,wakext,wakeyt):
@@ -158,11 +159,9 @@ def vawt_power(i,dia,rotw,ntheta,chord,H,B,Vinf,af_data,cl_data,cd_data,twist,de
 
     global useAC
 
-    wakex = np.zeros(ntheta)
-    wakey = np.zeros(ntheta)
-    for j in range(ntheta):
-        wakex[j] = wakext[j+ntheta*i]
-        wakey[j] = wakeyt[j+ntheta*i]
+    # wake velocities around turbine i (contiguous views passed to the Fortran without copying)
+    wakex = wakext[ntheta*i:ntheta*(i+1)]
+    wakey = wakeyt[ntheta*i:ntheta*(i+1)]
 
     if useAC == True:
         Cp,_,_,_ = actuatorcylinder(ntheta,af_data,cl_data,cd_data,dia[i]/2.,chord,twist,delta,B,rotw[i],Vinf,rho,interp,wakex,wakey)
@@ -292,6 +291,7 @@ if __name__ == "__main__":
     global thetavec
     global useAC
     global wake_method
+    global wake_sample
 
     # SPLlim = float(argv[1])
     # rotdir_spec = argv[2]
@@ -305,6 +305,7 @@ if __name__ == "__main__":
     ntheta = 72             # number of points around blade flight path
     wake_method = 'simp'    # wake model calculation using Simpson's rule
     wake_method = 'gskr'    # wake model calculation using 21-point Gauss-Kronrod
+    wake_sample = 9         # points first calculated around blade flight path with Fourier interpolation (0 for all)
     nRows = 2               # number of paired group rows
     nCols = 2               # number of paired group columns
 
@@ -431,6 +432,9 @@ if __name__ == "__main__":
     power_iso = (0.5*rho*Vinf**3)*(dia[0]*H)*Cp_iso # isolated power of a single turbine (W)
     power_iso_tot = power_iso*nturb # total power of isolated turbines (W)
 
+    # preallocating the wake velocities around each turbine (reused by every wind direction and iteration)
+    wakex_buf,wakey_buf = vwm.wake_buffers(nturb,ntheta)
+
     # option to use actuator cylinder or not (use a correction factor method)
     useAC = True
     useAC = False
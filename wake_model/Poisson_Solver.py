@@ -10,7 +10,7 @@ from VAWT_Wake_Model import velocity_field,coef_val
 from matplotlib import rcParams
 rcParams['font.family'] = 'Times New Roman'
 
-import _vawtwake
+from vawt_backend import kernels as _vawtwake
 
 def _parameterval(tsr,sol,coef):
     """
@@ -10,7 +10,7 @@ import time,sys
 from matplotlib import rcParams
 rcParams['font.family'] = 'Times New Roman'
 
-import _vawtwake
+from vawt_backend import kernels as _vawtwake
 
 # Progress bar for plotting
 def progress_bar(percent,tasks,runtime):
@@ -199,6 +199,13 @@ elif method == 'coupled_vawt_power':
     elif rotdir == 'counter':
         rot2 = -rot
 
+    # preallocated turbine arrays and wake velocities around both turbines (written in place for each position)
+    xf = np.zeros(2)
+    yf = np.zeros(2)
+    diaf = np.array([dia,dia])
+    rotf = np.array([rot1,rot2])
+    wakexf,wakeyf = vwm.wake_buffers(2,ntheta)
+
     iter = 0
     time0 = time.time()
     for i in range(nR):
@@ -211,8 +218,11 @@ elif method == 'coupled_vawt_power':
             Y[i,j] = centerY
 
             if int_type == 'simp':
-                wakex1,wakey1 = _vawtwake.overlap(ntheta,np.array([centerX]),np.array([centerY]),np.array([dia]),np.array([rot2]),chord,B,0.,0.,dia,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m,n,1,1)
-                wakex2,wakey2 = _vawtwake.overlap(ntheta,np.array([0.]),np.array([0.]),np.array([dia]),np.array([rot1]),chord,B,centerX,centerY,dia,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m,n,1,1)
+                xf[1] = centerX
+                yf[1] = centerY
+                vwm.overlap_farm(xf,yf,diaf,rotf,chord,B,Vinf,wakexf,wakeyf,m,n)
+                wakex1,wakey1 = wakexf[:,0],wakeyf[:,0]
+                wakex2,wakey2 = wakexf[:,1],wakeyf[:,1]
             elif int_type == 'gskr':
                 wakex1,wakey1 = vwm.overlap(ntheta,np.array([centerX]),np.array([centerY]),np.array([dia]),np.array([rot2]),chord,B,0.,0.,dia,Vinf,False)
                 wakex2,wakey2 = vwm.overlap(ntheta,np.array([0.]),np.array([0.]),np.array([dia]),np.array([rot1]),chord,B,centerX,centerY,dia,Vinf,False)
@@ -370,6 +380,11 @@ elif method == 'polar_power':
 
     if calculate == True:
         print '---Calculating values for polar plot---'
+        xf = np.zeros(2)
+        yf = np.zeros(2)
+        diaf = np.array([dia,dia])
+        rotf = np.array([rot1,rot2])
+        wakexf,wakeyf = vwm.wake_buffers(2,ntheta)
         time0 = time.time()
         for i in range(np.size(theta_mod)):
             dia_sep = 2.0 # diameter separation
@@ -379,8 +394,11 @@ elif method == 'polar_power':
             y2 = dia_sep*sin(theta_mod[i])
 
             if int_type == 'simp':
-                wakex1,wakey1 = _vawtwake.overlap(ntheta,np.array([x2]),np.array([y2]),np.array([dia]),np.array([rot2]),chord,B,x1,y1,dia,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m,n,1,1)
-                wakex2,wakey2 = _vawtwake.overlap(ntheta,np.array([x1]),np.array([y1]),np.array([dia]),np.array([rot1]),chord,B,x2,y2,dia,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m,n,1,1)
+                xf[:] = [x1,x2]
+                yf[:] = [y1,y2]
+                vwm.overlap_farm(xf,yf,diaf,rotf,chord,B,Vinf,wakexf,wakeyf,m,n)
+                wakex1,wakey1 = wakexf[:,0],wakeyf[:,0]
+                wakex2,wakey2 = wakexf[:,1],wakeyf[:,1]
             elif int_type == 'gskr':
                 wakex1,wakey1 = vwm.overlap(ntheta,np.array([x2]),np.array([y2]),np.array([dia]),np.array([rot2]),chord,B,x1,y1,dia,Vinf,False)
                 wakex2,wakey2 = vwm.overlap(ntheta,np.array([x1]),np.array([y1]),np.array([dia]),np.array([rot1]),chord,B,x2,y2,dia,Vinf,False)
@@ -437,20 +455,31 @@ elif method == 'velocity_overlap':
     P = np.zeros((N,N))
     iter = 0
     time0 = time.time()
-    for i in range(N):
-        for j in range(N):
-            if int_type == 'simp':
-                veleffpx,veleffpy = _vawtwake.overlap(ntheta,xt,yt,diat,np.ones_like(xt)*rot,chord,B,X[i,j],Y[i,j],dia,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,220,200,1,0)
-            elif int_type == 'gskr':
+    if int_type == 'simp':
+        # velocity map of each wake by FFT convolution (combined with the sum of squares of velocity deficits)
+        intex = np.zeros((N,N))
+        intey = np.zeros((N,N))
+        for k in range(np.size(xt)):
+            velxk,velyk = vwm.velocity_grid(xt[k],yt[k],xp,yp,Vinf,diat[k],rot,chord,B,veltype='ind',m=m,n=n,precision='single')
+            intex = intex - velxk*fabs(velxk)
+            intey = intey + velyk*fabs(velyk)
+        veleffpx = np.where(intex >= 0.,-Vinf*sqrt(fabs(intex)),Vinf*sqrt(fabs(intex)))
+        veleffpy = np.where(intey >= 0.,Vinf*sqrt(fabs(intey)),-Vinf*sqrt(fabs(intey)))
+
+        P = sqrt((veleffpx+Vinf)**2 + (veleffpy)**2)/Vinf
+        progress_bar(1.,N*N,0.)
+    elif int_type == 'gskr':
+        for i in range(N):
+            for j in range(N):
                 veleffpx,veleffpy = vwm.overlap(ntheta,xt,yt,diat,np.ones_like(xt)*rot,chord,B,X[i,j],Y[i,j],dia,Vinf,True)
 
-            P[i,j] = sqrt((veleffpx[0]+Vinf)**2 + (veleffpy[0])**2)/Vinf
-            # P[i,j] = (veleffpx[0]+Vinf)/Vinf
-            # P[i,j] = veleffpy[0]/Vinf
-            iter += 1
-            runtime = time.time()-time0
-            progress_bar(float(iter)/(N*N),N*N,runtime)
-            time0 = time.time()
+                P[i,j] = sqrt((veleffpx[0]+Vinf)**2 + (veleffpy[0])**2)/Vinf
+                # P[i,j] = (veleffpx[0]+Vinf)/Vinf
+                # P[i,j] = veleffpy[0]/Vinf
+                iter += 1
+                runtime = time.time()-time0
+                progress_bar(float(iter)/(N*N),N*N,runtime)
+                time0 = time.time()
 
     fs = 20
     plt.figure()
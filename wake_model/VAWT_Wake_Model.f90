@@ -293,28 +293,19 @@ subroutine EMGdist(y,loc,spr,skw,scl,gam_skew)
 end subroutine EMGdist
 
 
-! Calculating vorticity strength in the x and y directions
-subroutine vorticitystrength(x,y,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,gam_lat)
+! Limiting the EMG parameter components to create expected behavior of the vorticity distribution
+subroutine emgclamp(loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,loc1d,loc2d,loc3d,&
+  spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d)
     implicit none
 
     integer, parameter :: dp = kind(0.d0)
 
     ! in
-    real(dp), intent(in) :: x,y,dia
     real(dp), intent(in) :: loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3
 
     ! out
-    real(dp), intent(out) :: gam_lat
-
-    ! local
-    real(dp) :: loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d
-    real(dp) :: xd,yd,loc,spr,skw,scl,g1,g2
-    intrinsic exp
-
-    xd = x/dia ! normalizing x by the diameter
-    yd = y/dia ! normalizing y by the diameter
+    real(dp), intent(out) :: loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d
 
-    ! Limiting the parameter components to create expected behavior
     if (loc1 > -0.001_dp) then ! ensure concave down
       loc1d = -0.001_dp
     else
@@ -331,8 +322,6 @@ subroutine vorticitystrength(x,y,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl
       loc3d = loc3
     end if
 
-    loc = loc1d*xd*xd + loc2d*xd + loc3d ! EMG Location
-
     if (spr1 > -0.001_dp) then ! ensure decrease in value (more spread downstream)
       spr1d = -0.001_dp
     else
@@ -344,8 +333,6 @@ subroutine vorticitystrength(x,y,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl
       spr2d = spr2
     end if
 
-    spr = spr1d*xd + spr2d ! EMG Spread
-
     skw1d = skw1 ! no limitations necessary
     if (skw2 > 0.0_dp) then ! ensure value does not begin positive
       skw2d = 0.0_dp
@@ -353,8 +340,6 @@ subroutine vorticitystrength(x,y,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl
       skw2d = skw2
     end if
 
-    skw = skw1d*xd + skw2d ! EMG Skew
-
     if (scl1 < 0.0_dp) then ! ensure positive maximum vorticity strength
       scl1d = 0.0_dp
     else
@@ -371,6 +356,66 @@ subroutine vorticitystrength(x,y,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl
       scl3d = scl3
     end if
 
+end subroutine emgclamp
+
+
+! Calculating vorticity strength in the x and y directions
+subroutine vorticitystrength(x,y,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,gam_lat)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    real(dp), intent(in) :: x,y,dia
+    real(dp), intent(in) :: loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3
+
+    ! out
+    real(dp), intent(out) :: gam_lat
+
+    ! local
+    real(dp) :: loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d
+    real(dp) :: yd,loc,spr,skw,scl,g1,g2
+
+    yd = y/dia ! normalizing y by the diameter
+
+    ! Limiting the parameter components to create expected behavior
+    call emgclamp(loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,loc1d,loc2d,loc3d,&
+    spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d)
+
+    ! EMG parameters at the downstream position
+    call emgcolumn(x,dia,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,loc,spr,skw,scl)
+
+    call EMGdist(yd,loc,spr,skw,scl,g1)
+    call EMGdist(yd,-loc,-spr,-skw,-scl,g2)
+
+    gam_lat = (g1 - g2)
+
+end subroutine vorticitystrength
+
+
+! Calculating the EMG parameters at a downstream position from the limited parameter components
+! (constant along a lateral column of the wake)
+subroutine emgcolumn(x,dia,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,loc,spr,skw,scl)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    real(dp), intent(in) :: x,dia
+    real(dp), intent(in) :: loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d
+
+    ! out
+    real(dp), intent(out) :: loc,spr,skw,scl
+
+    ! local
+    real(dp) :: xd
+    intrinsic exp
+
+    xd = x/dia ! normalizing x by the diameter
+
+    loc = loc1d*xd*xd + loc2d*xd + loc3d ! EMG Location
+    spr = spr1d*xd + spr2d ! EMG Spread
+    skw = skw1d*xd + skw2d ! EMG Skew
     scl = scl1d/(1.0_dp + exp(scl2d*(xd - scl3d))) ! EMG Scale
 
     ! Limiting the parameters to the maximum values the EMG distribution can handle
@@ -386,12 +431,253 @@ subroutine vorticitystrength(x,y,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl
       skw = 0.0_dp
     end if
 
-    call EMGdist(yd,loc,spr,skw,scl,g1)
-    call EMGdist(yd,-loc,-spr,-skw,-scl,g2)
+end subroutine emgcolumn
 
-    gam_lat = (g1 - g2)
 
-end subroutine vorticitystrength
+! Calculating the vorticity strength along a lateral column of the wake (normalized positions)
+! Both EMG distributions are evaluated in one branch-free pass over the contiguous column
+subroutine vorticity_column(ny,yd,loc,spr,skw,scl,gam)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: ny
+    real(dp), dimension(ny), intent(in) :: yd
+    real(dp), intent(in) :: loc,spr,skw,scl
+
+    ! out
+    real(dp), dimension(ny), intent(out) :: gam
+
+    ! local
+    integer :: j
+    real(dp) :: c0,c1,s,q
+    integer :: ktab
+    common /emgkernel/ ktab
+    intrinsic exp
+    intrinsic erf
+    intrinsic sqrt
+
+    ! Using the tabulated kernel when selected with emg_kernel
+    if (ktab == 1) then
+      call vorticity_column_tab(ny,yd,loc,spr,skw,scl,gam)
+      return
+    end if
+
+    ! Constants of the column
+    c0 = scl*skw/2.0_dp
+    c1 = skw/2.0_dp
+    s = skw*spr*spr
+    q = sqrt(2.0_dp)*spr
+
+    ! EMG(y;loc,spr,skw,scl) - EMG(y;-loc,-spr,-skw,-scl)
+    do j = 1,ny
+      gam(j) = c0*(exp(c1*(2.0_dp*loc + s - 2.0_dp*yd(j)))*(1.0_dp - erf((loc + s - yd(j))/q))&
+      - exp(c1*(2.0_dp*loc + s + 2.0_dp*yd(j)))*(1.0_dp - erf((loc + s + yd(j))/q)))
+    end do
+
+end subroutine vorticity_column
+
+
+! Setting the number of OpenMP threads used by the parallel loops (no effect when compiled without OpenMP)
+subroutine set_threads(nthreads)
+    implicit none
+
+    ! in
+    integer, intent(in) :: nthreads
+
+    !$ call omp_set_num_threads(nthreads)
+
+end subroutine set_threads
+
+
+! Returning the number of OpenMP threads used by the parallel loops (1 when compiled without OpenMP)
+subroutine get_threads(nthreads)
+    implicit none
+
+    ! out
+    integer, intent(out) :: nthreads
+
+    !$ integer :: omp_get_max_threads
+
+    nthreads = 1
+    !$ nthreads = omp_get_max_threads()
+
+end subroutine get_threads
+
+
+! Selecting the EMG kernel used for the vorticity of the integration nodes (0: exp and erf, 1: tabulated erfcx)
+subroutine emg_kernel(kern)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: kern
+
+    ! local
+    integer :: ktab
+    real(dp), dimension(1) :: yd,gam
+    common /emgkernel/ ktab
+
+    ktab = kern
+
+    ! Building the tables of the tabulated kernel here (an empty column) so that threads only read them
+    if (ktab == 1) then
+      yd = 0.0_dp
+      call vorticity_column_tab(0,yd,0.0_dp,-0.5_dp,0.0_dp,0.0_dp,gam)
+    end if
+
+end subroutine emg_kernel
+
+
+! Initializing the EMG kernel selection to the exact kernel (exp and erf) for callers that never call emg_kernel
+block data emgkernel_init
+    implicit none
+
+    integer :: ktab
+    common /emgkernel/ ktab
+    data ktab /0/
+
+end block data emgkernel_init
+
+
+! Calculating the vorticity strength of a column of nodes with the tabulated, overflow-safe EMG kernel
+! Each EMG term exp(A)*erfc(z) is written as exp(-u^2/2)*erfcx(z) for z >= 0 (A - z^2 = -u^2/2 with u = (loc - y)/spr)
+! and as exp(A)*(2 - erfc(-z)) for z < 0, so one exponential and one table lookup are needed per term and neither
+! factor can overflow where the product is finite
+! erfcx is interpolated on [0,12] and erfc on [0,6] with cubic Hermite tables of 2048 intervals (an asymptotic
+! series beyond); the maximum error of gam is below 1e-10*abs(scl*skw) (about 1e-9 of the peak vorticity)
+subroutine vorticity_column_tab(ny,yd,loc,spr,skw,scl,gam)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: ny
+    real(dp), dimension(ny), intent(in) :: yd
+    real(dp), intent(in) :: loc,spr,skw,scl
+
+    ! out
+    real(dp), dimension(ny), intent(out) :: gam
+
+    ! local
+    integer, parameter :: nt = 2048 ! table intervals
+    real(dp), parameter :: zx = 12.0_dp ! end of the erfcx table
+    real(dp), parameter :: zc = 6.0_dp ! end of the erfc table (erfc(6) < 3e-17)
+    real(dp), parameter :: emin = 40.0_dp ! exponent below which a term is neglected
+    integer :: j,l,i
+    real(dp) :: c0,c1,s,rs,rq,y,u,z,a,t,f0,f1,d0,d1,ev,term(2)
+    real(dp), dimension(0:nt), save :: fx,dfx,fc,dfc
+    logical, save :: built = .false.
+    logical :: ready
+    intrinsic exp
+    intrinsic sqrt
+    intrinsic int
+
+    ! Building the tables once (the sequentially consistent atomics flush the tables with the flag)
+    !$omp atomic read seq_cst
+    ready = built
+    if (.not. ready) then
+      !$omp critical (emgtables)
+      if (.not. built) then
+        call erfc_tables(nt,zx,zc,fx,dfx,fc,dfc)
+        !$omp atomic write seq_cst
+        built = .true.
+      end if
+      !$omp end critical (emgtables)
+    end if
+
+    ! Constants of the column
+    c0 = scl*skw/2.0_dp
+    c1 = skw/2.0_dp
+    s = skw*spr*spr
+    rs = 1.0_dp/spr
+    rq = 1.0_dp/(sqrt(2.0_dp)*spr)
+
+    ! EMG(y;loc,spr,skw,scl) - EMG(y;-loc,-spr,-skw,-scl)
+    do j = 1,ny
+      do l = 1,2
+        if (l == 1) then
+          y = yd(j)
+        else
+          y = -yd(j) ! the mirrored distribution
+        end if
+        u = (loc - y)*rs
+        z = (loc + s - y)*rq
+        a = c1*(2.0_dp*loc + s - 2.0_dp*y) ! exponent of the unscaled form
+        if (((z >= 0.0_dp) .and. (0.5_dp*u*u > emin)) .or. ((z < 0.0_dp) .and. (a < -emin))) then
+          term(l) = 0.0_dp ! negligible term (below exp(-emin) of the peak)
+        else if (z >= 0.0_dp) then
+          ! scaled complementary error function
+          if (z < zx) then
+            t = z*(nt/zx)
+            i = int(t)
+            t = t - i
+            f0 = fx(i)
+            f1 = fx(i+1)
+            d0 = dfx(i)*(zx/nt)
+            d1 = dfx(i+1)*(zx/nt)
+            ev = f0 + t*(d0 + t*((3.0_dp*(f1 - f0) - 2.0_dp*d0 - d1) + t*(2.0_dp*(f0 - f1) + d0 + d1)))
+          else
+            t = 0.5_dp/(z*z)
+            ev = (1.0_dp - t*(1.0_dp - 3.0_dp*t*(1.0_dp - 5.0_dp*t*(1.0_dp - 7.0_dp*t))))/(z*1.7724538509055160_dp)
+          end if
+          term(l) = exp(-0.5_dp*u*u)*ev
+        else
+          ! complementary error function of the negative argument
+          if (-z < zc) then
+            t = -z*(nt/zc)
+            i = int(t)
+            t = t - i
+            f0 = fc(i)
+            f1 = fc(i+1)
+            d0 = dfc(i)*(zc/nt)
+            d1 = dfc(i+1)*(zc/nt)
+            ev = f0 + t*(d0 + t*((3.0_dp*(f1 - f0) - 2.0_dp*d0 - d1) + t*(2.0_dp*(f0 - f1) + d0 + d1)))
+          else
+            ev = 0.0_dp
+          end if
+          term(l) = exp(a)*(2.0_dp - ev)
+        end if
+      end do
+      gam(j) = c0*(term(1) - term(2))
+    end do
+
+end subroutine vorticity_column_tab
+
+
+! Calculating the cubic Hermite tables (values and derivatives) of erfcx on [0,zx] and erfc on [0,zc]
+subroutine erfc_tables(nt,zx,zc,fx,dfx,fc,dfc)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: nt
+    real(dp), intent(in) :: zx,zc
+
+    ! out
+    real(dp), dimension(0:nt), intent(out) :: fx,dfx,fc,dfc
+
+    ! local
+    integer :: i
+    real(dp) :: z,rpi
+    intrinsic erfc
+    intrinsic erfc_scaled
+    intrinsic exp
+
+    rpi = 1.1283791670955126_dp ! 2/sqrt(pi)
+    do i = 0,nt
+      z = i*(zx/nt)
+      fx(i) = erfc_scaled(z)
+      dfx(i) = 2.0_dp*z*fx(i) - rpi
+      z = i*(zc/nt)
+      fc(i) = erfc(z)
+      dfc(i) = -rpi*exp(-z*z)
+    end do
+
+end subroutine erfc_tables
 
 
 ! Calculating vorticity strength in the x and y directions
@@ -653,318 +939,2082 @@ subroutine integrandy(y,x,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2
 end subroutine integrandy
 
 
-! Performing integration to convert vorticity into velocity
-subroutine vel_field(xt,yt,x0t,y0t,dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,&
-  skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte,velx,vely)
+! Calculating the nodes and weights of the 21-point Gauss-Kronrod rule on [-1,1] (embedded 10-point Gauss weights
+! are zero at the Kronrod nodes)
+subroutine gk21rule(t,wk,wg)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! out
+    real(dp), dimension(21), intent(out) :: t,wk,wg
+
+    ! local
+    integer :: k
+    real(dp), dimension(11) :: xgk,wgk
+    real(dp), dimension(5) :: wgs
+
+    xgk = (/ 0.995657163025808080735527280689003_dp, 0.973906528517171720077964012084452_dp,&
+    0.930157491355708226001207180059508_dp, 0.865063366688984510732096688423493_dp,&
+    0.780817726586416897063717578345042_dp, 0.679409568299024406234327365114874_dp,&
+    0.562757134668604683339000099272694_dp, 0.433395394129247190799265943165784_dp,&
+    0.294392862701460198131126603103866_dp, 0.148874338981631210884826001129720_dp, 0.0_dp /)
+    wgk = (/ 0.011694638867371874278064396062192_dp, 0.032558162307964727478818972459390_dp,&
+    0.054755896574351996031381300244580_dp, 0.075039674810919952767043140916190_dp,&
+    0.093125454583697605535065465083366_dp, 0.109387158802297641899210590325805_dp,&
+    0.123491976262065851077208980223048_dp, 0.134709217311473325928054001771707_dp,&
+    0.142775938577060080797094273138717_dp, 0.147739104901338491374841515972068_dp,&
+    0.149445554002916905664936468389821_dp /)
+    wgs = (/ 0.066671344308688137593568809893332_dp, 0.149451349150580593145776339657697_dp,&
+    0.219086362515982043995534934228163_dp, 0.269266719309996355091226921569469_dp,&
+    0.295524224714752870173892994651146_dp /)
+
+    wg = 0.0_dp
+    do k = 1,11
+      t(k) = -xgk(k)
+      t(22-k) = xgk(k)
+      wk(k) = wgk(k)
+      wk(22-k) = wgk(k)
+    end do
+    do k = 1,5
+      wg(2*k) = wgs(k)
+      wg(22-2*k) = wgs(k)
+    end do
+
+end subroutine gk21rule
+
+
+! Calculating the 21-point Gauss-Kronrod estimate and its error (as in QUADPACK qk21) of both velocity components
+subroutine gk21est(hl,wk,wg,f,res,err)
     implicit none
 
     integer, parameter :: dp = kind(0.d0)
 
     ! in
-    real(dp), intent(in) :: xt,yt,x0t,y0t,dia,rot,chord,Vinf
-    real(dp), dimension(10), intent(in) :: loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d
-    integer, intent(in) :: blades,m_in,n_in,inte
+    real(dp), intent(in) :: hl ! half-length of the interval
+    real(dp), dimension(21), intent(in) :: wk,wg
+    real(dp), dimension(21,2), intent(in) :: f
 
     ! out
-    real(dp), intent(out) :: velx,vely
+    real(dp), dimension(2), intent(out) :: res
+    real(dp), intent(out) :: err
 
     ! local
-    integer :: i,j,m,n
-    real(dp) :: x0,y0,h,k,velxi,velyi,xsum,ysum,intlim,pi2,tsr,sol,a,b,c,d
-    real(dp) :: loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3
-    real(dp), dimension(m_in) :: xdiv
-    real(dp), dimension(n_in) :: ydiv
-    real(dp) :: xval1,xval2,xval3,xval4,yval1,yval2,yval3,yval4
-    real(dp) :: xsum1,xsum2,xsum3,xsum4,xsum5,xsum6,xsum7,xsum8,xsum9,xsum10,xsum11,xsum12
-    real(dp) :: ysum1,ysum2,ysum3,ysum4,ysum5,ysum6,ysum7,ysum8,ysum9,ysum10,ysum11,ysum12
-    intrinsic sqrt
+    integer :: l
+    real(dp) :: resk,resg,resabs,resasc,e,epmach,uflow
     intrinsic abs
-    intrinsic exp
-    pi2 = 6.28318530718_dp
+    intrinsic sum
+    intrinsic min
+    intrinsic max
+    intrinsic epsilon
+    intrinsic tiny
+
+    epmach = epsilon(1.0_dp)
+    uflow = tiny(1.0_dp)
+
+    err = 0.0_dp
+    do l = 1,2
+      resk = sum(wk*f(:,l))
+      resg = sum(wg*f(:,l))
+      resabs = sum(wk*abs(f(:,l)))
+      resasc = sum(wk*abs(f(:,l) - 0.5_dp*resk))
+      res(l) = resk*hl
+      resabs = resabs*abs(hl)
+      resasc = resasc*abs(hl)
+      e = abs((resk - resg)*hl)
+      if ((resasc /= 0.0_dp) .and. (e /= 0.0_dp)) then
+        e = resasc*min(1.0_dp,(200.0_dp*e/resasc)**1.5_dp)
+      end if
+      if (resabs > uflow/(50.0_dp*epmach)) then
+        e = max((epmach*50.0_dp)*resabs,e)
+      end if
+      err = err + e
+    end do
 
-    tsr = (dia/2.0_dp)*abs(rot)/Vinf
-    sol = blades*chord/(dia/2.0_dp)
+end subroutine gk21est
 
-    call parameterval(tsr,sol,loc1d,loc1)
-    call parameterval(tsr,sol,loc2d,loc2)
-    call parameterval(tsr,sol,loc3d,loc3)
-    call parameterval(tsr,sol,spr1d,spr1)
-    call parameterval(tsr,sol,spr2d,spr2)
-    call parameterval(tsr,sol,skw1d,skw1)
-    call parameterval(tsr,sol,skw2d,skw2)
-    call parameterval(tsr,sol,scl1d,scl1)
-    call parameterval(tsr,sol,scl2d,scl2)
-    call parameterval(tsr,sol,scl3d,scl3)
 
-    ! Bounds of integration
-    a = 0.0_dp ! starting at turbine
-    b = (scl3 + 5.0_dp)*dia ! ending at the inflection point of the vorticity (when it decays)
-    c = -1.0_dp*dia ! one diameter laterally
-    d = 1.0_dp*dia ! one diameter laterally
+! Calculating the 21-point Gauss-Kronrod estimate of both velocity kernels over the lateral interval [yl,yu]
+! (folded about the wake centerline: each node also accounts for its image at -y with the opposite vorticity)
+subroutine gskr_seg(yl,yu,dx,y0,dia,loc,spr,skw,scl,t,wk,wg,res,err)
+    implicit none
 
-    ! Translating the turbine position (placing turbine at 0,0)
-    x0 = x0t - xt
-    y0 = y0t - yt
+    integer, parameter :: dp = kind(0.d0)
 
-    velxi = 0.0_dp
-    velyi = 0.0_dp
+    ! in
+    real(dp), intent(in) :: yl,yu,dx,y0,dia,loc,spr,skw,scl
+    real(dp), dimension(21), intent(in) :: t,wk,wg
 
-    if (inte == 1) then
-      ! Using 2D Simpson's Rule to integrate****************************************
-      h = (b - a)/(m_in)
-      k = (d - c)/(n_in)
+    ! out
+    real(dp), dimension(2), intent(out) :: res
+    real(dp), intent(out) :: err
 
-      do i = 1,m_in
-        xdiv(i) = a + i*h
-      end do
+    ! local
+    integer :: k
+    real(dp) :: hl,dyp,dym,r2p,r2m
+    real(dp), dimension(21) :: yk,yd,gam
+    real(dp), dimension(21,2) :: f
+    intrinsic max
+    intrinsic tiny
+
+    hl = 0.5_dp*(yu - yl)
+    yk = 0.5_dp*(yu + yl) + hl*t
+    yd = yk/dia
+    call vorticity_column(21,yd,loc,spr,skw,scl,gam)
+    do k = 1,21
+      dyp = yk(k) - y0
+      dym = -yk(k) - y0
+      r2p = max(dx*dx + dyp*dyp, tiny(1.0_dp))
+      r2m = max(dx*dx + dym*dym, tiny(1.0_dp))
+      f(k,1) = gam(k)*(dyp/r2p - dym/r2m)
+      f(k,2) = gam(k)*dx*(1.0_dp/r2p - 1.0_dp/r2m)
+    end do
+    call gk21est(hl,wk,wg,f,res,err)
 
-      do j = 1,n_in
-        ydiv(j) = c + j*k
-      end do
+end subroutine gskr_seg
 
-      m = m_in/2
-      n = n_in/2
-
-      call integrandx(c,a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xval1)
-      call integrandx(d,a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xval2)
-      call integrandx(c,b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xval3)
-      call integrandx(d,b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xval4)
-
-      call integrandy(c,a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,yval1)
-      call integrandy(d,a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,yval2)
-      call integrandy(c,b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,yval3)
-      call integrandy(d,b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,yval4)
-
-      xsum1 = 0.0_dp
-      xsum2 = 0.0_dp
-      xsum3 = 0.0_dp
-      xsum4 = 0.0_dp
-      xsum5 = 0.0_dp
-      xsum6 = 0.0_dp
-      xsum7 = 0.0_dp
-      xsum8 = 0.0_dp
-      xsum9 = 0.0_dp
-      xsum10 = 0.0_dp
-      xsum11 = 0.0_dp
-      xsum12 = 0.0_dp
-
-      ysum1 = 0.0_dp
-      ysum2 = 0.0_dp
-      ysum3 = 0.0_dp
-      ysum4 = 0.0_dp
-      ysum5 = 0.0_dp
-      ysum6 = 0.0_dp
-      ysum7 = 0.0_dp
-      ysum8 = 0.0_dp
-      ysum9 = 0.0_dp
-      ysum10 = 0.0_dp
-      ysum11 = 0.0_dp
-      ysum12 = 0.0_dp
-
-      intlim = 0.0_dp
-
-      do j = 1,n
-        if ((ydiv(2*j-1) > intlim) .or. (ydiv(2*j-1) < -intlim)) then
-          call integrandx(ydiv(2*j-1),a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-          xsum1 = xsum1 + xsum
-          call integrandy(ydiv(2*j-1),a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-          ysum1 = ysum1 + ysum
-        end if
-      end do
-      do j = 1,n-1
-        if ((ydiv(2*j) > intlim) .or. (ydiv(2*j) < -intlim)) then
-          call integrandx(ydiv(2*j),a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-          xsum2 = xsum2 + xsum
-          call integrandy(ydiv(2*j),a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-          ysum2 = ysum2 + ysum
-        end if
-      end do
-      do j = 1,n
-        if ((ydiv(2*j-1) > intlim) .or. (ydiv(2*j-1) < -intlim)) then
-          call integrandx(ydiv(2*j-1),b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-          xsum3 = xsum3 + xsum
-          call integrandy(ydiv(2*j-1),b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-          ysum3 = ysum3 + ysum
-        end if
-      end do
-      do j = 1,n-1
-        if ((ydiv(2*j) > intlim) .or. (ydiv(2*j) < -intlim)) then
-          call integrandx(ydiv(2*j),b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-          xsum4 = xsum4 + xsum
-          call integrandy(ydiv(2*j),b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-          ysum4 = ysum4 + ysum
-        end if
-      end do
-      do i = 1,m
-        call integrandx(c,xdiv(2*i-1),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-        xsum5 = xsum5 + xsum
-        call integrandy(c,xdiv(2*i-1),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-        ysum5 = ysum5 + ysum
-      end do
-      do i = 1,m
-        call integrandx(d,xdiv(2*i-1),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-        xsum6 = xsum6 + xsum
-        call integrandy(d,xdiv(2*i-1),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-        ysum6 = ysum6 + ysum
-      end do
-      do i = 1,m-1
-        call integrandx(c,xdiv(2*i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-        xsum7 = xsum7 + xsum
-        call integrandy(c,xdiv(2*i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-        ysum7 = ysum7 + ysum
-      end do
-      do i = 1,m-1
-        call integrandx(d,xdiv(2*i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-        xsum8 = xsum8 + xsum
-        call integrandy(d,xdiv(2*i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-        ysum8 = ysum8 + ysum
-      end do
 
-      do j = 1,n
-        do i = 1,m
-          if ((ydiv(2*j-1) > intlim) .or. (ydiv(2*j-1) < -intlim)) then
-            call integrandx(ydiv(2*j-1),xdiv(2*i-1),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-            xsum9 = xsum9 + xsum
-            call integrandy(ydiv(2*j-1),xdiv(2*i-1),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-            ysum9 = ysum9 + ysum
-          end if
-        end do
-      end do
-      do j = 1,n-1
-        do i = 1,m
-          if ((ydiv(2*j) > intlim) .or. (ydiv(2*j) < -intlim)) then
-            call integrandx(ydiv(2*j),xdiv(2*i-1),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-            xsum10 = xsum10 + xsum
-            call integrandy(ydiv(2*j),xdiv(2*i-1),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-            ysum10 = ysum10 + ysum
-          end if
-        end do
-      end do
-      do j = 1,n
-        do i = 1,m-1
-          if ((ydiv(2*j-1) > intlim) .or. (ydiv(2*j-1) < -intlim)) then
-            call integrandx(ydiv(2*j-1),xdiv(2*i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-            xsum11 = xsum11 + xsum
-            call integrandy(ydiv(2*j-1),xdiv(2*i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-            ysum11 = ysum11 + ysum
-          end if
-        end do
-      end do
-      do j = 1,n-1
-        do i = 1,m-1
-          if ((ydiv(2*j) > intlim) .or. (ydiv(2*j) < -intlim)) then
-            call integrandx(ydiv(2*j),xdiv(2*i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-            xsum12 = xsum12 + xsum
-            call integrandy(ydiv(2*j),xdiv(2*i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-            ysum12 = ysum12 + ysum
-          end if
-        end do
-      end do
+! Calculating the lateral integrals of both velocity kernels at a downstream position with adaptive 21-point
+! Gauss-Kronrod quadrature over the folded domain [-d,d] (the EMG parameters of the column are calculated once
+! for all of the intervals)
+subroutine gskr_lat(xs,d,dia,emg,x0,y0,epsabs,epsrel,limit,t,wk,wg,res,err,neval)
+    implicit none
 
-      velxi = (h*k*(xval1 + xval2 + xval3 + xval4 + 4.0_dp*xsum1 + 2.0_dp*xsum2 +&
-      4.0_dp*xsum3 + 2.0_dp*xsum4 + 4.0_dp*xsum5 + 4.0_dp*xsum6 + 2.0_dp*xsum7 + 2.0_dp*xsum8 +&
-      16.0_dp*xsum9 + 8.0_dp*xsum10 + 8.0_dp*xsum11 + 4.0_dp*xsum12)/9.0_dp)*(abs(rot)/pi2)
+    integer, parameter :: dp = kind(0.d0)
 
-      velyi = (h*k*(yval1 + yval2 + yval3 + yval4 + 4.0_dp*ysum1 + 2.0_dp*ysum2 +&
-      4.0_dp*ysum3 + 2.0_dp*ysum4 + 4.0_dp*ysum5 + 4.0_dp*ysum6 + 2.0_dp*ysum7 + 2.0_dp*ysum8 +&
-      16.0_dp*ysum9 + 8.0_dp*ysum10 + 8.0_dp*ysum11 + 4.0_dp*ysum12)/9.0_dp)*(abs(rot)/pi2)
+    ! in
+    integer, intent(in) :: limit
+    real(dp), intent(in) :: xs,d,dia,x0,y0,epsabs,epsrel
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), dimension(21), intent(in) :: t,wk,wg
 
-    else if (inte == 2) then
-      ! Using 2D Trapezoidal Rule to integrate****************************************
-      h = (b - a)/m_in
-      k = (d - c)/n_in
+    ! out
+    real(dp), dimension(2), intent(out) :: res
+    real(dp), intent(out) :: err
 
-      do i = 1,m_in
-        xdiv(i) = a + i*h
-      end do
+    ! in/out
+    integer, intent(inout) :: neval
 
-      do j = 1,n_in
-        ydiv(j) = c + j*k
-      end do
+    ! local
+    integer :: l,nint,imax
+    real(dp) :: loc,spr,skw,scl,dx,ym
+    real(dp), dimension(limit) :: lo,hi,el
+    real(dp), dimension(2,limit) :: rl
+    intrinsic abs
+    intrinsic max
+    intrinsic sum
+    intrinsic maxloc
+
+    call emgcolumn(xs,dia,emg(1),emg(2),emg(3),emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10),&
+    loc,spr,skw,scl)
+    dx = x0 - xs
+
+    ! Starting intervals on the upper half [0,d] (split at the lateral position of the point or its image)
+    lo(1) = 0.0_dp
+    hi(1) = d
+    nint = 1
+    if ((abs(y0) > 0.0_dp) .and. (abs(y0) < d)) then
+      hi(1) = abs(y0)
+      lo(2) = abs(y0)
+      hi(2) = d
+      nint = 2
+    end if
+    do l = 1,nint
+      call gskr_seg(lo(l),hi(l),dx,y0,dia,loc,spr,skw,scl,t,wk,wg,rl(:,l),el(l))
+    end do
+    neval = neval + 21*nint
+
+    ! Bisecting the interval with the largest error until the tolerance is met
+    do while ((sum(el(1:nint)) > max(epsabs,epsrel*(abs(sum(rl(1,1:nint))) + abs(sum(rl(2,1:nint)))))) &
+    .and. (nint < limit))
+      imax = maxloc(el(1:nint),1)
+      ym = 0.5_dp*(lo(imax) + hi(imax))
+      nint = nint + 1
+      lo(nint) = ym
+      hi(nint) = hi(imax)
+      hi(imax) = ym
+      call gskr_seg(lo(imax),hi(imax),dx,y0,dia,loc,spr,skw,scl,t,wk,wg,rl(:,imax),el(imax))
+      call gskr_seg(lo(nint),hi(nint),dx,y0,dia,loc,spr,skw,scl,t,wk,wg,rl(:,nint),el(nint))
+      neval = neval + 42
+    end do
 
-      call integrandx(c,a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xval1)
-      call integrandx(c,b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xval2)
-      call integrandx(d,a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xval3)
-      call integrandx(d,b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xval4)
-
-      call integrandy(c,a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,yval1)
-      call integrandy(c,b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,yval2)
-      call integrandy(d,a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,yval3)
-      call integrandy(d,b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,yval4)
-
-      xsum1 = 0.0_dp
-      xsum2 = 0.0_dp
-      xsum3 = 0.0_dp
-      xsum4 = 0.0_dp
-      xsum5 = 0.0_dp
-
-      ysum1 = 0.0_dp
-      ysum2 = 0.0_dp
-      ysum3 = 0.0_dp
-      ysum4 = 0.0_dp
-      ysum5 = 0.0_dp
-
-      intlim = 0.0_dp
-
-      do i = 1,m_in-1
-        call integrandx(c,xdiv(i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-        xsum1 = xsum1 + xsum
-        call integrandy(c,xdiv(i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-        ysum1 = ysum1 + ysum
+    res(1) = sum(rl(1,1:nint))
+    res(2) = sum(rl(2,1:nint))
+    err = sum(el(1:nint))
+
+end subroutine gskr_lat
+
+
+! Calculating the downstream integral of the lateral integrals over [xl,xu] with the 21-point Gauss-Kronrod rule
+! (errl is the accumulated error of the lateral integrals)
+subroutine gskr_col(xl,xu,d,dia,emg,x0,y0,epsabs,epsrel,limit,t,wk,wg,res,err,errl,neval)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: limit
+    real(dp), intent(in) :: xl,xu,d,dia,x0,y0,epsabs,epsrel
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), dimension(21), intent(in) :: t,wk,wg
+
+    ! out
+    real(dp), dimension(2), intent(out) :: res
+    real(dp), intent(out) :: err,errl
+
+    ! in/out
+    integer, intent(inout) :: neval
+
+    ! local
+    integer :: k
+    real(dp) :: hl,errk
+    real(dp), dimension(21,2) :: f
+    intrinsic abs
+
+    hl = 0.5_dp*(xu - xl)
+    errl = 0.0_dp
+    do k = 1,21
+      call gskr_lat(0.5_dp*(xu + xl) + hl*t(k),d,dia,emg,x0,y0,epsabs,epsrel,limit,t,wk,wg,&
+      f(k,:),errk,neval)
+      errl = errl + wk(k)*errk
+    end do
+    call gk21est(hl,wk,wg,f,res,err)
+    errl = abs(hl)*errl
+
+end subroutine gskr_col
+
+
+! Calculating induced velocity at points relative to the turbine with adaptive 21-point Gauss-Kronrod quadrature
+! in both directions (both velocity components share the subdivision; replaces nested QUADPACK calls)
+subroutine vel_gskr(npt,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,epsabs,epsrel,&
+  velx,vely,err,neval)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: npt
+    real(dp), dimension(npt), intent(in) :: x0,y0
+    real(dp), intent(in) :: dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3
+    real(dp), intent(in) :: epsabs,epsrel
+    !f2py real(dp) optional, intent(in) :: epsabs = 1.49e-8
+    !f2py real(dp) optional, intent(in) :: epsrel = 1.49e-8
+
+    ! out
+    real(dp), dimension(npt), intent(out) :: velx,vely,err
+    integer, dimension(npt), intent(out) :: neval
+
+    ! local
+    integer, parameter :: limit = 200 ! maximum number of intervals in each direction
+    integer :: l,p,nint,imax
+    real(dp) :: a,b,d,xm
+    real(dp), dimension(10) :: emg
+    real(dp), dimension(21) :: t,wk,wg
+    real(dp), dimension(limit) :: lo,hi,el,ell
+    real(dp), dimension(2,limit) :: rl
+    intrinsic abs
+    intrinsic max
+    intrinsic sum
+    intrinsic maxloc
+
+    call gk21rule(t,wk,wg)
+
+    ! Limiting the parameter components to create expected behavior
+    call emgclamp(loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,emg(1),emg(2),emg(3),&
+    emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10))
+
+    ! Bounds of integration
+    a = 0.0_dp ! starting at turbine
+    b = (scl3 + 5.0_dp)*dia ! ending at the inflection point of the vorticity (when it decays)
+    d = 1.0_dp*dia ! one diameter laterally (the folded domain spans -d to d)
+
+    !$omp parallel do private(l,nint,imax,xm,lo,hi,el,ell,rl) schedule(dynamic)
+    do p = 1,npt
+      neval(p) = 0
+
+      ! Starting intervals (split at the downstream position of the point)
+      lo(1) = a
+      hi(1) = b
+      nint = 1
+      if ((x0(p) > a) .and. (x0(p) < b)) then
+        hi(1) = x0(p)
+        lo(2) = x0(p)
+        hi(2) = b
+        nint = 2
+      end if
+      do l = 1,nint
+        call gskr_col(lo(l),hi(l),d,dia,emg,x0(p),y0(p),epsabs,epsrel,limit,t,wk,wg,rl(:,l),el(l),ell(l),&
+        neval(p))
+      end do
+
+      ! Bisecting the interval with the largest downstream error until the tolerance is met
+      do while ((sum(el(1:nint)) > max(epsabs,epsrel*(abs(sum(rl(1,1:nint))) + abs(sum(rl(2,1:nint)))))) &
+      .and. (nint < limit))
+        imax = maxloc(el(1:nint),1)
+        xm = 0.5_dp*(lo(imax) + hi(imax))
+        nint = nint + 1
+        lo(nint) = xm
+        hi(nint) = hi(imax)
+        hi(imax) = xm
+        call gskr_col(lo(imax),hi(imax),d,dia,emg,x0(p),y0(p),epsabs,epsrel,limit,t,wk,wg,rl(:,imax),&
+        el(imax),ell(imax),neval(p))
+        call gskr_col(lo(nint),hi(nint),d,dia,emg,x0(p),y0(p),epsabs,epsrel,limit,t,wk,wg,rl(:,nint),&
+        el(nint),ell(nint),neval(p))
       end do
-      do i = 1,m_in-1
-        call integrandx(d,xdiv(i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-        xsum2 = xsum2 + xsum
-        call integrandy(d,xdiv(i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-        ysum2 = ysum2 + ysum
+
+      velx(p) = sum(rl(1,1:nint))
+      vely(p) = sum(rl(2,1:nint))
+      err(p) = sum(el(1:nint)) + sum(ell(1:nint)) ! downstream and lateral errors
+    end do
+    !$omp end parallel do
+
+end subroutine vel_gskr
+
+
+! Calculating the limited EMG parameter components of a turbine and the bounds of integration of its wake
+subroutine emgturbine(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,&
+  emg,a,b,c,d)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    real(dp), intent(in) :: dia,rot,chord,Vinf
+    real(dp), dimension(10), intent(in) :: loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d
+    integer, intent(in) :: blades
+
+    ! out
+    real(dp), dimension(10), intent(out) :: emg
+    real(dp), intent(out) :: a,b,c,d
+
+    ! local
+    real(dp) :: tsr,sol
+    real(dp) :: loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3
+    intrinsic abs
+
+    tsr = (dia/2.0_dp)*abs(rot)/Vinf
+    sol = blades*chord/(dia/2.0_dp)
+
+    call parameterval(tsr,sol,loc1d,loc1)
+    call parameterval(tsr,sol,loc2d,loc2)
+    call parameterval(tsr,sol,loc3d,loc3)
+    call parameterval(tsr,sol,spr1d,spr1)
+    call parameterval(tsr,sol,spr2d,spr2)
+    call parameterval(tsr,sol,skw1d,skw1)
+    call parameterval(tsr,sol,skw2d,skw2)
+    call parameterval(tsr,sol,scl1d,scl1)
+    call parameterval(tsr,sol,scl2d,scl2)
+    call parameterval(tsr,sol,scl3d,scl3)
+
+    ! Limiting the parameter components to create expected behavior
+    call emgclamp(loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,emg(1),emg(2),emg(3),&
+    emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10))
+
+    ! Bounds of integration
+    a = 0.0_dp ! starting at turbine
+    b = (scl3 + 5.0_dp)*dia ! ending at the inflection point of the vorticity (when it decays)
+    c = -1.0_dp*dia ! one diameter laterally
+    d = 1.0_dp*dia ! one diameter laterally
+
+end subroutine emgturbine
+
+
+! Performing integration to convert vorticity into velocity
+subroutine vel_field(xt,yt,x0t,y0t,dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,&
+  skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte,velx,vely,nq)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    real(dp), intent(in) :: xt,yt,x0t,y0t,dia,rot,chord,Vinf
+    real(dp), dimension(10), intent(in) :: loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d
+    integer, intent(in) :: blades,m_in,n_in,inte
+    integer, intent(in) :: nq ! Gauss-Legendre points per panel (inte = 5)
+    !f2py integer optional, intent(in) :: nq = 8
+
+    ! out
+    real(dp), intent(out) :: velx,vely
+
+    ! local
+    real(dp) :: x0,y0,velxi,velyi,pi2,a,b,c,d
+    real(dp), dimension(1) :: x0v,y0v,velxv,velyv
+    real(dp), dimension(10) :: emg
+    real(dp), dimension(m_in+1) :: xg,wx
+    real(dp), dimension(n_in+1) :: yg,wy
+    intrinsic abs
+    pi2 = 6.28318530718_dp
+
+    ! Limited EMG parameter components of the turbine and bounds of integration
+    call emgturbine(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,&
+    emg,a,b,c,d)
+
+    ! Translating the turbine position (placing turbine at 0,0)
+    x0 = x0t - xt
+    y0 = y0t - yt
+
+    if (inte == 3) then
+      ! Semi-analytic integration (analytic in the lateral direction)
+      call vel_semi(m_in,n_in,dia,emg,a,b,c,d,x0,y0,velxi,velyi)
+    else if (inte == 4) then
+      ! Simpson's rule on lateral nodes graded towards the shear layers (trimmed downstream)
+      call vel_graded(m_in,n_in,dia,emg,a,b,x0,y0,velxi,velyi)
+    else if (inte == 6) then
+      ! Simpson's rule folded about the wake centerline (upper half of the nodes with the centerline weight halved)
+      call quadgrid(m_in,n_in,1,a,b,c,d,xg,yg,wx,wy)
+      yg(n_in/2+1) = 0.0_dp
+      wy(n_in/2+1) = 0.5_dp*wy(n_in/2+1)
+      call vel_fused_sym(m_in+1,n_in/2+1,xg,yg(n_in/2+1:n_in+1),wx,wy(n_in/2+1:n_in+1),dia,emg,a,b,c,d,&
+      x0,y0,velxi,velyi)
+    else if (inte == 5) then
+      ! Composite Gauss-Legendre rule with m_in by n_in panels
+      x0v(1) = x0
+      y0v(1) = y0
+      call vel_gauss(m_in,n_in,nq,dia,emg,a,b,c,d,1,x0v,y0v,velxv,velyv)
+      velxi = velxv(1)
+      velyi = velyv(1)
+    else
+      ! Creating the integration nodes and weights
+      call quadgrid(m_in,n_in,inte,a,b,c,d,xg,yg,wx,wy)
+
+      call vel_fused(m_in+1,n_in+1,xg,yg,wx,wy,dia,emg,a,b,c,d,x0,y0,velxi,velyi)
+    end if
+
+    velx = velxi*(abs(rot)/pi2)/Vinf
+    vely = velyi*(abs(rot)/pi2)/Vinf
+
+end subroutine vel_field
+
+
+! Performing adaptive Simpson's rule integration to convert vorticity into velocity at multiple points
+! The divisions of the direction with the larger error estimate are doubled until the estimated error of the
+! velocity (relative to the velocity with the free stream) is below tol
+subroutine vel_adapt(npt,xt,yt,x0t,y0t,dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,&
+  skw1d,skw2d,scl1d,scl2d,scl3d,tol,velx,vely,err,neval,mout,nout)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: npt,blades
+    real(dp), intent(in) :: xt,yt,dia,rot,chord,Vinf,tol
+    real(dp), dimension(npt), intent(in) :: x0t,y0t
+    real(dp), dimension(10), intent(in) :: loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d
+
+    ! out
+    real(dp), dimension(npt), intent(out) :: velx,vely,err
+    integer, dimension(npt), intent(out) :: neval,mout,nout
+
+    ! local
+    integer, parameter :: mstart = 8, mmax = 1024 ! starting and maximum divisions in each direction
+    integer :: l,m,n
+    real(dp) :: pi2,fac,a,b,c,d,x0,y0,ex,ey,velxi,velyi,velxx,velyx,velxy,velyy
+    real(dp), dimension(10) :: emg
+    intrinsic abs
+    intrinsic sqrt
+    intrinsic max
+    pi2 = 6.28318530718_dp
+
+    call emgturbine(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,&
+    emg,a,b,c,d)
+    fac = (abs(rot)/pi2)/Vinf
+
+    !$omp parallel do private(x0,y0,m,n,ex,ey,velxi,velyi,velxx,velyx,velxy,velyy) schedule(dynamic)
+    do l = 1,npt
+      ! Translating the turbine position (placing turbine at 0,0)
+      x0 = x0t(l) - xt
+      y0 = y0t(l) - yt
+
+      m = mstart
+      n = mstart
+      call vel_simp(m,n,dia,emg,a,b,c,d,x0,y0,velxi,velyi)
+      neval(l) = (m + 1)*(n + 1)
+
+      do
+        ! error estimates of each direction from grids refined in that direction
+        call vel_simp(2*m,n,dia,emg,a,b,c,d,x0,y0,velxx,velyx)
+        call vel_simp(m,2*n,dia,emg,a,b,c,d,x0,y0,velxy,velyy)
+        neval(l) = neval(l) + (2*m + 1)*(n + 1) + (m + 1)*(2*n + 1)
+        ex = fac*max(abs(velxx - velxi),abs(velyx - velyi))
+        ey = fac*max(abs(velxy - velxi),abs(velyy - velyi))
+
+        ! combining the refinements (error of each direction assumed independent)
+        velx(l) = (velxx + velxy - velxi)*fac
+        vely(l) = (velyx + velyy - velyi)*fac
+        err(l) = ex + ey
+
+        if ((err(l) <= tol*sqrt((1.0_dp + velx(l))**2 + vely(l)**2)) .or. (2*m > mmax .and. 2*n > mmax)) then
+          exit
+        end if
+
+        if (((ex >= ey) .and. (2*m <= mmax)) .or. (2*n > mmax)) then
+          m = 2*m
+          velxi = velxx
+          velyi = velyx
+        else
+          n = 2*n
+          velxi = velxy
+          velyi = velyy
+        end if
+      end do
+
+      mout(l) = 2*m
+      nout(l) = 2*n
+    end do
+    !$omp end parallel do
+
+end subroutine vel_adapt
+
+
+! Performing Simpson's rule integration with m_in downstream and n_in lateral divisions at a point relative to the turbine
+subroutine vel_simp(m_in,n_in,dia,emg,a,b,c,d,x0,y0,velx,vely)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: m_in,n_in
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,a,b,c,d,x0,y0
+
+    ! out
+    real(dp), intent(out) :: velx,vely
+
+    ! local
+    real(dp), dimension(:), allocatable :: xg,yg,wx,wy
+
+    allocate(xg(m_in+1),wx(m_in+1),yg(n_in+1),wy(n_in+1))
+    call quadgrid(m_in,n_in,1,a,b,c,d,xg,yg,wx,wy)
+    call vel_fused(m_in+1,n_in+1,xg,yg,wx,wy,dia,emg,a,b,c,d,x0,y0,velx,vely)
+    deallocate(xg,yg,wx,wy)
+
+end subroutine vel_simp
+
+
+! Creating the integration nodes and weights of Simpson's or the trapezoidal rule over the wake domain
+! (the downstream weights include the h*k factor of the rule)
+subroutine quadgrid(m_in,n_in,inte,a,b,c,d,xg,yg,wx,wy)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: m_in,n_in,inte
+    real(dp), intent(in) :: a,b,c,d
+
+    ! out
+    real(dp), dimension(m_in+1), intent(out) :: xg,wx
+    real(dp), dimension(n_in+1), intent(out) :: yg,wy
+
+    ! local
+    integer :: i,j
+    real(dp) :: h,k
+
+    ! Creating the divisions of the integration grid
+    h = (b - a)/m_in
+    k = (d - c)/n_in
+
+    do i = 1,m_in-1
+      xg(i+1) = a + i*h
+    end do
+    xg(1) = a
+    xg(m_in+1) = b
+
+    do j = 1,n_in-1
+      yg(j+1) = c + j*k
+    end do
+    yg(1) = c
+    yg(n_in+1) = d
+
+    call quadweights(m_in,inte,wx)
+    call quadweights(n_in,inte,wy)
+
+    if (inte == 1) then
+      wx = wx*(h*k/9.0_dp)
+    else
+      wx = wx*(h*k/4.0_dp)
+    end if
+
+end subroutine quadgrid
+
+
+! Calculating induced velocity at a point relative to the turbine with a fused x/y kernel
+! (the vorticity is calculated once per node and the EMG parameters once per downstream column)
+! When the point lies inside the integration domain [a,b]x[c,d], the linear expansion of the vorticity about the point
+! is subtracted from the integrand and integrated analytically, leaving a continuous remainder for the quadrature
+subroutine vel_fused(nx,ny,xg,yg,wx,wy,dia,emg,a,b,c,d,x0,y0,velx,vely)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: nx,ny
+    real(dp), dimension(nx), intent(in) :: xg,wx
+    real(dp), dimension(ny), intent(in) :: yg,wy
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,a,b,c,d,x0,y0
+
+    ! out
+    real(dp), intent(out) :: velx,vely
+
+    ! local
+    integer :: i,j
+    real(dp) :: loc,spr,skw,scl,dx,dy,r2,gr,sumx,sumy,gam0,gx,gy
+    real(dp), dimension(ny) :: yd,dyv,gam
+    intrinsic max
+    intrinsic tiny
+
+    yd = yg/dia ! normalizing y by the diameter
+    dyv = yg - y0
+
+    ! Linear expansion of the vorticity about the point and its analytic integral with the kernel over the domain
+    call vort_linear(dia,emg,a,b,c,d,x0,y0,gam0,gx,gy,velx,vely)
+
+    !$omp parallel do private(j,loc,spr,skw,scl,dx,dy,r2,gr,sumx,sumy,gam) reduction(+:velx,vely)
+    do i = 1,nx
+      call emgcolumn(xg(i),dia,emg(1),emg(2),emg(3),emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10),&
+      loc,spr,skw,scl)
+      call vorticity_column(ny,yd,loc,spr,skw,scl,gam)
+      dx = x0 - xg(i)
+      gam = gam - (gam0 - gx*dx + gy*dyv) ! smooth remainder of the vorticity
+
+      ! both velocity components accumulated in one pass over the column
+      sumx = 0.0_dp
+      sumy = 0.0_dp
+      do j = 1,ny
+        dy = dyv(j)
+        r2 = max(dx*dx + dy*dy, tiny(1.0_dp)) ! a node at the point itself does not contribute
+        gr = wy(j)*gam(j)/r2
+        sumx = sumx + gr*dy
+        sumy = sumy + gr
+      end do
+      velx = velx + wx(i)*sumx
+      vely = vely + wx(i)*dx*sumy
+    end do
+    !$omp end parallel do
+
+end subroutine vel_fused
+
+
+! Calculating the linear expansion of the vorticity (gam0 + gx*(x - x0) + gy*(y - y0)) about a point inside the
+! integration domain [a,b]x[c,d] and its analytic integral with the velocity kernels (zero outside of the domain)
+subroutine vort_linear(dia,emg,a,b,c,d,x0,y0,gam0,gx,gy,velx,vely)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,a,b,c,d,x0,y0
+
+    ! out
+    real(dp), intent(out) :: gam0,gx,gy,velx,vely
+
+    ! local
+    real(dp) :: loc,spr,skw,scl,h,kx,ky,kuu,kuv,kvv
+    real(dp), dimension(3) :: y0d,gam
+
+    gam0 = 0.0_dp
+    gx = 0.0_dp
+    gy = 0.0_dp
+    velx = 0.0_dp
+    vely = 0.0_dp
+    if ((x0 >= a) .and. (x0 <= b) .and. (y0 >= c) .and. (y0 <= d)) then
+      h = 1.0e-6_dp*dia
+      y0d(1) = y0/dia
+      y0d(2) = (y0 + h)/dia
+      y0d(3) = (y0 - h)/dia
+      call emgcolumn(x0,dia,emg(1),emg(2),emg(3),emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10),&
+      loc,spr,skw,scl)
+      call vorticity_column(3,y0d,loc,spr,skw,scl,gam)
+      gam0 = gam(1)
+      gy = (gam(2) - gam(3))/(2.0_dp*h)
+      call emgcolumn(x0+h,dia,emg(1),emg(2),emg(3),emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10),&
+      loc,spr,skw,scl)
+      call vorticity_column(1,y0d,loc,spr,skw,scl,gam(2))
+      call emgcolumn(x0-h,dia,emg(1),emg(2),emg(3),emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10),&
+      loc,spr,skw,scl)
+      call vorticity_column(1,y0d,loc,spr,skw,scl,gam(3))
+      gx = (gam(2) - gam(3))/(2.0_dp*h)
+
+      call kernel_int(a,b,c,d,x0,y0,kx,ky,kuv,kvv)
+      kuu = (b - a)*(d - c) - kvv
+      velx = gam0*kx + gx*kuv + gy*kvv
+      vely = gam0*ky - gx*kuu - gy*kuv
+    end if
+
+end subroutine vort_linear
+
+
+! Calculating induced velocity at a point relative to the turbine with the fused kernel folded about the wake
+! centerline (the vorticity is antisymmetric, so it is calculated once for each mirrored pair of nodes and
+! the contributions of the node at y and its image at -y are accumulated together)
+! yg and wy are the nodes and weights of the upper half of the domain [0,d] starting at the centerline (c = -d)
+subroutine vel_fused_sym(nx,ny,xg,yg,wx,wy,dia,emg,a,b,c,d,x0,y0,velx,vely)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: nx,ny
+    real(dp), dimension(nx), intent(in) :: xg,wx
+    real(dp), dimension(ny), intent(in) :: yg,wy
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,a,b,c,d,x0,y0
+
+    ! out
+    real(dp), intent(out) :: velx,vely
+
+    ! local
+    integer :: i,j
+    real(dp) :: loc,spr,skw,scl,dx,dyp,dym,r2p,r2m,gp,gm,lin,sumx,sumy,gam0,gx,gy
+    real(dp), dimension(ny) :: yd,gam
+    intrinsic max
+    intrinsic tiny
+
+    yd = yg/dia ! normalizing y by the diameter
+
+    ! Linear expansion of the vorticity about the point and its analytic integral with the kernel over the domain
+    call vort_linear(dia,emg,a,b,c,d,x0,y0,gam0,gx,gy,velx,vely)
+
+    !$omp parallel do private(j,loc,spr,skw,scl,dx,dyp,dym,r2p,r2m,gp,gm,lin,sumx,sumy,gam) reduction(+:velx,vely)
+    do i = 1,nx
+      call emgcolumn(xg(i),dia,emg(1),emg(2),emg(3),emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10),&
+      loc,spr,skw,scl)
+      call vorticity_column(ny,yd,loc,spr,skw,scl,gam)
+      dx = x0 - xg(i)
+      lin = gam0 - gx*dx
+
+      ! both images and both velocity components accumulated in one pass over the column
+      sumx = 0.0_dp
+      sumy = 0.0_dp
+      do j = 1,ny
+        dyp = yg(j) - y0
+        dym = -yg(j) - y0
+        r2p = max(dx*dx + dyp*dyp, tiny(1.0_dp)) ! a node at the point itself does not contribute
+        r2m = max(dx*dx + dym*dym, tiny(1.0_dp))
+        gp = wy(j)*(gam(j) - (lin + gy*dyp))/r2p
+        gm = wy(j)*(-gam(j) - (lin + gy*dym))/r2m
+        sumx = sumx + gp*dyp + gm*dym
+        sumy = sumy + gp + gm
+      end do
+      velx = velx + wx(i)*sumx
+      vely = vely + wx(i)*dx*sumy
+    end do
+    !$omp end parallel do
+
+end subroutine vel_fused_sym
+
+
+! Calculating the integrals of the velocity kernels (y-y0)/r^2 and (x0-x)/r^2 and of the moments (x-x0)(y-y0)/r^2
+! and (y-y0)^2/r^2 over the rectangle [a,b]x[c,d]
+subroutine kernel_int(a,b,c,d,x0,y0,kx,ky,kuv,kvv)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    real(dp), intent(in) :: a,b,c,d,x0,y0
+
+    ! out
+    real(dp), intent(out) :: kx,ky,kuv,kvv
+
+    ! local
+    integer :: i,j
+    real(dp) :: u,v,r2,sgn,fx,fy,fuv,fvv
+    real(dp), dimension(2) :: uc,vc
+    intrinsic log
+    intrinsic atan
+
+    uc(1) = a - x0
+    uc(2) = b - x0
+    vc(1) = c - y0
+    vc(2) = d - y0
+
+    ! Antiderivatives in u and v evaluated at the corners of the rectangle
+    kx = 0.0_dp
+    ky = 0.0_dp
+    kuv = 0.0_dp
+    kvv = 0.0_dp
+    do i = 1,2
+      do j = 1,2
+        u = uc(i)
+        v = vc(j)
+        sgn = real((-1)**(i+j),dp)
+        r2 = u*u + v*v
+        fx = 0.0_dp
+        fy = 0.0_dp
+        fuv = 0.0_dp
+        fvv = 0.5_dp*u*v
+        if (r2 > 0.0_dp) then
+          fx = 0.5_dp*u*log(r2)
+          fy = -0.5_dp*v*log(r2)
+          fuv = 0.25_dp*r2*log(r2)
+        end if
+        if (v /= 0.0_dp) then
+          fx = fx + v*atan(u/v)
+          fvv = fvv + 0.5_dp*v*v*atan(u/v)
+        end if
+        if (u /= 0.0_dp) then
+          fy = fy - u*atan(v/u)
+          fvv = fvv - 0.5_dp*u*u*atan(v/u)
+        end if
+        kx = kx + sgn*fx
+        ky = ky + sgn*fy
+        kuv = kuv + sgn*fuv
+        kvv = kvv + sgn*fvv
+      end do
+    end do
+
+end subroutine kernel_int
+
+
+! Calculating the second derivatives of the vorticity at a point with central differences
+subroutine vort_hessian(dia,emg,x0,y0,hxx,hxy,hyy)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,x0,y0
+
+    ! out
+    real(dp), intent(out) :: hxx,hxy,hyy
+
+    ! local
+    integer :: i
+    real(dp) :: h,loc,spr,skw,scl
+    real(dp), dimension(3) :: y0d
+    real(dp), dimension(3,3) :: gam
+
+    h = 1.0e-4_dp*dia
+    y0d(1) = (y0 - h)/dia
+    y0d(2) = y0/dia
+    y0d(3) = (y0 + h)/dia
+    do i = 1,3
+      call emgcolumn(x0+(i-2)*h,dia,emg(1),emg(2),emg(3),emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10),&
+      loc,spr,skw,scl)
+      call vorticity_column(3,y0d,loc,spr,skw,scl,gam(:,i))
+    end do
+
+    hxx = (gam(2,3) - 2.0_dp*gam(2,2) + gam(2,1))/(h*h)
+    hyy = (gam(3,2) - 2.0_dp*gam(2,2) + gam(1,2))/(h*h)
+    hxy = (gam(3,3) - gam(1,3) - gam(3,1) + gam(1,1))/(4.0_dp*h*h)
+
+end subroutine vort_hessian
+
+
+! Calculating the integrals of the linear expansion of the vorticity (gam0 + gx*(x - x0) + gy*(y - y0)) times the
+! velocity kernels along the edges of the rectangle [a,b]x[c,d] (bx: the downstream edges x = b minus x = a,
+! by: the lateral edges y = d minus y = c; the derivatives of the integral over the rectangle from its movement)
+subroutine kernel_edge(a,b,c,d,x0,y0,gam0,gx,gy,bx,by)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    real(dp), intent(in) :: a,b,c,d,x0,y0,gam0,gx,gy
+
+    ! out
+    real(dp), dimension(2), intent(out) :: bx,by
+
+    ! local
+    integer :: i,j
+    real(dp) :: u,v,r2,sgn,lg,atu,atv
+    real(dp), dimension(2) :: uc,vc
+    intrinsic log
+    intrinsic atan
+
+    uc(1) = a - x0
+    uc(2) = b - x0
+    vc(1) = c - y0
+    vc(2) = d - y0
+
+    ! Antiderivatives along each edge evaluated at the corners of the rectangle
+    bx = 0.0_dp
+    by = 0.0_dp
+    do i = 1,2
+      do j = 1,2
+        u = uc(i)
+        v = vc(j)
+        sgn = real((-1)**(i+j),dp)
+        r2 = u*u + v*v
+        lg = 0.0_dp
+        atu = 0.0_dp
+        atv = 0.0_dp
+        if (r2 > 0.0_dp) then
+          lg = log(r2)
+        end if
+        if (u /= 0.0_dp) then
+          atv = atan(v/u)
+        end if
+        if (v /= 0.0_dp) then
+          atu = atan(u/v)
+        end if
+        bx(1) = bx(1) + sgn*(0.5_dp*(gam0 + gx*u)*lg + gy*(v - u*atv))
+        bx(2) = bx(2) - sgn*((gam0 + gx*u)*atv + 0.5_dp*gy*u*lg)
+        by(1) = by(1) + sgn*((gam0 + gy*v)*atu + 0.5_dp*gx*v*lg)
+        by(2) = by(2) - sgn*(0.5_dp*(gam0 + gy*v)*lg + gx*(u - v*atu))
+      end do
+    end do
+
+end subroutine kernel_edge
+
+
+! Calculating the nodes and weights of the Gauss-Legendre rule on [-1,1]
+subroutine gaussleg(nq,xq,wq)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: nq
+
+    ! out
+    real(dp), dimension(nq), intent(out) :: xq,wq
+
+    ! local
+    integer :: i,j,l
+    real(dp) :: pi,z,p0,p1,p2,dp1
+    intrinsic cos
+    intrinsic abs
+    pi = 3.1415926535897932_dp
+
+    ! Newton iteration on the Legendre polynomial from the Chebyshev estimate of each root
+    do i = 1,(nq+1)/2
+      z = cos(pi*(i - 0.25_dp)/(nq + 0.5_dp))
+      do l = 1,100
+        p0 = 1.0_dp
+        p1 = z
+        do j = 2,nq
+          p2 = ((2*j - 1)*z*p1 - (j - 1)*p0)/j
+          p0 = p1
+          p1 = p2
+        end do
+        if (nq == 1) then
+          p0 = 1.0_dp
+          p1 = z
+        end if
+        dp1 = nq*(z*p1 - p0)/(z*z - 1.0_dp)
+        z = z - p1/dp1
+        if (abs(p1/dp1) < 1.0e-15_dp) then
+          exit
+        end if
+      end do
+      xq(i) = -z
+      xq(nq+1-i) = z
+      wq(i) = 2.0_dp/((1.0_dp - z*z)*dp1*dp1)
+      wq(nq+1-i) = wq(i)
+    end do
+
+end subroutine gaussleg
+
+
+! Calculating induced velocity at points relative to the turbine with a composite Gauss-Legendre tensor rule
+! (m_in downstream and n_in lateral panels of nq points each, the EMG parameters calculated once per column)
+subroutine vel_gauss(m_in,n_in,nq,dia,emg,a,b,c,d,npt,x0,y0,velx,vely)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: m_in,n_in,nq,npt
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,a,b,c,d
+    real(dp), dimension(npt), intent(in) :: x0,y0
+
+    ! out
+    real(dp), dimension(npt), intent(out) :: velx,vely
+
+    ! local
+    integer :: i,j,l
+    real(dp) :: h,k
+    real(dp), dimension(nq) :: xq,wq
+    real(dp), dimension(m_in*nq) :: xg,wx
+    real(dp), dimension(n_in*nq) :: yg,wy
+
+    call gaussleg(nq,xq,wq)
+
+    ! Creating the panel nodes and weights (mapping [-1,1] onto each panel)
+    h = (b - a)/m_in
+    k = (d - c)/n_in
+    do i = 1,m_in
+      do l = 1,nq
+        xg((i-1)*nq+l) = a + (i - 1)*h + 0.5_dp*h*(xq(l) + 1.0_dp)
+        wx((i-1)*nq+l) = 0.5_dp*h*wq(l)
+      end do
+    end do
+    do j = 1,n_in
+      do l = 1,nq
+        yg((j-1)*nq+l) = c + (j - 1)*k + 0.5_dp*k*(xq(l) + 1.0_dp)
+        wy((j-1)*nq+l) = 0.5_dp*k*wq(l)
+      end do
+    end do
+
+    !$omp parallel do
+    do l = 1,npt
+      call vel_fused(m_in*nq,n_in*nq,xg,yg,wx,wy,dia,emg,a,b,c,d,x0(l),y0(l),velx(l),vely(l))
+    end do
+    !$omp end parallel do
+
+end subroutine vel_gauss
+
+
+! Calculating the lateral integral of a column of vorticity with the induced velocity kernel
+! (vorticity linear between the nodes and the kernel integrated analytically over each panel)
+subroutine lateral_int(ny,t,gam,dx,ulat,vlat)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: ny
+    real(dp), dimension(ny), intent(in) :: t,gam ! t: lateral node position relative to the point
+    real(dp), intent(in) :: dx ! downstream distance from the column to the point (nonzero)
+
+    ! out
+    real(dp), intent(out) :: ulat,vlat
+
+    ! local
+    integer :: j
+    real(dp) :: k,sl,m0u,m1u,m0v,m1v
+    real(dp), dimension(ny) :: lg,at
+    intrinsic log
+    intrinsic atan
+
+    do j = 1,ny
+      lg(j) = log(t(j)*t(j) + dx*dx)
+      at(j) = atan(t(j)/dx)
+    end do
+
+    ulat = 0.0_dp
+    vlat = 0.0_dp
+    do j = 1,ny-1
+      k = t(j+1) - t(j)
+      sl = (gam(j+1) - gam(j))/k
+
+      ! moments of t/(t^2 + dx^2) and dx/(t^2 + dx^2) over the panel
+      m0u = 0.5_dp*(lg(j+1) - lg(j))
+      m1u = k - dx*(at(j+1) - at(j))
+      m0v = at(j+1) - at(j)
+      m1v = 0.5_dp*dx*(lg(j+1) - lg(j))
+
+      ulat = ulat + gam(j)*m0u + sl*(m1u - t(j)*m0u)
+      vlat = vlat + gam(j)*m0v + sl*(m1v - t(j)*m0v)
+    end do
+
+end subroutine lateral_int
+
+
+! Calculating induced velocity at a point relative to the turbine with semi-analytic integration
+! The lateral integral of each column is analytic and the downstream integral uses Gauss-Legendre panels
+! split at the point (where the lateral integral of the y-velocity is discontinuous) and graded towards it
+subroutine vel_semi(m_in,n_in,dia,emg,a,b,c,d,x0,y0,velx,vely)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: m_in,n_in ! downstream Gauss points on each side of the point, lateral panels
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,a,b,c,d,x0,y0
+
+    ! out
+    real(dp), intent(out) :: velx,vely
+
+    ! local
+    integer, parameter :: nq = 8
+    integer :: i,j,l,q,npan,npc
+    real(dp) :: k,lo,hi,xa,xb,xs,loc,spr,skw,scl,ulat,vlat,r1,r2
+    real(dp), dimension(nq) :: xq,wq
+    real(dp), dimension(n_in+1) :: yd,t,gam
+    real(dp), dimension(2) :: plo,phi
+    integer, dimension(2) :: grade
+    intrinsic max
+
+    call gaussleg(nq,xq,wq)
+
+    k = (d - c)/n_in
+    do j = 1,n_in+1
+      yd(j) = (c + (j - 1)*k)/dia
+      t(j) = c + (j - 1)*k - y0
+    end do
+    yd(n_in+1) = d/dia
+    t(n_in+1) = d - y0
+
+    ! Downstream pieces of the wake (grade 1: towards the upper end, 2: towards the lower end)
+    if ((x0 > a) .and. (x0 < b)) then
+      npc = 2
+      plo = (/a,x0/)
+      phi = (/x0,b/)
+      grade = (/1,2/)
+    else
+      npc = 1
+      plo(1) = a
+      phi(1) = b
+      grade(1) = 0
+    end if
+    npan = max(m_in/nq,1)
+
+    velx = 0.0_dp
+    vely = 0.0_dp
+    do l = 1,npc
+      lo = plo(l)
+      hi = phi(l)
+      do i = 1,npan
+        r1 = real(i - 1,dp)/npan
+        r2 = real(i,dp)/npan
+        if (grade(l) == 1) then
+          xa = hi - (hi - lo)*(1.0_dp - r1)**2
+          xb = hi - (hi - lo)*(1.0_dp - r2)**2
+        else if (grade(l) == 2) then
+          xa = lo + (hi - lo)*r1**2
+          xb = lo + (hi - lo)*r2**2
+        else
+          xa = lo + (hi - lo)*r1
+          xb = lo + (hi - lo)*r2
+        end if
+
+        do q = 1,nq
+          xs = (xa + xb)/2.0_dp + (xb - xa)/2.0_dp*xq(q)
+          call emgcolumn(xs,dia,emg(1),emg(2),emg(3),emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10),&
+          loc,spr,skw,scl)
+          call vorticity_column(n_in+1,yd,loc,spr,skw,scl,gam)
+          call lateral_int(n_in+1,t,gam,x0 - xs,ulat,vlat)
+          velx = velx + (xb - xa)/2.0_dp*wq(q)*ulat
+          vely = vely + (xb - xa)/2.0_dp*wq(q)*vlat
+        end do
+      end do
+    end do
+
+end subroutine vel_semi
+
+
+! Calculating induced velocity at a point relative to the turbine with Simpson's rule on graded nodes
+! The lateral nodes of each downstream column are clustered around the two EMG peaks (at +/- loc) with a sinh
+! stretching over the spread, and the wake is trimmed downstream where the EMG scale falls below tolscl*scl1
+subroutine vel_graded(m_in,n_in,dia,emg,a,b,x0,y0,velx,vely)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: m_in,n_in ! downstream divisions, lateral divisions on each side of the wake
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,a,b,x0,y0
+
+    ! out
+    real(dp), intent(out) :: velx,vely
+
+    ! local
+    real(dp), parameter :: tolscl = 1.0e-4_dp ! relative vorticity scale where the wake is trimmed
+    real(dp), parameter :: wspr = 3.0_dp ! width of the node clustering in spreads
+    integer :: i,j
+    real(dp) :: bt,h,xs,loc,spr,skw,scl,yp,w,beta,s0,sj,dx,dy,r2,sumx,sumy
+    real(dp), dimension(m_in+1) :: wx
+    real(dp), dimension(n_in+1) :: ws
+    real(dp), dimension(2*n_in+1) :: yg,wy,yd,gam
+    intrinsic log
+    intrinsic abs
+    intrinsic min
+    intrinsic max
+    intrinsic tiny
+    intrinsic sinh
+    intrinsic cosh
+    intrinsic asinh
+
+    velx = 0.0_dp
+    vely = 0.0_dp
+
+    ! Trimming the wake where scl1/(1 + exp(scl2*(x/dia - scl3))) < tolscl*scl1
+    bt = min(b,(emg(10) + log(1.0_dp/tolscl - 1.0_dp)/emg(9))*dia)
+    if (bt <= a) then
+      return
+    end if
+    h = (bt - a)/m_in
+
+    call quadweights(m_in,1,wx)
+    call quadweights(n_in,1,ws)
+
+    do i = 1,m_in+1
+      xs = a + (i - 1)*h
+      if (i == m_in+1) then
+        xs = bt
+      end if
+      call emgcolumn(xs,dia,emg(1),emg(2),emg(3),emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10),&
+      loc,spr,skw,scl)
+
+      ! sinh stretching of [0,dia] clustered at the peak yp (mirrored for the negative side)
+      yp = min(loc*dia,dia)
+      w = wspr*abs(spr)*dia
+      beta = asinh(yp/w) + asinh((dia - yp)/w)
+      s0 = asinh(yp/w)/beta
+      do j = 1,n_in+1
+        sj = real(j - 1,dp)/n_in
+        yg(n_in+j) = yp + w*sinh(beta*(sj - s0))
+        wy(n_in+j) = w*beta*cosh(beta*(sj - s0))*ws(j)/(3.0_dp*n_in)
+        yg(n_in+2-j) = -yg(n_in+j)
+        wy(n_in+2-j) = wy(n_in+j)
+      end do
+      yg(n_in+1) = 0.0_dp
+      wy(n_in+1) = 2.0_dp*wy(n_in+1) ! the centerline node is shared by both sides
+      yd = yg/dia
+
+      call vorticity_column(2*n_in+1,yd,loc,spr,skw,scl,gam)
+
+      dx = x0 - xs
+      sumx = 0.0_dp
+      sumy = 0.0_dp
+      do j = 1,2*n_in+1
+        dy = yg(j) - y0
+        r2 = max(dx*dx + dy*dy, tiny(1.0_dp)) ! a node at the point itself does not contribute
+        sumx = sumx + wy(j)*gam(j)*dy/r2
+        sumy = sumy + wy(j)*gam(j)/r2
+      end do
+      velx = velx + wx(i)*h/3.0_dp*sumx
+      vely = vely + wx(i)*h/3.0_dp*dx*sumy
+    end do
+
+end subroutine vel_graded
+
+
+! Performing integration to convert vorticity into velocity at multiple points of a single turbine wake
+subroutine vel_field_mult(npt,xt,yt,x0t,y0t,dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,&
+  skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte,velx,vely,nq)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: npt,blades,m_in,n_in,inte
+    integer, intent(in) :: nq ! Gauss-Legendre points per panel (inte = 5)
+    !f2py integer optional, intent(in) :: nq = 8
+    real(dp), intent(in) :: xt,yt,dia,rot,chord,Vinf
+    real(dp), dimension(npt), intent(in) :: x0t,y0t
+    real(dp), dimension(10), intent(in) :: loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d
+
+    ! out
+    real(dp), dimension(npt), intent(out) :: velx,vely
+
+    ! local
+    integer :: l
+    real(dp) :: pi2,a,b,c,d,fac
+    real(dp), dimension(10) :: emg
+    real(dp), dimension(:), allocatable :: xg,yg,wx,wy
+    real(dp), dimension(:,:), allocatable :: gw
+    intrinsic abs
+    pi2 = 6.28318530718_dp
+
+    if ((inte == 3) .or. (inte == 4)) then
+      ! Semi-analytic or graded integration at each point (translating the turbine to 0,0)
+      call emgturbine(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,&
+      emg,a,b,c,d)
+      !$omp parallel do schedule(dynamic)
+      do l = 1,npt
+        if (inte == 3) then
+          call vel_semi(m_in,n_in,dia,emg,a,b,c,d,x0t(l)-xt,y0t(l)-yt,velx(l),vely(l))
+        else
+          call vel_graded(m_in,n_in,dia,emg,a,b,x0t(l)-xt,y0t(l)-yt,velx(l),vely(l))
+        end if
+      end do
+      !$omp end parallel do
+      velx = velx*(abs(rot)/pi2)/Vinf
+      vely = vely*(abs(rot)/pi2)/Vinf
+    else if (inte == 6) then
+      ! Simpson's rule folded about the wake centerline at each point (translating the turbine to 0,0)
+      call emgturbine(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,&
+      emg,a,b,c,d)
+      allocate(xg(m_in+1),yg(n_in+1),wx(m_in+1),wy(n_in+1))
+      call quadgrid(m_in,n_in,1,a,b,c,d,xg,yg,wx,wy)
+      yg(n_in/2+1) = 0.0_dp
+      wy(n_in/2+1) = 0.5_dp*wy(n_in/2+1)
+      !$omp parallel do
+      do l = 1,npt
+        call vel_fused_sym(m_in+1,n_in/2+1,xg,yg(n_in/2+1:n_in+1),wx,wy(n_in/2+1:n_in+1),dia,emg,a,b,c,d,&
+        x0t(l)-xt,y0t(l)-yt,velx(l),vely(l))
+      end do
+      !$omp end parallel do
+      deallocate(xg,yg,wx,wy)
+      velx = velx*(abs(rot)/pi2)/Vinf
+      vely = vely*(abs(rot)/pi2)/Vinf
+    else if (inte == 5) then
+      ! Composite Gauss-Legendre rule with m_in by n_in panels (translating the turbine to 0,0)
+      call emgturbine(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,&
+      emg,a,b,c,d)
+      call vel_gauss(m_in,n_in,nq,dia,emg,a,b,c,d,npt,x0t-xt,y0t-yt,velx,vely)
+      velx = velx*(abs(rot)/pi2)/Vinf
+      vely = vely*(abs(rot)/pi2)/Vinf
+    else
+      ! Calculating the wake source once for all of the points
+      allocate(xg(m_in+1),yg(n_in+1),wx(m_in+1),wy(n_in+1),gw(n_in+1,m_in+1))
+      call vorticity_grid(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,&
+      skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte,xg,yg,gw,wx,wy,emg,fac)
+
+      ! Translating the turbine position (placing turbine at 0,0)
+      call vel_source(m_in+1,n_in+1,xg,yg,gw,wx,wy,dia,emg,fac,npt,x0t-xt,y0t-yt,velx,vely)
+
+      deallocate(xg,yg,wx,wy,gw)
+    end if
+
+end subroutine vel_field_mult
+
+
+! Calculating the quadrature weights of the integration divisions
+subroutine quadweights(n_in,inte,w)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: n_in,inte
+
+    ! out
+    real(dp), dimension(n_in+1), intent(out) :: w
+
+    ! local
+    integer :: i
+
+    w = 0.0_dp
+
+    if (inte == 1) then
+      ! Simpson's Rule (1,4,2,4,...,2,4,1)
+      do i = 2,n_in
+        if (mod(i,2) == 0) then
+          w(i) = 4.0_dp
+        else
+          w(i) = 2.0_dp
+        end if
+      end do
+      w(1) = 1.0_dp
+      w(n_in+1) = 1.0_dp
+    else if (inte == 2) then
+      ! Trapezoidal Rule (1,2,2,...,2,1)
+      do i = 2,n_in
+        w(i) = 2.0_dp
+      end do
+      w(1) = 1.0_dp
+      w(n_in+1) = 1.0_dp
+    end if
+
+end subroutine quadweights
+
+
+! Calculating the weighted vorticity at the integration nodes of a turbine wake (the wake source)
+! The source depends only on the turbine type and rotation rate and is reused for every calculation point
+! (gw = wx*wy*gam; wy includes the normalization fac of the velocity, used with emg for the vorticity at a point)
+subroutine vorticity_grid(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,&
+  skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte,xg,yg,gw,wx,wy,emg,fac)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    real(dp), intent(in) :: dia,rot,chord,Vinf
+    real(dp), dimension(10), intent(in) :: loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d
+    integer, intent(in) :: blades,m_in,n_in,inte
+
+    ! out
+    real(dp), dimension(m_in+1), intent(out) :: xg
+    real(dp), dimension(n_in+1), intent(out) :: yg
+    real(dp), dimension(n_in+1,m_in+1), intent(out) :: gw
+    real(dp), dimension(m_in+1), intent(out) :: wx
+    real(dp), dimension(n_in+1), intent(out) :: wy
+    real(dp), dimension(10), intent(out) :: emg
+    real(dp), intent(out) :: fac
+
+    ! local
+    integer :: i
+    real(dp) :: pi2,a,b,c,d,loc,spr,skw,scl
+    real(dp), dimension(n_in+1) :: yd
+    intrinsic abs
+    pi2 = 6.28318530718_dp
+
+    ! Limited EMG parameter components of the turbine and bounds of integration
+    call emgturbine(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,&
+    emg,a,b,c,d)
+
+    ! Creating the integration nodes and weights
+    call quadgrid(m_in,n_in,inte,a,b,c,d,xg,yg,wx,wy)
+    fac = (abs(rot)/pi2)/Vinf
+    wy = wy*fac
+    yd = yg/dia ! normalizing y by the diameter
+
+    ! Weighted vorticity strength at each node
+    !$omp parallel do private(loc,spr,skw,scl)
+    do i = 1,m_in+1
+      call emgcolumn(xg(i),dia,emg(1),emg(2),emg(3),emg(4),emg(5),emg(6),emg(7),emg(8),emg(9),emg(10),&
+      loc,spr,skw,scl)
+      call vorticity_column(n_in+1,yd,loc,spr,skw,scl,gw(:,i))
+      gw(:,i) = wx(i)*wy*gw(:,i)
+    end do
+    !$omp end parallel do
+
+end subroutine vorticity_grid
+
+
+! Calculating induced velocity at points (relative to the turbine) from the weighted vorticity of a wake source
+! Nodes closer to the point than the rounding of the coordinates are taken to be at the point and do not contribute
+! When the point lies inside the wake, the linear expansion of the vorticity about the point is subtracted from the
+! weighted vorticity (with the node weights wx*wy) and integrated analytically, as in vel_fused
+subroutine vel_source(nx,ny,xg,yg,gw,wx,wy,dia,emg,fac,npt,x0,y0,velx,vely)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: nx,ny,npt
+    real(dp), dimension(nx), intent(in) :: xg,wx
+    real(dp), dimension(ny), intent(in) :: yg,wy
+    real(dp), dimension(ny,nx), intent(in) :: gw
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,fac
+    real(dp), dimension(npt), intent(in) :: x0,y0
+
+    ! out
+    real(dp), dimension(npt), intent(out) :: velx,vely
+
+    ! local
+    integer :: i,j,l
+    real(dp) :: dx,dy,r2,r2min,ext,gr,velxi,velyi,gam0,gx,gy,lin,wxi
+    intrinsic max
+    intrinsic abs
+    intrinsic epsilon
+    intrinsic merge
+
+    ext = max(abs(xg(1)),abs(xg(nx)),abs(yg(1)),abs(yg(ny)))
+
+    !$omp parallel do private(i,j,dx,dy,r2,r2min,gr,velxi,velyi,gam0,gx,gy,lin,wxi)
+    do l = 1,npt
+      r2min = (8.0_dp*epsilon(1.0_dp)*max(ext,abs(x0(l)),abs(y0(l))))**2
+
+      ! Linear expansion of the vorticity about the point and its analytic integral with the kernel over the wake
+      call vort_linear(dia,emg,xg(1),xg(nx),yg(1),yg(ny),x0(l),y0(l),gam0,gx,gy,velxi,velyi)
+      velxi = fac*velxi
+      velyi = fac*velyi
+
+      if ((gam0 == 0.0_dp) .and. (gx == 0.0_dp) .and. (gy == 0.0_dp)) then
+        ! nothing subtracted outside of the wake (the plain sum is kept separate as the faster loop)
+        do i = 1,nx
+          dx = x0(l) - xg(i)
+          !$omp simd private(dy,r2,gr) reduction(+:velxi,velyi)
+          do j = 1,ny
+            dy = yg(j) - y0(l)
+            r2 = dx*dx + dy*dy
+            r2 = merge(r2, huge(1.0_dp), r2 > r2min) ! a node at the point itself does not contribute
+            gr = gw(j,i)/r2
+            velxi = velxi + gr*dy
+            velyi = velyi + gr*dx
+          end do
+        end do
+      else
+        do i = 1,nx
+          dx = x0(l) - xg(i)
+          lin = gam0 - gx*dx
+          wxi = wx(i)
+          !$omp simd private(dy,r2,gr) reduction(+:velxi,velyi)
+          do j = 1,ny
+            dy = yg(j) - y0(l)
+            r2 = dx*dx + dy*dy
+            r2 = merge(r2, huge(1.0_dp), r2 > r2min) ! a node at the point itself does not contribute
+            gr = (gw(j,i) - wxi*wy(j)*(lin + gy*dy))/r2 ! smooth remainder of the vorticity
+            velxi = velxi + gr*dy
+            velyi = velyi + gr*dx
+          end do
+        end do
+      end if
+      velx(l) = velxi
+      vely(l) = velyi
+    end do
+    !$omp end parallel do
+
+end subroutine vel_source
+
+
+! Calculating induced velocity and its derivatives with respect to the point position at points (relative to the
+! turbine) from the weighted vorticity of a wake source in the same pass over the nodes
+! The sum of g/(z - zk) with fixed weights g is analytic in z = x0 + i*y0 (vely + i*velx), so its derivative
+! -sum of g/(z - zk)**2 = dvely/dx0 + i*dvelx/dx0 gives its Jacobian (dvelx/dy0 = dvely/dx0, dvely/dy0 = -dvelx/dx0)
+! Inside the wake, the weights also depend on the point through the subtracted linear expansion of the vorticity
+! (vel_source), which adds the derivatives of the expansion (with the Hessian of the vorticity) and of its
+! analytic integral (with the integrals along the edges of the wake)
+subroutine vel_source_jac(nx,ny,xg,yg,gw,wx,wy,dia,emg,fac,npt,x0,y0,velx,vely,dvxdx,dvydx,dvxdy,dvydy)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: nx,ny,npt
+    real(dp), dimension(nx), intent(in) :: xg,wx
+    real(dp), dimension(ny), intent(in) :: yg,wy
+    real(dp), dimension(ny,nx), intent(in) :: gw
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,fac
+    real(dp), dimension(npt), intent(in) :: x0,y0
+
+    ! out
+    real(dp), dimension(npt), intent(out) :: velx,vely,dvxdx,dvydx,dvxdy,dvydy
+
+    ! local
+    integer :: i,j,l
+    real(dp) :: dx,dy,r2,r2min,ext,ri,gr,g4,wl,velxi,velyi,dxxi,dxyi,gam0,gx,gy,lin,wxi
+    real(dp) :: suv,svv,sw,hxx,hxy,hyy,kx,ky,kuv,kvv,kuu
+    real(dp), dimension(2) :: eu,ev,bx,by
+    intrinsic max
+    intrinsic abs
+    intrinsic epsilon
+    intrinsic merge
+
+    ext = max(abs(xg(1)),abs(xg(nx)),abs(yg(1)),abs(yg(ny)))
+
+    !$omp parallel do private(i,j,dx,dy,r2,r2min,ri,gr,g4,wl,velxi,velyi,dxxi,dxyi,gam0,gx,gy,lin,wxi,&
+    !$omp suv,svv,sw,hxx,hxy,hyy,kx,ky,kuv,kvv,kuu,eu,ev,bx,by)
+    do l = 1,npt
+      r2min = (8.0_dp*epsilon(1.0_dp)*max(ext,abs(x0(l)),abs(y0(l))))**2
+
+      ! Linear expansion of the vorticity about the point and its analytic integral with the kernel over the wake
+      call vort_linear(dia,emg,xg(1),xg(nx),yg(1),yg(ny),x0(l),y0(l),gam0,gx,gy,velxi,velyi)
+      velxi = fac*velxi
+      velyi = fac*velyi
+      dxxi = 0.0_dp
+      dxyi = 0.0_dp
+      suv = 0.0_dp
+      svv = 0.0_dp
+      sw = 0.0_dp
+      do i = 1,nx
+        dx = x0(l) - xg(i)
+        lin = gam0 - gx*dx
+        wxi = wx(i)
+        !$omp simd private(dy,r2,ri,gr,g4,wl) reduction(+:velxi,velyi,dxxi,dxyi,suv,svv,sw)
+        do j = 1,ny
+          dy = yg(j) - y0(l)
+          r2 = dx*dx + dy*dy
+          ri = merge(1.0_dp/r2, 0.0_dp, r2 > r2min) ! a node at the point itself does not contribute
+          wl = merge(wxi*wy(j), 0.0_dp, r2 > r2min)
+          gr = (gw(j,i) - wl*(lin + gy*dy))*ri
+          g4 = gr*ri
+          velxi = velxi + gr*dy
+          velyi = velyi + gr*dx
+          dxxi = dxxi + g4*(dy*dy - dx*dx)
+          dxyi = dxyi + g4*dx*dy
+          ! moments of the node weights (quadrature of the kernel moments of the linear expansion)
+          suv = suv - wl*ri*dx*dy
+          svv = svv + wl*ri*dy*dy
+          sw = sw + wl
+        end do
       end do
-      do j = 1,n_in-1
-        if ((ydiv(j) > intlim) .or. (ydiv(j) < -intlim)) then
-          call integrandx(ydiv(j),a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-          xsum3 = xsum3 + xsum
-          call integrandy(ydiv(j),a,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-          ysum3 = ysum3 + ysum
-        end if
+      velx(l) = velxi
+      vely(l) = velyi
+      dvxdx(l) = -2.0_dp*dxyi
+      dvydx(l) = dxxi
+      dvxdy(l) = dxxi
+      dvydy(l) = 2.0_dp*dxyi
+
+      if ((x0(l) >= xg(1)) .and. (x0(l) <= xg(nx)) .and. (y0(l) >= yg(1)) .and. (y0(l) <= yg(ny))) then
+        ! derivatives of the linear expansion (quadrature errors of the kernel moments times the Hessian)
+        call vort_hessian(dia,emg,x0(l),y0(l),hxx,hxy,hyy)
+        call kernel_int(xg(1),xg(nx),yg(1),yg(ny),x0(l),y0(l),kx,ky,kuv,kvv)
+        kuu = (xg(nx) - xg(1))*(yg(ny) - yg(1)) - kvv
+        eu(1) = fac*kuv - suv
+        eu(2) = -fac*kuu + (sw - svv)
+        ev(1) = fac*kvv - svv
+        ev(2) = -fac*kuv + suv
+
+        ! derivatives of the analytic integral (moving the wake relative to the point)
+        call kernel_edge(xg(1),xg(nx),yg(1),yg(ny),x0(l),y0(l),gam0,gx,gy,bx,by)
+
+        dvxdx(l) = dvxdx(l) + fac*(gx*kx - bx(1)) + hxx*eu(1) + hxy*ev(1)
+        dvydx(l) = dvydx(l) + fac*(gx*ky - bx(2)) + hxx*eu(2) + hxy*ev(2)
+        dvxdy(l) = dvxdy(l) + fac*(gy*kx - by(1)) + hxy*eu(1) + hyy*ev(1)
+        dvydy(l) = dvydy(l) + fac*(gy*ky - by(2)) + hxy*eu(2) + hyy*ev(2)
+      end if
+    end do
+    !$omp end parallel do
+
+end subroutine vel_source_jac
+
+
+! Calculating induced velocity at points (relative to the turbine) from the weighted vorticity of a wake source
+! in single precision (for velocity maps; the sum of each column is accumulated in double precision)
+! Nodes closer to the point than the rounding of the coordinates are taken to be at the point and do not contribute
+! When the point lies inside the wake, the linear expansion of the vorticity about the point is subtracted as in
+! vel_source (the expansion and its analytic integral are calculated in double precision)
+subroutine vel_source_sp(nx,ny,xg,yg,gw,wx,wy,dia,emg,fac,npt,x0,y0,velx,vely)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: sp = kind(0.0)
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: nx,ny,npt
+    real(sp), dimension(nx), intent(in) :: xg,wx
+    real(sp), dimension(ny), intent(in) :: yg,wy
+    real(sp), dimension(ny,nx), intent(in) :: gw
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,fac
+    real(sp), dimension(npt), intent(in) :: x0,y0
+
+    ! out
+    real(sp), dimension(npt), intent(out) :: velx,vely
+
+    ! local
+    integer :: i,j,l
+    real(sp) :: dx,dy,r2,r2min,ext,gr,sumx,sumy,lin,gxs,gys,wxi
+    real(dp) :: velxi,velyi,gam0,gx,gy
+    intrinsic max
+    intrinsic abs
+    intrinsic epsilon
+    intrinsic merge
+    intrinsic real
+
+    ext = max(abs(xg(1)),abs(xg(nx)),abs(yg(1)),abs(yg(ny)))
+
+    !$omp parallel do private(i,j,dx,dy,r2,r2min,gr,sumx,sumy,lin,gxs,gys,wxi,velxi,velyi,gam0,gx,gy)
+    do l = 1,npt
+      r2min = (8.0_sp*epsilon(1.0_sp)*max(ext,abs(x0(l)),abs(y0(l))))**2
+
+      ! Linear expansion of the vorticity about the point and its analytic integral with the kernel over the wake
+      call vort_linear(dia,emg,real(xg(1),dp),real(xg(nx),dp),real(yg(1),dp),real(yg(ny),dp),&
+      real(x0(l),dp),real(y0(l),dp),gam0,gx,gy,velxi,velyi)
+      velxi = fac*velxi
+      velyi = fac*velyi
+      gxs = real(gx,sp)
+      gys = real(gy,sp)
+
+      if ((gam0 == 0.0_dp) .and. (gx == 0.0_dp) .and. (gy == 0.0_dp)) then
+        ! nothing subtracted outside of the wake (the plain sum is kept separate as the faster loop)
+        do i = 1,nx
+          dx = x0(l) - xg(i)
+          sumx = 0.0_sp
+          sumy = 0.0_sp
+          !$omp simd private(dy,r2,gr) reduction(+:sumx,sumy)
+          do j = 1,ny
+            dy = yg(j) - y0(l)
+            r2 = dx*dx + dy*dy
+            r2 = merge(r2, huge(1.0_sp), r2 > r2min) ! a node at the point itself does not contribute
+            gr = gw(j,i)/r2
+            sumx = sumx + gr*dy
+            sumy = sumy + gr
+          end do
+          velxi = velxi + sumx
+          velyi = velyi + dx*sumy
+        end do
+      else
+        do i = 1,nx
+          dx = x0(l) - xg(i)
+          lin = real(gam0,sp) - gxs*dx
+          wxi = wx(i)
+          sumx = 0.0_sp
+          sumy = 0.0_sp
+          !$omp simd private(dy,r2,gr) reduction(+:sumx,sumy)
+          do j = 1,ny
+            dy = yg(j) - y0(l)
+            r2 = dx*dx + dy*dy
+            r2 = merge(r2, huge(1.0_sp), r2 > r2min) ! a node at the point itself does not contribute
+            gr = (gw(j,i) - wxi*wy(j)*(lin + gys*dy))/r2 ! smooth remainder of the vorticity
+            sumx = sumx + gr*dy
+            sumy = sumy + gr
+          end do
+          velxi = velxi + sumx
+          velyi = velyi + dx*sumy
+        end do
+      end if
+      velx(l) = real(velxi,sp)
+      vely(l) = real(velyi,sp)
+    end do
+    !$omp end parallel do
+
+end subroutine vel_source_sp
+
+
+! Calculating the size of the quadtree of a wake source and the order of its multipole expansions
+! (the expansion error of a cell accepted at separation d is below tol*sum(abs(gw))/(d - rad))
+subroutine tree_size(nx,ny,tol,nleaf,ncmax,nterm,theta)
+    implicit none
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: nx,ny
+    real(dp), intent(in) :: tol
+
+    ! out
+    integer, intent(out) :: nleaf,ncmax,nterm
+    real(dp), intent(out) :: theta
+
+    ! local
+    intrinsic log
+    intrinsic ceiling
+
+    nleaf = 32 ! maximum number of nodes in a cell summed directly
+    theta = 0.5_dp ! opening angle (cell radius over separation) for using the multipole expansion
+
+    ncmax = 20*(nx*ny)/nleaf + 16
+    nterm = min(max(ceiling(log(tol)/log(theta)),2),40)
+
+end subroutine tree_size
+
+
+! Creating the quadtree of a wake source with the multipole expansion of each cell
+subroutine tree_build(nx,ny,xg,yg,gw,nleaf,ncmax,nterm,ncell,cidx,child,zc,rad,coef)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: nx,ny,nleaf,ncmax,nterm
+    real(dp), dimension(nx), intent(in) :: xg
+    real(dp), dimension(ny), intent(in) :: yg
+    real(dp), dimension(ny,nx), intent(in) :: gw
+
+    ! out
+    integer, intent(out) :: ncell
+    integer, dimension(4,ncmax), intent(out) :: cidx,child
+    complex(dp), dimension(ncmax), intent(out) :: zc
+    real(dp), dimension(ncmax), intent(out) :: rad
+    complex(dp), dimension(nterm,ncmax), intent(out) :: coef
+
+    ! local
+    integer :: c,i,j,l,nc,i1,i2,j1,j2,im,jm
+    complex(dp) :: dz,dzp
+    intrinsic cmplx
+    intrinsic sqrt
+
+    cidx = 0
+    child = 0
+    coef = (0.0_dp,0.0_dp)
+
+    ! root cell holding every node of the source (i: downstream, j: lateral)
+    ncell = 1
+    cidx(:,1) = (/1,nx,1,ny/)
+
+    c = 1
+    do while (c <= ncell)
+      i1 = cidx(1,c)
+      i2 = cidx(2,c)
+      j1 = cidx(3,c)
+      j2 = cidx(4,c)
+
+      zc(c) = cmplx((xg(i1) + xg(i2))/2.0_dp,(yg(j1) + yg(j2))/2.0_dp,dp)
+      rad(c) = sqrt((xg(i2) - xg(i1))**2 + (yg(j2) - yg(j1))**2)/2.0_dp
+
+      ! multipole coefficients (sum of gw*(z - zc)**p)
+      do i = i1,i2
+        do j = j1,j2
+          dz = cmplx(xg(i),yg(j),dp) - zc(c)
+          dzp = cmplx(gw(j,i),0.0_dp,dp)
+          do l = 1,nterm
+            coef(l,c) = coef(l,c) + dzp
+            dzp = dzp*dz
+          end do
+        end do
       end do
-      do j = 1,n_in-1
-        if ((ydiv(j) > intlim) .or. (ydiv(j) < -intlim)) then
-          call integrandx(ydiv(j),b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-          xsum4 = xsum4 + xsum
-          call integrandy(ydiv(j),b,x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-          ysum4 = ysum4 + ysum
+
+      ! dividing the cell in half in each direction with more than one node
+      if ((i2 - i1 + 1)*(j2 - j1 + 1) > nleaf) then
+        im = (i1 + i2)/2
+        jm = (j1 + j2)/2
+        nc = 0
+        if (i2 > i1 .and. j2 > j1) then
+          nc = 4
+          cidx(:,ncell+1) = (/i1,im,j1,jm/)
+          cidx(:,ncell+2) = (/im+1,i2,j1,jm/)
+          cidx(:,ncell+3) = (/i1,im,jm+1,j2/)
+          cidx(:,ncell+4) = (/im+1,i2,jm+1,j2/)
+        else if (i2 > i1) then
+          nc = 2
+          cidx(:,ncell+1) = (/i1,im,j1,j2/)
+          cidx(:,ncell+2) = (/im+1,i2,j1,j2/)
+        else
+          nc = 2
+          cidx(:,ncell+1) = (/i1,i2,j1,jm/)
+          cidx(:,ncell+2) = (/i1,i2,jm+1,j2/)
         end if
-      end do
-      do j = 1,n_in-1
-        do i = 1,m_in-1
-          if ((ydiv(j) > intlim) .or. (ydiv(j) < -intlim)) then
-            call integrandx(ydiv(j),xdiv(i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,xsum)
-            xsum5 = xsum5 + xsum
-            call integrandy(ydiv(j),xdiv(i),x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,ysum)
-            ysum5 = ysum5 + ysum
-          end if
+        do l = 1,nc
+          child(l,c) = ncell + l
         end do
+        ncell = ncell + nc
+      end if
+
+      c = c + 1
+    end do
+
+end subroutine tree_build
+
+
+! Calculating induced velocity at points (relative to the turbine) from the quadtree of a wake source
+! Distant cells use their multipole expansion and nearby leaf cells are summed directly
+! (points inside the wake are summed directly with the linear expansion of the vorticity subtracted by vel_source)
+subroutine tree_eval(ncmax,nterm,cidx,child,zc,rad,coef,theta,nx,ny,xg,yg,gw,wx,wy,dia,emg,fac,npt,x0,y0,&
+  velx,vely)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: ncmax,nterm,nx,ny,npt
+    integer, dimension(4,ncmax), intent(in) :: cidx,child
+    complex(dp), dimension(ncmax), intent(in) :: zc
+    real(dp), dimension(ncmax), intent(in) :: rad
+    complex(dp), dimension(nterm,ncmax), intent(in) :: coef
+    real(dp), intent(in) :: theta
+    real(dp), dimension(nx), intent(in) :: xg,wx
+    real(dp), dimension(ny), intent(in) :: yg,wy
+    real(dp), dimension(ny,nx), intent(in) :: gw
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,fac
+    real(dp), dimension(npt), intent(in) :: x0,y0
+
+    ! out
+    real(dp), dimension(npt), intent(out) :: velx,vely
+
+    ! local
+    integer :: c,i,j,l,p,ns
+    integer, dimension(256) :: stack
+    real(dp) :: dx,dy,r2,r2min,ext,gr,velxi,velyi
+    complex(dp) :: z,w,wsum
+    intrinsic abs
+    intrinsic cmplx
+    intrinsic real
+    intrinsic aimag
+    intrinsic max
+    intrinsic epsilon
+    intrinsic merge
+
+    ext = max(abs(xg(1)),abs(xg(nx)),abs(yg(1)),abs(yg(ny)))
+
+    !$omp parallel do private(c,i,j,p,ns,stack,dx,dy,r2,r2min,gr,velxi,velyi,z,w,wsum) schedule(dynamic)
+    do l = 1,npt
+      if ((x0(l) >= xg(1)) .and. (x0(l) <= xg(nx)) .and. (y0(l) >= yg(1)) .and. (y0(l) <= yg(ny))) then
+        call vel_source(nx,ny,xg,yg,gw,wx,wy,dia,emg,fac,1,x0(l:l),y0(l:l),velx(l:l),vely(l:l))
+        cycle
+      end if
+
+      r2min = (8.0_dp*epsilon(1.0_dp)*max(ext,abs(x0(l)),abs(y0(l))))**2
+      z = cmplx(x0(l),y0(l),dp)
+      velxi = 0.0_dp
+      velyi = 0.0_dp
+
+      ns = 1
+      stack(1) = 1
+      do while (ns > 0)
+        c = stack(ns)
+        ns = ns - 1
+
+        if (rad(c) < theta*abs(z - zc(c))) then
+          ! multipole expansion: sum of coef(p)/(z - zc)**p (v is the real part and u the imaginary part)
+          w = 1.0_dp/(z - zc(c))
+          wsum = coef(nterm,c)
+          do p = nterm-1,1,-1
+            wsum = coef(p,c) + w*wsum
+          end do
+          wsum = w*wsum
+          velxi = velxi + aimag(wsum)
+          velyi = velyi + real(wsum)
+        else if (child(1,c) == 0) then
+          ! direct summation of the leaf cell
+          do i = cidx(1,c),cidx(2,c)
+            dx = x0(l) - xg(i)
+            do j = cidx(3,c),cidx(4,c)
+              dy = yg(j) - y0(l)
+              r2 = dx*dx + dy*dy
+              r2 = merge(r2, huge(1.0_dp), r2 > r2min) ! a node at the point itself does not contribute
+              gr = gw(j,i)/r2
+              velxi = velxi + gr*dy
+              velyi = velyi + gr*dx
+            end do
+          end do
+        else
+          do p = 1,4
+            if (child(p,c) > 0) then
+              ns = ns + 1
+              stack(ns) = child(p,c)
+            end if
+          end do
+        end if
       end do
 
-      velxi = (h*k*(xval1 + xval2 + xval3 + xval4 + 2.0_dp*xsum1 + 2.0_dp*xsum2 +&
-      2.0_dp*xsum3 + 2.0_dp*xsum4 + 4.0_dp*xsum5)/4.0_dp)*(abs(rot)/pi2)
+      velx(l) = velxi
+      vely(l) = velyi
+    end do
+    !$omp end parallel do
+
+end subroutine tree_eval
+
+
+! Calculating induced velocity at points (relative to the turbine) from a wake source with the tree code
+subroutine vel_tree(nx,ny,xg,yg,gw,wx,wy,dia,emg,fac,npt,x0,y0,tol,velx,vely)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: nx,ny,npt
+    real(dp), dimension(nx), intent(in) :: xg,wx
+    real(dp), dimension(ny), intent(in) :: yg,wy
+    real(dp), dimension(ny,nx), intent(in) :: gw
+    real(dp), dimension(10), intent(in) :: emg
+    real(dp), intent(in) :: dia,fac
+    real(dp), dimension(npt), intent(in) :: x0,y0
+    real(dp), intent(in) :: tol
+
+    ! out
+    real(dp), dimension(npt), intent(out) :: velx,vely
+
+    ! local
+    integer :: nleaf,ncmax,nterm,ncell
+    real(dp) :: theta
+    integer, dimension(:,:), allocatable :: cidx,child
+    complex(dp), dimension(:), allocatable :: zc
+    real(dp), dimension(:), allocatable :: rad
+    complex(dp), dimension(:,:), allocatable :: coef
+
+    call tree_size(nx,ny,tol,nleaf,ncmax,nterm,theta)
+    allocate(cidx(4,ncmax),child(4,ncmax),zc(ncmax),rad(ncmax),coef(nterm,ncmax))
+
+    call tree_build(nx,ny,xg,yg,gw,nleaf,ncmax,nterm,ncell,cidx,child,zc,rad,coef)
+    call tree_eval(ncmax,nterm,cidx,child,zc,rad,coef,theta,nx,ny,xg,yg,gw,wx,wy,dia,emg,fac,npt,x0,y0,velx,vely)
+
+    deallocate(cidx,child,zc,rad,coef)
+
+end subroutine vel_tree
+
+
 
-      velyi = (h*k*(yval1 + yval2 + yval3 + yval4 + 2.0_dp*ysum1 + 2.0_dp*ysum2 +&
-      2.0_dp*ysum3 + 2.0_dp*ysum4 + 4.0_dp*ysum5)/4.0_dp)*(abs(rot)/pi2)
+! Calculating the low-order moments of a wake source about its centroid (weighted by the magnitude of the vorticity)
+! for the far-field velocity: total circulation, dipole and quadrupole (sum of gw*(z - zc)**k for k = 0,1,2)
+subroutine wake_moments(nx,ny,xg,yg,gw,zc,rad,gabs3,mom)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: nx,ny
+    real(dp), dimension(nx), intent(in) :: xg
+    real(dp), dimension(ny), intent(in) :: yg
+    real(dp), dimension(ny,nx), intent(in) :: gw
+
+    ! out
+    complex(dp), intent(out) :: zc ! centroid of the wake
+    real(dp), intent(out) :: rad ! distance of the farthest node with vorticity from the centroid (wake extent)
+    real(dp), intent(out) :: gabs3 ! sum of abs(gw)*abs(z - zc)**3 (bounding the neglected moments)
+    complex(dp), dimension(3), intent(out) :: mom
 
+    ! local
+    integer :: i,j
+    real(dp) :: xc,yc,gabs
+    complex(dp) :: dz
+    intrinsic abs
+    intrinsic cmplx
+    intrinsic max
+
+    xc = 0.0_dp
+    yc = 0.0_dp
+    gabs = 0.0_dp
+    do i = 1,nx
+      do j = 1,ny
+        xc = xc + abs(gw(j,i))*xg(i)
+        yc = yc + abs(gw(j,i))*yg(j)
+        gabs = gabs + abs(gw(j,i))
+      end do
+    end do
+    if (gabs > 0.0_dp) then
+      zc = cmplx(xc/gabs,yc/gabs,dp)
+    else
+      zc = (0.0_dp,0.0_dp)
     end if
 
-    ! ****************************************************************************
+    rad = 0.0_dp
+    gabs3 = 0.0_dp
+    mom = (0.0_dp,0.0_dp)
+    do i = 1,nx
+      do j = 1,ny
+        if (gw(j,i) /= 0.0_dp) then
+          dz = cmplx(xg(i),yg(j),dp) - zc
+          rad = max(rad,abs(dz))
+          gabs3 = gabs3 + abs(gw(j,i))*abs(dz)**3
+          mom(1) = mom(1) + gw(j,i)
+          mom(2) = mom(2) + gw(j,i)*dz
+          mom(3) = mom(3) + gw(j,i)*dz*dz
+        end if
+      end do
+    end do
 
-    velx = velxi/Vinf
-    vely = velyi/Vinf
+end subroutine wake_moments
 
-end subroutine vel_field
 
+! Calculating induced velocity at points (relative to the turbine) from the moments of a wake source
+! Points farther than far*rad from the centroid use the expansion when its truncation error bound,
+! gabs3/(r**3*(r - rad)), is below tol times the induced velocity or below atol; the others are flagged in near
+! (0 elsewhere)
+subroutine vel_far(npt,x0,y0,zc,rad,gabs3,mom,far,tol,atol,velx,vely,near)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: npt
+    real(dp), dimension(npt), intent(in) :: x0,y0
+    complex(dp), intent(in) :: zc
+    real(dp), intent(in) :: rad,gabs3,far,tol,atol
+    !f2py real(dp) optional, intent(in) :: atol = 0.0
+    complex(dp), dimension(3), intent(in) :: mom
+
+    ! out
+    real(dp), dimension(npt), intent(out) :: velx,vely
+    integer, dimension(npt), intent(out) :: near
+
+    ! local
+    integer :: l
+    real(dp) :: r,err
+    complex(dp) :: w,wsum
+    intrinsic abs
+    intrinsic cmplx
+    intrinsic real
+    intrinsic aimag
+    intrinsic max
+
+    !$omp parallel do private(r,err,w,wsum)
+    do l = 1,npt
+      velx(l) = 0.0_dp
+      vely(l) = 0.0_dp
+      near(l) = 1
+
+      r = abs(cmplx(x0(l),y0(l),dp) - zc)
+      if (r > max(far,1.0_dp)*rad) then
+        ! sum of mom(k)/(z - zc)**k (v is the real part and u the imaginary part)
+        w = 1.0_dp/(cmplx(x0(l),y0(l),dp) - zc)
+        wsum = w*(mom(1) + w*(mom(2) + w*mom(3)))
+        err = gabs3/(r**3*(r - rad))
+        if (err <= max(tol*abs(wsum),atol)) then
+          velx(l) = aimag(wsum)
+          vely(l) = real(wsum)
+          near(l) = 0
+        end if
+      end if
+    end do
+    !$omp end parallel do
+
+end subroutine vel_far
 
 ! Calculating vorticity strength for polynomial surface fitting
 subroutine sheet_vort(ndata,xttr,ystr,posdn,poslt,coef0,coef1,coef2,coef3,coef4,&
   coef5,coef6,coef7,coef8,coef9,dia,vort)
   implicit none
+  !f2py threadsafe
   integer, parameter :: dp = kind(0.d0)
   ! in
   integer, intent(in) :: ndata
@@ -1002,6 +3052,7 @@ end subroutine sheet_vort
 subroutine sheet_vel(ndata,xttr,ystr,posdn,poslt,coef0,coef1,coef2,coef3,coef4,&
   coef5,coef6,coef7,coef8,coef9,dia,Vinf,m_in,n_in,inte,vel)
   implicit none
+  !f2py threadsafe
   integer, parameter :: dp = kind(0.d0)
   ! in
   integer, intent(in) :: ndata,m_in,n_in,inte
@@ -1021,7 +3072,7 @@ subroutine sheet_vel(ndata,xttr,ystr,posdn,poslt,coef0,coef1,coef2,coef3,coef4,&
 
     call vel_field(0.0_dp,0.0_dp,posdn(i),poslt(i),dia,rot,chord,3,Vinf,&
     coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m_in,n_in,&
-    inte,velx,vely)
+    inte,velx,vely,8)
 
     vel(i) = (velx*Vinf + Vinf)/Vinf
 
@@ -1039,6 +3090,7 @@ end subroutine sheet_vel
 subroutine radialforce(n,f,uvec,vvec,thetavec,af_data,cl_data,cd_data,r,chord,&
   twist,delta,B,Omega,Vinf,Vinfx,Vinfy,rho,interp,q,k,Cp,Tp,Vn,Vt)
     implicit none
+    !f2py threadsafe
 
     integer, parameter :: dp = kind(0.d0)
 
@@ -1144,9 +3196,10 @@ end subroutine radialforce
 ! Calculating effective velocities around given turbine due to wake interaction
 ! For use only with Simpson's method
 subroutine overlap(t,p,xt,yt,diat,rott,chord,blades,x0,y0,dia,Vinf,loc1,loc2,loc3,spr1,spr2,&
-  skw1,skw2,scl1,scl2,scl3,m,n,inte,pointcalc,velx,vely)
+  skw1,skw2,scl1,scl2,scl3,m,n,inte,pointcalc,velx,vely,tol)
 
     implicit none
+    !f2py threadsafe
 
     integer, parameter :: dp = kind(0.d0)
 
@@ -1155,14 +3208,83 @@ subroutine overlap(t,p,xt,yt,diat,rott,chord,blades,x0,y0,dia,Vinf,loc1,loc2,loc
     real(dp), dimension(t), intent(in) :: xt,yt,diat,rott
     real(dp), intent(in) :: x0,y0,dia,Vinf,chord
     real(dp), dimension(10), intent(in) :: loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3
+    real(dp), intent(in) :: tol ! error tolerance of the tree code (0 for direct summation)
+    !f2py real(dp) optional, intent(in) :: tol = 0.0
+
+    ! out
+    real(dp), dimension(p), intent(out) :: velx,vely
+
+    ! local
+    integer :: j,l,ns
+    integer, dimension(t) :: sid
+    real(dp), dimension(t) :: dias,fac
+    real(dp), dimension(10,t) :: emg
+    real(dp), dimension(:,:), allocatable :: xg,yg,wx,wy
+    real(dp), dimension(:,:,:), allocatable :: gw
+    intrinsic abs
+
+    ! Calculating the wake source of each turbine type and rotation rate only once
+    allocate(xg(m+1,t),yg(n+1,t),wx(m+1,t),wy(n+1,t),gw(n+1,m+1,t))
+    ns = 0
+    do j = 1,t
+      sid(j) = 0
+      do l = 1,j-1
+        if ((diat(l) == diat(j)) .and. (abs(rott(l)) == abs(rott(j)))) then
+          sid(j) = sid(l)
+          exit
+        end if
+      end do
+      if (sid(j) == 0) then
+        ns = ns + 1
+        sid(j) = ns
+        dias(ns) = diat(j)
+        call vorticity_grid(diat(j),rott(j),chord,blades,Vinf,loc1,loc2,loc3,spr1,spr2,&
+        skw1,skw2,scl1,scl2,scl3,m,n,inte,xg(:,ns),yg(:,ns),gw(:,:,ns),wx(:,ns),wy(:,ns),emg(:,ns),fac(ns))
+      end if
+    end do
+
+    call overlap_source(t,p,ns,m+1,n+1,xt,yt,sid,xg(:,1:ns),yg(:,1:ns),gw(:,:,1:ns),wx(:,1:ns),wy(:,1:ns),&
+    dias(1:ns),emg(:,1:ns),fac(1:ns),x0,y0,dia,Vinf,pointcalc,velx,vely,tol)
+
+    deallocate(xg,yg,wx,wy,gw)
+
+end subroutine overlap
+
+
+! Calculating effective velocities around given turbine due to wake interaction from precalculated wake sources
+subroutine overlap_source(t,p,ns,nx,ny,xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,x0,y0,dia,Vinf,pointcalc,velx,vely,tol)
+
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: t,p,ns,nx,ny,pointcalc
+    integer, dimension(t), intent(in) :: sid
+    real(dp), dimension(t), intent(in) :: xt,yt
+    real(dp), dimension(nx,ns), intent(in) :: xg,wx
+    real(dp), dimension(ny,ns), intent(in) :: yg,wy
+    real(dp), dimension(ny,nx,ns), intent(in) :: gw
+    real(dp), dimension(ns), intent(in) :: dias,fac
+    real(dp), dimension(10,ns), intent(in) :: emg
+    real(dp), intent(in) :: x0,y0,dia,Vinf
+    real(dp), intent(in) :: tol ! error tolerance of the tree code (0 for direct summation)
+    !f2py real(dp) optional, intent(in) :: tol = 0.0
 
     ! out
     real(dp), dimension(p), intent(out) :: velx,vely
 
     ! local
-    integer :: i,j,k,l
-    real(dp) :: pi,theta
-    real(dp), dimension(p) :: xd,yd,velxi,velyi,velx_int,vely_int,intex,intey
+    integer :: i,j,k,l,jl,npt,nleaf,ncmax,nterm,ks
+    integer, dimension(ns) :: ncell
+    real(dp) :: pi,theta,thetac
+    integer, dimension(:,:,:), allocatable :: cidx,child
+    complex(dp), dimension(:,:), allocatable :: zc
+    real(dp), dimension(:,:), allocatable :: rad
+    complex(dp), dimension(:,:,:), allocatable :: coef
+    real(dp), dimension(p) :: xd,yd,velx_int,vely_int,intex,intey
+    real(dp), dimension(p,t) :: velxi,velyi
     intrinsic sin
     intrinsic cos
     intrinsic sqrt
@@ -1171,6 +3293,8 @@ subroutine overlap(t,p,xt,yt,diat,rott,chord,blades,x0,y0,dia,Vinf,loc1,loc2,loc
 
     intex = 0.0_dp
     intey = 0.0_dp
+    velxi = 0.0_dp
+    velyi = 0.0_dp
 
     ! finding points around the flight path of the blades
     do i = 1,p
@@ -1189,76 +3313,72 @@ subroutine overlap(t,p,xt,yt,diat,rott,chord,blades,x0,y0,dia,Vinf,loc1,loc2,loc
       end if
     end do
 
+    if (pointcalc == 1) then
+      npt = p
+    else
+      npt = 1
+    end if
+
+    ! induced velocities from each turbine wake (translating the points relative to the turbine)
+    if (tol > 0.0_dp) then
+      ! tree code with the quadtree of each wake source built once
+      call tree_size(nx,ny,tol,nleaf,ncmax,nterm,thetac)
+      allocate(cidx(4,ncmax,ns),child(4,ncmax,ns),zc(ncmax,ns),rad(ncmax,ns),coef(nterm,ncmax,ns))
+      !$omp parallel do
+      do k = 1,ns
+        call tree_build(nx,ny,xg(:,k),yg(:,k),gw(:,:,k),nleaf,ncmax,nterm,ncell(k),cidx(:,:,k),&
+        child(:,:,k),zc(:,k),rad(:,k),coef(:,:,k))
+      end do
+      !$omp end parallel do
+      ! parallel over (turbine, point) pairs
+      !$omp parallel do private(j,l,ks) schedule(dynamic)
+      do jl = 1,t*npt
+        j = (jl - 1)/npt + 1
+        l = jl - (j - 1)*npt
+        ks = sid(j)
+        call tree_eval(ncmax,nterm,cidx(:,:,ks),child(:,:,ks),zc(:,ks),rad(:,ks),&
+        coef(:,:,ks),thetac,nx,ny,xg(:,ks),yg(:,ks),gw(:,:,ks),wx(:,ks),wy(:,ks),dias(ks),emg(:,ks),fac(ks),&
+        1,xd(l:l)-xt(j),yd(l:l)-yt(j),velxi(l:l,j),velyi(l:l,j))
+      end do
+      !$omp end parallel do
+      deallocate(cidx,child,zc,rad,coef)
+    else
+      ! parallel over (turbine, point) pairs
+      !$omp parallel do private(j,l,ks) schedule(dynamic)
+      do jl = 1,t*npt
+        j = (jl - 1)/npt + 1
+        l = jl - (j - 1)*npt
+        ks = sid(j)
+        call vel_source(nx,ny,xg(:,ks),yg(:,ks),gw(:,:,ks),wx(:,ks),wy(:,ks),dias(ks),emg(:,ks),fac(ks),&
+        1,xd(l:l)-xt(j),yd(l:l)-yt(j),velxi(l:l,j),velyi(l:l,j))
+      end do
+      !$omp end parallel do
+    end if
+
     if (t == 1) then ! coupled configuration (only two VAWTs)
-      if (pointcalc == 1) then
-        do j = 1,p
-          call vel_field(xt(1),yt(1),xd(j),yd(j),diat(1),rott(1),chord,blades,Vinf,&
-          loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,m,n,inte,&
-          velxi(j),velyi(j))
-          velx(j) = velxi(j)*Vinf
-          vely(j) = velyi(j)*Vinf
-        end do
-      else if (pointcalc == 0) then
-        do j = 1,p
-          if (j == 1) then
-            call vel_field(xt(1),yt(1),xd(j),yd(j),diat(1),rott(1),chord,blades,Vinf,&
-            loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,m,n,inte,&
-            velxi(j),velyi(j))
-            velx(j) = velxi(j)*Vinf
-            vely(j) = velyi(j)*Vinf
-          else
-            velx(j) = 0.0_dp
-            vely(j) = 0.0_dp
-          end if
-        end do
-      end if
+      do j = 1,p
+        velx(j) = velxi(j,1)*Vinf
+        vely(j) = velyi(j,1)*Vinf
+      end do
     else ! multiple turbine wake overlap
       do j = 1,t
-        if (pointcalc == 1) then
-          do k = 1,p
-            call vel_field(xt(j),yt(j),xd(k),yd(k),diat(j),rott(j),chord,blades,&
-            Vinf,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,m,n,inte,&
-            velx_int(k),vely_int(k))
-            velx_int(k) = -velx_int(k)
-
-            ! sum of squares of velocity deficits
-            if (velx_int(k) >= 0.0_dp) then
-              intex(k) = intex(k) + (velx_int(k))**2
-            else
-              intex(k) = intex(k) - (velx_int(k))**2
-            end if
-
-            if (vely_int(k) >= 0.0_dp) then
-              intey(k) = intey(k) + (vely_int(k))**2
-            else
-              intey(k) = intey(k) - (vely_int(k))**2
-            end if
-          end do
-        else if (pointcalc == 0) then
-          do k = 1,p
-            if (k == 1) then
-              call vel_field(xt(j),yt(j),xd(k),yd(k),diat(j),rott(j),chord,blades,&
-              Vinf,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,m,n,inte,&
-              velx_int(k),vely_int(k))
-              velx_int(k) = -velx_int(k)
-            else
-              velx_int(k) = 0.0_dp
-            end if
+        do k = 1,p
+          velx_int(k) = -velxi(k,j)
+          vely_int(k) = velyi(k,j)
 
-            ! sum of squares of velocity deficits
-            if (velx_int(k) >= 0.0_dp) then
-              intex(k) = intex(k) + (velx_int(k))**2
-            else
-              intex(k) = intex(k) - (velx_int(k))**2
-            end if
+          ! sum of squares of velocity deficits
+          if (velx_int(k) >= 0.0_dp) then
+            intex(k) = intex(k) + (velx_int(k))**2
+          else
+            intex(k) = intex(k) - (velx_int(k))**2
+          end if
 
-            if (vely_int(k) >= 0.0_dp) then
-              intey(k) = intey(k) + (vely_int(k))**2
-            else
-              intey(k) = intey(k) - (vely_int(k))**2
-            end if
-          end do
-        end if
+          if (vely_int(k) >= 0.0_dp) then
+            intey(k) = intey(k) + (vely_int(k))**2
+          else
+            intey(k) = intey(k) - (vely_int(k))**2
+          end if
+        end do
       end do
 
       ! square root of sum of squares
@@ -1277,13 +3397,213 @@ subroutine overlap(t,p,xt,yt,diat,rott,chord,blades,x0,y0,dia,Vinf,loc1,loc2,loc
       end do
     end if
 
-end subroutine overlap
+end subroutine overlap_source
+
+
+! Calculating effective velocities around every turbine of a farm due to the wakes of the other turbines
+! (overlap_source for each turbine in one call, written into caller-provided Fortran-ordered arrays)
+subroutine overlap_farm(t,p,ns,nx,ny,xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,diat,Vinf,velx,vely,tol)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: t,p,ns,nx,ny
+    integer, dimension(t), intent(in) :: sid
+    real(dp), dimension(t), intent(in) :: xt,yt,diat
+    real(dp), dimension(nx,ns), intent(in) :: xg,wx
+    real(dp), dimension(ny,ns), intent(in) :: yg,wy
+    real(dp), dimension(ny,nx,ns), intent(in) :: gw
+    real(dp), dimension(ns), intent(in) :: dias,fac
+    real(dp), dimension(10,ns), intent(in) :: emg
+    real(dp), intent(in) :: Vinf
+    real(dp), intent(in) :: tol ! error tolerance of the tree code (0 for direct summation)
+    !f2py real(dp) optional, intent(in) :: tol = 0.0
+
+    ! in/out (the velocities around turbine i are written to velx(:,i) and vely(:,i))
+    real(dp), dimension(p,t), intent(inout) :: velx,vely
+    !f2py intent(inplace) :: velx,vely
+
+    ! local
+    integer :: i,j,k,l,il,ks,nleaf,ncmax,nterm
+    integer, dimension(ns) :: ncell
+    real(dp) :: pi,theta,thetac,intex,intey
+    real(dp), dimension(1) :: xd,yd,velxi,velyi
+    integer, dimension(:,:,:), allocatable :: cidx,child
+    complex(dp), dimension(:,:), allocatable :: zc
+    real(dp), dimension(:,:), allocatable :: rad
+    complex(dp), dimension(:,:,:), allocatable :: coef
+    intrinsic sin
+    intrinsic cos
+    intrinsic sqrt
+    intrinsic abs
+    pi = 3.1415926535897932_dp
+
+    ! quadtree of each wake source built once for all of the turbines
+    if (tol > 0.0_dp) then
+      call tree_size(nx,ny,tol,nleaf,ncmax,nterm,thetac)
+      allocate(cidx(4,ncmax,ns),child(4,ncmax,ns),zc(ncmax,ns),rad(ncmax,ns),coef(nterm,ncmax,ns))
+      !$omp parallel do
+      do k = 1,ns
+        call tree_build(nx,ny,xg(:,k),yg(:,k),gw(:,:,k),nleaf,ncmax,nterm,ncell(k),cidx(:,:,k),&
+        child(:,:,k),zc(:,k),rad(:,k),coef(:,:,k))
+      end do
+      !$omp end parallel do
+    end if
+
+    ! parallel over (turbine, point) pairs
+    !$omp parallel do private(i,j,l,ks,theta,xd,yd,velxi,velyi,intex,intey) schedule(dynamic)
+    do il = 1,t*p
+      i = (il - 1)/p + 1
+      l = il - (i - 1)*p
+
+      ! point around the flight path of the blades of turbine i
+      theta = (2.0_dp*pi/p)*l-(2.0_dp*pi/p)/2.0_dp
+      intex = 0.0_dp
+      intey = 0.0_dp
+      velx(l,i) = 0.0_dp
+      vely(l,i) = 0.0_dp
+
+      do j = 1,t
+        if (j /= i) then
+          ! induced velocities from the wake of turbine j (translating the point relative to the turbine)
+          ks = sid(j)
+          xd(1) = xt(i) - sin(theta)*(diat(i)/2.0_dp) - xt(j)
+          yd(1) = yt(i) + cos(theta)*(diat(i)/2.0_dp) - yt(j)
+          if (tol > 0.0_dp) then
+            call tree_eval(ncmax,nterm,cidx(:,:,ks),child(:,:,ks),zc(:,ks),rad(:,ks),&
+            coef(:,:,ks),thetac,nx,ny,xg(:,ks),yg(:,ks),gw(:,:,ks),wx(:,ks),wy(:,ks),dias(ks),emg(:,ks),&
+            fac(ks),1,xd,yd,velxi,velyi)
+          else
+            call vel_source(nx,ny,xg(:,ks),yg(:,ks),gw(:,:,ks),wx(:,ks),wy(:,ks),dias(ks),emg(:,ks),fac(ks),&
+            1,xd,yd,velxi,velyi)
+          end if
+
+          if (t == 2) then ! coupled configuration (only two VAWTs)
+            velx(l,i) = velxi(1)*Vinf
+            vely(l,i) = velyi(1)*Vinf
+          else ! sum of squares of velocity deficits
+            intex = intex - velxi(1)*abs(velxi(1))
+            intey = intey + velyi(1)*abs(velyi(1))
+          end if
+        end if
+      end do
+
+      ! square root of sum of squares
+      if (t > 2) then
+        if (intex >= 0.0_dp) then
+          velx(l,i) = -Vinf*(sqrt(intex))
+        else
+          velx(l,i) = Vinf*(sqrt(abs(intex)))
+        end if
+
+        if (intey >= 0.0_dp) then
+          vely(l,i) = Vinf*(sqrt(intey))
+        else
+          vely(l,i) = -Vinf*(sqrt(abs(intey)))
+        end if
+      end if
+    end do
+    !$omp end parallel do
+
+    if (tol > 0.0_dp) then
+      deallocate(cidx,child,zc,rad,coef)
+    end if
+
+end subroutine overlap_farm
+
+
+! Calculating the induced velocities of each turbine wake at given angles around the flight path of the blades of
+! every other turbine of a farm (before the wake overlap; for the Fourier interpolation around the flight path)
+subroutine farm_velocity(t,nth,ns,nx,ny,xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,diat,theta,pair,velx,vely,tol)
+    implicit none
+    !f2py threadsafe
+
+    integer, parameter :: dp = kind(0.d0)
+
+    ! in
+    integer, intent(in) :: t,nth,ns,nx,ny
+    integer, dimension(t), intent(in) :: sid
+    real(dp), dimension(t), intent(in) :: xt,yt,diat
+    real(dp), dimension(nx,ns), intent(in) :: xg,wx
+    real(dp), dimension(ny,ns), intent(in) :: yg,wy
+    real(dp), dimension(ny,nx,ns), intent(in) :: gw
+    real(dp), dimension(ns), intent(in) :: dias,fac
+    real(dp), dimension(10,ns), intent(in) :: emg
+    real(dp), dimension(nth), intent(in) :: theta
+    integer, dimension(t,t), intent(in) :: pair ! 1 to calculate the wake of turbine j around turbine i in pair(j,i)
+    real(dp), intent(in) :: tol ! error tolerance of the tree code (0 for direct summation)
+    !f2py real(dp) optional, intent(in) :: tol = 0.0
+
+    ! out (normalized induced velocities of the wake of turbine j at theta(l) around turbine i in velx(l,j,i); 0 for
+    ! the pairs not calculated)
+    real(dp), dimension(nth,t,t), intent(out) :: velx,vely
+
+    ! local
+    integer :: i,j,k,l,il,ks,nleaf,ncmax,nterm
+    integer, dimension(ns) :: ncell
+    real(dp) :: thetac
+    real(dp), dimension(1) :: xd,yd
+    integer, dimension(:,:,:), allocatable :: cidx,child
+    complex(dp), dimension(:,:), allocatable :: zc
+    real(dp), dimension(:,:), allocatable :: rad
+    complex(dp), dimension(:,:,:), allocatable :: coef
+    intrinsic sin
+    intrinsic cos
+
+    ! quadtree of each wake source built once for all of the turbines
+    if (tol > 0.0_dp) then
+      call tree_size(nx,ny,tol,nleaf,ncmax,nterm,thetac)
+      allocate(cidx(4,ncmax,ns),child(4,ncmax,ns),zc(ncmax,ns),rad(ncmax,ns),coef(nterm,ncmax,ns))
+      !$omp parallel do
+      do k = 1,ns
+        call tree_build(nx,ny,xg(:,k),yg(:,k),gw(:,:,k),nleaf,ncmax,nterm,ncell(k),cidx(:,:,k),&
+        child(:,:,k),zc(:,k),rad(:,k),coef(:,:,k))
+      end do
+      !$omp end parallel do
+    end if
+
+    ! parallel over (turbine, angle) pairs
+    !$omp parallel do private(i,j,l,ks,xd,yd) schedule(dynamic)
+    do il = 1,t*nth
+      i = (il - 1)/nth + 1
+      l = il - (i - 1)*nth
+
+      do j = 1,t
+        if (j == i .or. pair(j,i) == 0) then
+          velx(l,j,i) = 0.0_dp
+          vely(l,j,i) = 0.0_dp
+        else
+          ! point around the flight path of turbine i relative to turbine j
+          ks = sid(j)
+          xd(1) = xt(i) - sin(theta(l))*(diat(i)/2.0_dp) - xt(j)
+          yd(1) = yt(i) + cos(theta(l))*(diat(i)/2.0_dp) - yt(j)
+          if (tol > 0.0_dp) then
+            call tree_eval(ncmax,nterm,cidx(:,:,ks),child(:,:,ks),zc(:,ks),rad(:,ks),&
+            coef(:,:,ks),thetac,nx,ny,xg(:,ks),yg(:,ks),gw(:,:,ks),wx(:,ks),wy(:,ks),dias(ks),emg(:,ks),&
+            fac(ks),1,xd,yd,velx(l:l,j,i),vely(l:l,j,i))
+          else
+            call vel_source(nx,ny,xg(:,ks),yg(:,ks),gw(:,:,ks),wx(:,ks),wy(:,ks),dias(ks),emg(:,ks),fac(ks),&
+            1,xd,yd,velx(l:l,j,i),vely(l:l,j,i))
+          end if
+        end if
+      end do
+    end do
+    !$omp end parallel do
+
+    if (tol > 0.0_dp) then
+      deallocate(cidx,child,zc,rad,coef)
+    end if
+
+end subroutine farm_velocity
 
 
 ! Calculating power and coefficient of power using velocity vector summation
 subroutine powercalc(n,f,thetavec,Vinf,wake_x,wake_y,Vnp,Vnn,Vtp,Vtn,Cpp,Cpn,&
   Omega,r,H,af_data,cl_data,cd_data,twist,rho,interp,P,Cp)
     implicit none
+    !f2py threadsafe
 
     integer, parameter :: dp = kind(0.d0)
 
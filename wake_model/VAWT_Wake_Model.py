@@ -30,39 +30,25 @@ rotation direction is irrelevant.
 """
 import numpy as np
 from numpy import pi,fabs,sqrt,sin,cos,argmin
-from scipy.integrate import _quadpack
-from scipy.interpolate import UnivariateSpline
+from numpy.polynomial import chebyshev
+from scipy.interpolate import UnivariateSpline,RectBivariateSpline
+from scipy.signal import fftconvolve
+from scipy import fftpack
 import csv
-from os import path
+import hashlib
+from os import path,makedirs,rename
+from multiprocessing import cpu_count
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 
-from joblib import Parallel,delayed
+import vawt_backend
+from vawt_backend import kernels as _vawtwake,get_backend,backends
 
-import _vawtwake
-
-##########################################################################################
-# Double Integration Method using necessary Quadpack (SciPy) code (_qagse)
-# Originally created by Travis Oliphant (2001) and Nathan Woods (2013) (nquad &c)
-def _quad(func, a, b, args=(), full_output=0, epsabs=1.49e-8, epsrel=1.49e-8, limit=50):
-    # Calling the _qagse code from Quadpack to perform a single integration
-
-    retval = _quadpack._qagse(func,a,b,args,full_output,epsabs,epsrel,limit)
-
-    return retval[:-1]
-
-def _infunc(x,func,gfun,hfun,more_args):
-    # Arranging a double integral into two single integrations
-
-    a = gfun(x)
-    b = hfun(x)
-    myargs = (x,) + more_args
-
-    return _quad(func,a,b,args=myargs)[0]
-
-def _dblquad(func, a, b, gfun, hfun, args=(), epsabs=1.49e-8, epsrel=1.49e-8):
-    # Performing a double integration using _infunc and _quad
-
-    return _quad(_infunc, a, b, (func, gfun, hfun, args), epsabs=epsabs, epsrel=epsrel)
-##########################################################################################
+_coef_sets = {}
+_coef_files = {}
+_coef_lock = Lock()
+_coef_default = 'VAWTPolySurfaceCoef_pub.csv'
+_param_cache = {}
 
 
 def _parameterval(tsr,sol,coef):
@@ -100,14 +86,17 @@ def _parameterval(tsr,sol,coef):
     return surf
 
 
-def coef_val():
+def coef_val(fdata=_coef_default):
     """
-    The polynomial surface coefficients used for the EMG parameters
+    The polynomial surface coefficients used for the EMG parameters (read from the data folder on the first request
+    and kept in the coefficient registry)
     Published coefficients from paper (4 Reynolds numbers; 1 2 2 1 1 1 2 1 2 2) may be used
 
     Parameters
     ----------
-    no parameters
+    fdata : string
+        the .csv file of coefficients in the data folder ('VAWTPolySurfaceCoef_pub.csv': published coefficients
+        from paper; 'VAWTPolySurfaceCoef.csv': polynomial surface fitting coefficients)
 
     Returns
     ----------
@@ -132,43 +121,161 @@ def coef_val():
     scl3 : array
         the third scale parameter coefficients
     """
+    return get_coef(_coef_file(fdata))
 
-    basepath = path.join(path.dirname(path.realpath('__file__')), 'data')
-    fdata = basepath + path.sep + 'VAWTPolySurfaceCoef_pub.csv' # published coefficients from paper
-    # fdata = basepath + path.sep + 'VAWTPolySurfaceCoef.csv' # polynomial surface fitting coefficients
 
-    loc1 = np.zeros(10)
-    loc2 = np.zeros(10)
-    loc3 = np.zeros(10)
-    spr1 = np.zeros(10)
-    spr2 = np.zeros(10)
-    skw1 = np.zeros(10)
-    skw2 = np.zeros(10)
-    scl1 = np.zeros(10)
-    scl2 = np.zeros(10)
-    scl3 = np.zeros(10)
+def _coef_file(fdata):
+    # registry key of the coefficients of a file in the data folder (read on the first request)
+    with _coef_lock:
+        key = _coef_files.get(fdata)
+        if key is not None:
+            return key
 
-    f = open(fdata)
+    basepath = path.join(path.dirname(path.realpath(__file__)), 'data')
+
+    coef = np.zeros((10,10))
+    f = open(basepath + path.sep + fdata)
     csv_f = csv.reader(f)
 
     i = 0
     for row in csv_f:
         if i != 0:
-            loc1[i-1] = float(row[0])
-            loc2[i-1] = float(row[1])
-            loc3[i-1] = float(row[2])
-            spr1[i-1] = float(row[3])
-            spr2[i-1] = float(row[4])
-            skw1[i-1] = float(row[5])
-            skw2[i-1] = float(row[6])
-            scl1[i-1] = float(row[7])
-            scl2[i-1] = float(row[8])
-            scl3[i-1] = float(row[9])
+            coef[:,i-1] = [float(val) for val in row[:10]]
         i += 1
 
     f.close()
 
-    return loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3
+    key = register_coef(coef)
+    with _coef_lock:
+        _coef_files[fdata] = key
+
+    return key
+
+
+def coef_key(coef):
+    """
+    The content hash identifying a set of polynomial surface coefficients in the coefficient registry
+
+    Parameters
+    ----------
+    coef : tuple
+        the ten arrays of polynomial surface coefficients
+
+    Returns
+    ----------
+    key : string
+        the hash of the coefficient values
+    """
+    return hashlib.sha1(np.ascontiguousarray(coef,dtype=float).tostring()).hexdigest()
+
+
+def register_coef(coef):
+    """
+    Adding a set of polynomial surface coefficients (e.g. refitted coefficients) to the coefficient registry,
+    which keeps each set once for use side by side with the others
+
+    Parameters
+    ----------
+    coef : tuple
+        the ten arrays of polynomial surface coefficients
+
+    Returns
+    ----------
+    key : string
+        the content hash of the set (see coef_key)
+    """
+    key = coef_key(coef)
+
+    with _coef_lock:
+        if key not in _coef_sets:
+            arrays = tuple(np.array(c,dtype=float) for c in coef)
+            for c in arrays:
+                c.setflags(write=False)
+            _coef_sets[key] = arrays
+
+    return key
+
+
+def get_coef(key):
+    """
+    Looking up a set of polynomial surface coefficients in the coefficient registry
+
+    Parameters
+    ----------
+    key : string
+        the content hash of the set (returned by register_coef)
+
+    Returns
+    ----------
+    coef : tuple
+        the ten arrays of polynomial surface coefficients (read-only)
+    """
+    with _coef_lock:
+        coef = _coef_sets.get(key)
+    if coef is None:
+        raise KeyError('no set of coefficients is registered with the key %s (see register_coef)' % key)
+
+    return coef
+
+
+def _coef_set(coef):
+    # registry key and arrays of the coef argument of the public routines ('None': coef_val(), a registry key, or
+    # the ten arrays of polynomial surface coefficients, which are registered)
+    if coef is None:
+        key = _coef_file(_coef_default)
+    elif isinstance(coef,basestring):
+        key = coef
+    else:
+        key = register_coef(coef)
+
+    return key,get_coef(key)
+
+
+def parameterval(tsr,sol,coef=None):
+    """
+    Calculating the ten EMG parameters of the polynomial surfaces at given tip-speed ratios and solidities together
+    (Horner form; single operating points are kept for repeated calls)
+
+    Parameters
+    ----------
+    tsr : float or array
+        specified tip-speed ratio(s)
+    sol : float or array
+        specified solidity(s)
+    coef : tuple or string
+        the ten arrays of polynomial surface coefficients or the key of a registered set (see register_coef;
+        'None' will use coef_val())
+
+    Returns
+    ----------
+    param : array
+        the EMG parameters (loc1, loc2, loc3, spr1, spr2, skw1, skw2, scl1, scl2, scl3) along the first axis, with
+        tsr and sol broadcast together along the others
+    """
+    ckey,coef = _coef_set(coef)
+    scalar = np.ndim(tsr) == 0 and np.ndim(sol) == 0
+
+    if scalar:
+        key = (ckey,float(tsr),float(sol))
+        param = _param_cache.get(key)
+        if param is not None:
+            return param
+
+    t = np.asarray(tsr,dtype=float)
+    s = np.asarray(sol,dtype=float)
+    a,b,c,d,e,f,g,h,i,j = [np.reshape(col,(10,)+(1,)*max(np.ndim(t),np.ndim(s))) for col in np.transpose(coef)]
+
+    # a + b*t + c*s + d*t**2 + e*t*s + f*s**2 + g*t**3 + h*t**2*s + i*t*s**2 + j*s**3
+    param = a + t*(b + t*(d + g*t + h*s) + s*(e + i*s)) + s*(c + s*(f + j*s))
+
+    if scalar:
+        param = param.reshape(10)
+        param.setflags(write=False)
+        if len(_param_cache) > 4096:
+            _param_cache.clear()
+        _param_cache[key] = param
+
+    return param
 
 
 def airfoil_data(file):
@@ -219,7 +326,1000 @@ def airfoil_data(file):
     return af_data_smooth,cl_data_smooth,cd_data_smooth
 
 
-def velocity_field(xt,yt,x0,y0,Vinf,dia,rot,chord,B,param=None,veltype='all',integration='simp',m=220,n=200):
+class WakeSource(object):
+    """
+    The weighted vorticity of a turbine wake at the integration nodes of Simpson's rule (the wake source)
+    The wake source only depends on the turbine type and rotation rate and is reused for every calculation point
+
+    Parameters
+    ----------
+    dia : float
+        turbine diameter (m)
+    rot : float
+        turbine rotation rate (rad/s)
+    chord : float
+        chord length of the turbine (m)
+    B : int
+        number of turbine blades
+    Vinf : float
+        free stream velocity (m/s)
+    m : int
+        the number of downstream divisions requested for Simpson's Rule (must be divisible by 2)
+    n : int
+        the number of lateral divisions requested for Simpson's Rule (must be divisible by 2)
+    inte : int
+        the integration rule used (1: Simpson's Rule, 2: Trapezoidal Rule)
+    coef : tuple or string
+        the ten arrays of polynomial surface coefficients or the key of a registered set (see register_coef;
+        'None' will use coef_val())
+
+    Attributes
+    ----------
+    emg : array
+        the limited EMG parameter components (loc1, loc2, loc3, spr1, spr2, skw1, skw2, scl1, scl2, scl3)
+    xg : array
+        downstream positions of the integration nodes relative to the turbine (m)
+    yg : array
+        lateral positions of the integration nodes relative to the turbine (m)
+    gw : array
+        the weighted vorticity at each node (lateral by downstream), normalized by the free stream velocity
+    wx : array
+        downstream weights of the nodes (gw = wx*wy*vorticity)
+    wy : array
+        lateral weights of the nodes, including the normalization fac
+    fac : float
+        normalization of the induced velocity (rotation rate over 2*pi and the free stream velocity)
+    """
+    def __init__(self,dia,rot,chord,B,Vinf,m=220,n=200,inte=1,coef=None):
+        _,coef = _coef_set(coef)
+        coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9 = coef
+
+        self.dia = dia
+        self.rot = fabs(rot)
+        self.Vinf = Vinf
+        self.xg,self.yg,self.gw,self.wx,self.wy,self.emg,self.fac = _vawtwake.vorticity_grid(dia,rot,chord,B,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m,n,inte)
+        self._trees = {}
+        self._single = None
+        self._moments = None
+
+    def tree(self,tol):
+        """
+        The quadtree of the wake source with the multipole expansion of each cell (built once for each tolerance)
+
+        Parameters
+        ----------
+        tol : float
+            error tolerance of the multipole expansions relative to the vorticity of each cell
+
+        Returns
+        ----------
+        tree : tuple
+            the quadtree arrays used by _vawtwake.tree_eval
+        """
+        if tol not in self._trees:
+            nleaf,ncmax,nterm,theta = _vawtwake.tree_size(np.size(self.xg),np.size(self.yg),tol)
+            ncell,cidx,child,zc,rad,coef = _vawtwake.tree_build(self.xg,self.yg,self.gw,nleaf,ncmax,nterm)
+            self._trees[tol] = (cidx,child,zc,rad,coef,theta)
+
+        return self._trees[tol]
+
+    def velocity(self,x0,y0,tol=0.,precision='double'):
+        """
+        Calculating the induced velocities of the wake at points relative to the turbine
+
+        Parameters
+        ----------
+        x0 : array
+            downstream positions relative to the turbine (m)
+        y0 : array
+            lateral positions relative to the turbine (m)
+        tol : float
+            error tolerance of the tree code for many points (0 sums every node of the wake directly, as does the
+            numpy backend)
+        precision : string
+            'double' or 'single' (float32 nodes, points and velocities of the direct sum for velocity maps; the
+            tree code is always evaluated in double precision)
+
+        Returns
+        ----------
+        velx : array
+            x-induced velocity normalized by the free stream velocity
+        vely : array
+            y-induced velocity normalized by the free stream velocity
+        """
+        if precision not in ['double','single']:
+            raise ValueError("precision must be 'double' or 'single'")
+
+        if tol > 0. and hasattr(_vawtwake,'tree_eval'):
+            cidx,child,zc,rad,coef,theta = self.tree(tol)
+            return _vawtwake.tree_eval(cidx,child,zc,rad,coef,theta,self.xg,self.yg,self.gw,self.wx,self.wy,self.dia,self.emg,self.fac,x0,y0)
+        elif precision == 'single':
+            if self._single is None:
+                self._single = tuple(np.asfortranarray(g,dtype=np.float32) for g in [self.xg,self.yg,self.gw,self.wx,self.wy])
+            xg,yg,gw,wx,wy = self._single
+            return _vawtwake.vel_source_sp(xg,yg,gw,wx,wy,self.dia,self.emg,self.fac,np.asarray(x0,dtype=np.float32),np.asarray(y0,dtype=np.float32))
+        else:
+            return _vawtwake.vel_source(self.xg,self.yg,self.gw,self.wx,self.wy,self.dia,self.emg,self.fac,x0,y0)
+
+    def jacobian(self,x0,y0):
+        """
+        Calculating the induced velocities of the wake and their derivatives with respect to the point position at
+        points relative to the turbine (in the same pass over the nodes as the velocities)
+
+        Parameters
+        ----------
+        x0 : array
+            downstream positions relative to the turbine (m)
+        y0 : array
+            lateral positions relative to the turbine (m)
+
+        Returns
+        ----------
+        velx : array
+            x-induced velocity normalized by the free stream velocity
+        vely : array
+            y-induced velocity normalized by the free stream velocity
+        jac : array
+            derivatives of the normalized induced velocities (jac[i,k] is the derivative of the x- (i = 0) or
+            y-induced (i = 1) velocity with respect to x0 (k = 0) or y0 (k = 1)) (1/m)
+        """
+        velx,vely,dvxdx,dvydx,dvxdy,dvydy = _vawtwake.vel_source_jac(self.xg,self.yg,self.gw,self.wx,self.wy,self.dia,self.emg,self.fac,x0,y0)
+
+        return velx,vely,np.array([[dvxdx,dvxdy],[dvydx,dvydy]])
+
+
+    def far_field(self,x0,y0,far,tol,atol=0.):
+        """
+        Calculating the induced velocities of the wake far from it from the total circulation, dipole and quadrupole
+        of the wake about its centroid
+
+        Parameters
+        ----------
+        x0 : array
+            downstream positions relative to the turbine (m)
+        y0 : array
+            lateral positions relative to the turbine (m)
+        far : float
+            the smallest distance from the centroid using the moments as a multiple of the wake extent (at least 1)
+        tol : float
+            bound of the truncation error of the moments relative to the induced velocity
+        atol : float
+            bound of the truncation error of the moments normalized by the free stream velocity (met when either
+            bound is met)
+
+        Returns
+        ----------
+        velx : array
+            x-induced velocity normalized by the free stream velocity (0 at the near points)
+        vely : array
+            y-induced velocity normalized by the free stream velocity (0 at the near points)
+        near : array
+            True at the points too close to the wake for the moments to meet tol
+        """
+        if self._moments is None:
+            self._moments = _vawtwake.wake_moments(self.xg,self.yg,self.gw)
+        zc,rad,gabs3,mom = self._moments
+
+        velx,vely,near = _vawtwake.vel_far(x0,y0,zc,rad,gabs3,mom,far,tol,atol=atol)
+        return velx,vely,near.astype(bool)
+
+
+class InfluenceMap(object):
+    """
+    The normalized induced velocities of a turbine wake tabulated over a window of x/D and y/D (the influence map)
+    The map only depends on the tip-speed ratio and solidity; it is calculated once, stored on disk and looked up
+    with bicubic splines (with the default spacing, within about 1e-2 of the integration next to the turbine, where
+    the wake starts abruptly, and typically 1e-6 elsewhere)
+
+    Parameters
+    ----------
+    tsr : float
+        tip-speed ratio of the turbine
+    sol : float
+        solidity of the turbine
+    xlim : tuple
+        downstream extent of the map normalized by the turbine diameter
+    ylim : tuple
+        lateral extent of the map normalized by the turbine diameter
+    h : float
+        spacing of the map normalized by the turbine diameter
+    integration : string
+        the integration method of velocity_field used to calculate the map (with the NumPy backend, 'gskr' takes
+        about 0.1 s per point, or hours for the default map, and 'simp' about half a minute)
+    directory : string
+        directory of the stored maps ('None' will use data/maps next to this file)
+    coef : tuple or string
+        the ten arrays of polynomial surface coefficients or the key of a registered set (see register_coef;
+        'None' will use coef_val())
+
+    Attributes
+    ----------
+    x : array
+        downstream positions of the map normalized by the turbine diameter
+    y : array
+        lateral positions of the map normalized by the turbine diameter
+    velx : array
+        x-induced velocity normalized by the free stream velocity (lateral by downstream)
+    vely : array
+        y-induced velocity normalized by the free stream velocity (lateral by downstream)
+    file : string
+        the file storing the map
+    """
+    def __init__(self,tsr,sol,xlim=(-2.,20.),ylim=(-3.,3.),h=0.05,integration='gskr',directory=None,coef=None):
+        ckey,_ = _coef_set(coef)
+        if directory is None:
+            directory = path.join(path.dirname(path.realpath(__file__)),'data','maps')
+
+        # maps are identified by their setup and the polynomial surface coefficients
+        key = repr((float(tsr),float(sol),float(xlim[0]),float(xlim[1]),float(ylim[0]),float(ylim[1]),float(h),integration))
+        key += ckey
+        self.file = path.join(directory,'map_'+hashlib.sha1(key).hexdigest()[:16]+'.npz')
+
+        if path.exists(self.file):
+            data = np.load(self.file)
+            self.x = data['x']
+            self.y = data['y']
+            self.velx = data['velx']
+            self.vely = data['vely']
+        else:
+            self.x = np.linspace(xlim[0],xlim[1],int(round((xlim[1] - xlim[0])/h)) + 1)
+            self.y = np.linspace(ylim[0],ylim[1],int(round((ylim[1] - ylim[0])/h)) + 1)
+            X,Y = np.meshgrid(self.x,self.y)
+            if integration == 'gskr' and get_backend() == 'numpy':
+                print "**** Calculating the influence map with the NumPy Gauss-Kronrod routine (about %d min; use integration='simp' or build _vawtwake) ****" % int(np.ceil(np.size(X)*0.12/60.))
+
+            # unit diameter and free stream velocity (one blade with the chord giving the solidity)
+            self.velx,self.vely = velocity_field(0.,0.,X,Y,1.,1.,2.*tsr,sol/2.,1,veltype='ind',integration=integration,coef=ckey)
+
+            if not path.isdir(directory):
+                makedirs(directory)
+            ftmp = self.file + '.tmp'
+            with open(ftmp,'wb') as f:
+                np.savez(f,x=self.x,y=self.y,velx=self.velx,vely=self.vely,tsr=tsr,sol=sol)
+            rename(ftmp,self.file)
+
+        self._splx = RectBivariateSpline(self.y,self.x,self.velx)
+        self._sply = RectBivariateSpline(self.y,self.x,self.vely)
+
+    def velocity(self,x0,y0):
+        """
+        Looking up the induced velocities of the wake at points relative to the turbine
+
+        Parameters
+        ----------
+        x0 : array
+            downstream positions relative to the turbine normalized by the turbine diameter
+        y0 : array
+            lateral positions relative to the turbine normalized by the turbine diameter
+
+        Returns
+        ----------
+        velx : array
+            x-induced velocity normalized by the free stream velocity (0 outside the map)
+        vely : array
+            y-induced velocity normalized by the free stream velocity (0 outside the map)
+        out : array
+            True at the points outside the map
+        """
+        x0 = np.asarray(x0,dtype=float)
+        y0 = np.asarray(y0,dtype=float)
+        out = (x0 < self.x[0]) | (x0 > self.x[-1]) | (y0 < self.y[0]) | (y0 > self.y[-1])
+
+        velx = np.where(out,0.,self._splx.ev(y0,x0))
+        vely = np.where(out,0.,self._sply.ev(y0,x0))
+
+        return velx,vely,out
+
+
+class WakeSurrogate(object):
+    """
+    Piecewise tensor-product Chebyshev series of the normalized induced velocities of the wake over the tip-speed
+    ratio, solidity, x/D and y/D (the wake surrogate), read from a file made by build_surrogate
+    The downstream positions are scaled by the length of the wake so the pieces meet where the wake starts and ends,
+    and the lateral pieces meet at the lateral bounds of the wake
+
+    Parameters
+    ----------
+    file : string
+        the surrogate file
+
+    Attributes
+    ----------
+    coef : list
+        Chebyshev coefficients of the x- and y-induced velocities of each piece (component, tsr, solidity, x, y),
+        downstream pieces by lateral pieces
+    bounds : array
+        lower and upper bounds of the tsr and solidity
+    xbreak : array
+        bounds of the downstream pieces as fractions of the length of the wake
+    ybreak : array
+        bounds of the lateral pieces normalized by the turbine diameter
+    integration : string
+        the integration method of velocity_field used for the fitting
+    err_max : float
+        the largest error of the induced velocities at the held-out points found by build_surrogate
+    err_rms : float
+        the root mean square error of the induced velocities at the held-out points
+    """
+    def __init__(self,file):
+        data = np.load(file)
+        self.bounds = data['bounds']
+        self.xbreak = data['xbreak']
+        self.ybreak = data['ybreak']
+        self.integration = str(data['integration'])
+        self.err_max = float(data['err_max'])
+        self.err_rms = float(data['err_rms'])
+        self._length = data['length']
+        self.coef = [[data['coef_%d_%d' % (i,j)].astype(float) for j in range(np.size(self.ybreak)-1)] for i in range(np.size(self.xbreak)-1)]
+        self._plane = {}
+
+    def length(self,tsr,sol):
+        """
+        Length of the wake (the downstream bound of the integration) normalized by the turbine diameter
+
+        Parameters
+        ----------
+        tsr : float
+            tip-speed ratio of the turbine
+        sol : float
+            solidity of the turbine
+
+        Returns
+        ----------
+        length : float
+            the length of the wake normalized by the turbine diameter
+        """
+        return _parameterval(tsr,sol,self._length) + 5.
+
+    def velocity(self,tsr,sol,x0,y0):
+        """
+        Calculating the induced velocities of the wake of a turbine at points relative to the turbine
+
+        Parameters
+        ----------
+        tsr : float
+            tip-speed ratio of the turbine
+        sol : float
+            solidity of the turbine
+        x0 : array
+            downstream positions relative to the turbine normalized by the turbine diameter
+        y0 : array
+            lateral positions relative to the turbine normalized by the turbine diameter
+
+        Returns
+        ----------
+        velx : array
+            x-induced velocity normalized by the free stream velocity (0 outside the surrogate)
+        vely : array
+            y-induced velocity normalized by the free stream velocity (0 outside the surrogate)
+        out : array
+            True at the points outside the surrogate
+        """
+        ts = (2.*tsr - (self.bounds[0,0] + self.bounds[0,1]))/(self.bounds[0,1] - self.bounds[0,0])
+        ss = (2.*sol - (self.bounds[1,0] + self.bounds[1,1]))/(self.bounds[1,1] - self.bounds[1,0])
+        if fabs(ts) > 1. or fabs(ss) > 1.:
+            raise ValueError('tsr and sol must be within the bounds of the surrogate')
+
+        # Chebyshev series of the turbine in x and y for each piece (kept for repeated calls with the same turbine)
+        key = (float(tsr),float(sol))
+        plane = self._plane.get(key)
+        if plane is None:
+            plane = []
+            for row in self.coef:
+                nt,ns = np.shape(row[0])[1:3]
+                tt = chebyshev.chebvander(ts,nt-1)[0]
+                st = chebyshev.chebvander(ss,ns-1)[0]
+                plane.append([np.einsum('ktsij,t,s->kij',c,tt,st) for c in row])
+            self._plane = {key:plane}
+
+        x0 = np.asarray(x0,dtype=float)
+        y0 = np.asarray(y0,dtype=float)
+        xl = x0/self.length(tsr,sol)
+        out = (xl < self.xbreak[0]) | (xl > self.xbreak[-1]) | (y0 < self.ybreak[0]) | (y0 > self.ybreak[-1])
+        ix = np.clip(np.searchsorted(self.xbreak,xl) - 1,0,np.size(self.xbreak)-2)
+        iy = np.clip(np.searchsorted(self.ybreak,y0) - 1,0,np.size(self.ybreak)-2)
+
+        velx = np.zeros(np.shape(x0))
+        vely = np.zeros(np.shape(x0))
+        for i in range(np.size(self.xbreak)-1):
+            for j in range(np.size(self.ybreak)-1):
+                pts = (ix == i) & (iy == j) & ~out
+                if np.any(pts):
+                    c = plane[i][j]
+                    xs = (2.*xl[pts] - (self.xbreak[i] + self.xbreak[i+1]))/(self.xbreak[i+1] - self.xbreak[i])
+                    ys = (2.*y0[pts] - (self.ybreak[j] + self.ybreak[j+1]))/(self.ybreak[j+1] - self.ybreak[j])
+                    tx = chebyshev.chebvander(xs,np.shape(c)[1]-1)
+                    ty = chebyshev.chebvander(ys,np.shape(c)[2]-1)
+                    velx[pts] = np.sum(np.dot(tx,c[0])*ty,axis=-1)
+                    vely[pts] = np.sum(np.dot(tx,c[1])*ty,axis=-1)
+
+        return velx,vely,out
+
+
+_wake_sources = {}
+_farm_sources = {}
+_wake_sources_lock = Lock()
+_influence_maps = {}
+_influence_maps_lock = Lock()
+_surrogate = []
+
+# Divisions of Simpson's Rule tried in turn by integration='auto', and the fraction of the tolerance allowed for
+# the Simpson-Trapezoidal difference (the difference can underestimate the error inside the wake)
+_auto_levels = ((40,40),(80,80),(220,200))
+_auto_safety = 0.25
+
+_pool = None
+_pool_lock = Lock()
+
+
+def set_threads(nthreads):
+    """
+    Setting the number of OpenMP threads used by the Fortran routines (_vawtwake must be compiled with -fopenmp)
+
+    Parameters
+    ----------
+    nthreads : int
+        number of threads of the parallel loops
+
+    Returns
+    ----------
+    nthreads : int
+        number of threads in use (1 if _vawtwake was compiled without OpenMP)
+    """
+    _vawtwake.set_threads(nthreads)
+
+    return _vawtwake.get_threads()
+
+
+def thread_pool(workers=None):
+    """
+    Returning the persistent thread pool of the batch calculations (created on the first request and replaced when
+    a different number of workers is requested)
+
+    Parameters
+    ----------
+    workers : int
+        number of threads of the pool ('None' keeps the current pool or uses the number of processors)
+
+    Returns
+    ----------
+    pool : ThreadPoolExecutor
+        the thread pool (each worker runs the OpenMP loops of _vawtwake with one thread)
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None or (workers is not None and workers != _pool._max_workers):
+            if _pool is not None:
+                _pool.shutdown(wait=True)
+            if workers is None:
+                workers = cpu_count()
+            _pool = ThreadPoolExecutor(max_workers=workers,initializer=_vawtwake.set_threads,initargs=(1,))
+
+        return _pool
+
+
+def batch(func,cases,kwargs=None,workers=None):
+    """
+    Evaluating independent calculations concurrently on the persistent thread pool
+    The wrappers of the Fortran routines release the GIL, so the calculations run in parallel without copying
+    the arrays between processes
+
+    Parameters
+    ----------
+    func : function
+        the calculation (e.g. velocity_field, overlap, _vawtwake.radialforce or _vawtwake.powercalc)
+    cases : iterable
+        the positional arguments of each calculation as a tuple
+    kwargs : dict
+        keyword arguments shared by all of the calculations
+    workers : int
+        number of threads of the pool ('None' keeps the current pool or uses the number of processors)
+
+    Returns
+    ----------
+    res : list
+        the result of each calculation in the order of cases
+    """
+    if kwargs is None:
+        kwargs = {}
+
+    pool = thread_pool(workers)
+    futures = [pool.submit(func,*case,**kwargs) for case in cases]
+
+    return [future.result() for future in futures]
+
+
+def emg_kernel(kernel='exact'):
+    """
+    Selecting the EMG kernel used for the vorticity at the integration nodes of the Fortran routines (the cached
+    wake sources are cleared)
+
+    Parameters
+    ----------
+    kernel : string
+        'exact': exp and erf of the EMG distribution at each node,
+        'tab': overflow-safe scaled complementary error function form interpolated from tables (about 1.5 times
+        cheaper; maximum error below 1e-10*abs(scl*skw) across the TSR and solidity range of the model, whereas
+        the exact form loses accuracy to cancellation where the exponent is large and erfc tiny)
+    """
+    if kernel == 'exact':
+        _vawtwake.emg_kernel(0)
+    elif kernel == 'tab':
+        _vawtwake.emg_kernel(1)
+    else:
+        raise ValueError("kernel must be 'exact' or 'tab'")
+    clear_sources()
+
+
+def clear_sources():
+    """
+    Clearing the cached wake sources (wake_source and wake_sources keep at most 64 of each, each holding the
+    weighted vorticity at every node of the wake, and clear them when the limit is reached)
+    """
+    with _wake_sources_lock:
+        _wake_sources.clear()
+        _farm_sources.clear()
+
+
+def set_backend(name):
+    """
+    Selecting the backend of the wake model routines (the cached wake sources are cleared)
+
+    Parameters
+    ----------
+    name : string
+        'fortran' (the compiled module _vawtwake) or 'numpy' (the vectorized NumPy routines)
+
+    Returns
+    ----------
+    previous : string
+        name of the previously selected backend
+    """
+    with _wake_sources_lock:
+        previous = vawt_backend.set_backend(name)
+        _wake_sources.clear()
+        _farm_sources.clear()
+
+    return previous
+
+
+def wake_source(dia,rot,chord,B,Vinf,m=220,n=200,inte=1,coef=None):
+    """
+    Returning the wake source of a turbine (calculated on the first request and cached for turbines of the
+    same type and rotation rate; see clear_sources)
+
+    Parameters
+    ----------
+    see WakeSource
+
+    Returns
+    ----------
+    source : WakeSource
+        the wake source of the turbine
+    """
+    ckey,_ = _coef_set(coef)
+    key = (float(dia),float(fabs(rot)),float(chord),int(B),float(Vinf),int(m),int(n),int(inte),ckey)
+
+    with _wake_sources_lock:
+        if key not in _wake_sources:
+            if len(_wake_sources) >= 64:
+                _wake_sources.clear()
+                _farm_sources.clear()
+            _wake_sources[key] = WakeSource(dia,rot,chord,B,Vinf,m,n,inte,ckey)
+
+        return _wake_sources[key]
+
+
+def wake_sources(diat,rott,chord,B,Vinf,m=220,n=200,inte=1,coef=None):
+    """
+    Stacking the wake sources of a wind farm (for _vawtwake.overlap_source); turbines of the same type and
+    rotation rate share a source, and the stacked arrays are cached for each combination of sources
+
+    Parameters
+    ----------
+    diat : array
+        diameters of the turbines (m)
+    rott : array
+        rotation rates of the turbines (rad/s)
+    see WakeSource for the remaining parameters
+
+    Returns
+    ----------
+    sid : array
+        index of the source of each turbine (starting at 1)
+    xg : array
+        downstream positions of the integration nodes of each source (m)
+    yg : array
+        lateral positions of the integration nodes of each source (m)
+    gw : array
+        the weighted vorticity at the nodes of each source
+    wx : array
+        downstream weights of the nodes of each source
+    wy : array
+        lateral weights of the nodes of each source
+    dias : array
+        turbine diameter of each source (m)
+    emg : array
+        the limited EMG parameter components of each source
+    fac : array
+        normalization of the induced velocity of each source
+    """
+    t = np.size(diat)
+    sid = np.zeros(t,dtype=np.int32)
+    sources = []
+    coef,_ = _coef_set(coef)
+    for i in range(t):
+        source = wake_source(diat[i],rott[i],chord,B,Vinf,m,n,inte,coef)
+        for j in range(len(sources)):
+            if sources[j] is source:
+                sid[i] = j+1
+                break
+        if sid[i] == 0:
+            sources.append(source)
+            sid[i] = len(sources)
+
+    key = tuple(sources)
+    with _wake_sources_lock:
+        if key not in _farm_sources:
+            if len(_farm_sources) >= 64:
+                _farm_sources.clear()
+            xg = np.asfortranarray(np.array([source.xg for source in sources]).T)
+            yg = np.asfortranarray(np.array([source.yg for source in sources]).T)
+            gw = np.asfortranarray(np.transpose(np.array([source.gw for source in sources]),(1,2,0)))
+            wx = np.asfortranarray(np.array([source.wx for source in sources]).T)
+            wy = np.asfortranarray(np.array([source.wy for source in sources]).T)
+            dias = np.array([source.dia for source in sources])
+            emg = np.asfortranarray(np.array([source.emg for source in sources]).T)
+            fac = np.array([source.fac for source in sources])
+            _farm_sources[key] = (xg,yg,gw,wx,wy,dias,emg,fac)
+        xg,yg,gw,wx,wy,dias,emg,fac = _farm_sources[key]
+
+    return sid,xg,yg,gw,wx,wy,dias,emg,fac
+
+
+def influence_map(tsr,sol,coef=None,integration=None):
+    """
+    Returning the influence map of a turbine type with the default window and spacing (read from disk or calculated
+    on the first request, and cached)
+
+    Parameters
+    ----------
+    tsr : float
+        tip-speed ratio of the turbine
+    sol : float
+        solidity of the turbine
+    coef : tuple or string
+        the ten arrays of polynomial surface coefficients or the key of a registered set (see register_coef;
+        'None' will use coef_val())
+    integration : string
+        the integration method of velocity_field used to calculate the map ('None' will use 'gskr' with the Fortran
+        backend and 'simp' with the NumPy backend, where 'gskr' would take hours)
+
+    Returns
+    ----------
+    imap : InfluenceMap
+        the influence map of the turbine
+    """
+    if integration is None:
+        integration = 'gskr' if get_backend() == 'fortran' else 'simp'
+    ckey,_ = _coef_set(coef)
+    key = (float(tsr),float(sol),ckey,integration)
+
+    with _influence_maps_lock:
+        if key not in _influence_maps:
+            _influence_maps[key] = InfluenceMap(tsr,sol,integration=integration,coef=ckey)
+
+        return _influence_maps[key]
+
+
+def build_surrogate(file,deg=(9,9),xbreak=(-0.2,0.,1.,1.5),xdeg=(8,32,12),ybreak=(-3.,-1.,1.,3.),ydeg=(8,40,8),tsr=(1.5,7.0),sol=(0.15,1.0),integration='semi',ntest=1000):
+    """
+    Fitting the piecewise tensor-product Chebyshev series of the wake surrogate at the Chebyshev points of each
+    dimension and piece, and finding its error at random held-out points (an offline calculation)
+
+    Parameters
+    ----------
+    file : string
+        the surrogate file to write
+    deg : tuple
+        number of Chebyshev terms in the tsr and solidity
+    xbreak : tuple
+        bounds of the downstream pieces as fractions of the length of the wake (including 0 and 1 places the
+        start and end of the wake on the bounds of the pieces)
+    xdeg : tuple
+        number of Chebyshev terms of each downstream piece
+    ybreak : tuple
+        bounds of the lateral pieces normalized by the turbine diameter (the wake lies between -1 and 1)
+    ydeg : tuple
+        number of Chebyshev terms of each lateral piece
+    tsr : tuple
+        bounds of the tip-speed ratio
+    sol : tuple
+        bounds of the solidity
+    integration : string
+        the integration method of velocity_field used for the fitting and held-out points (the semi-analytic
+        integration has the same cost at every tsr, while 'gskr' is much slower at low tsr)
+    ntest : int
+        number of held-out points
+
+    Returns
+    ----------
+    err_max : float
+        the largest error of the induced velocities at the held-out points
+    err_rms : float
+        the root mean square error of the induced velocities at the held-out points
+    """
+    bounds = np.array([tsr,sol],dtype=float)
+    length = coef_val()[9]
+    nx = len(xdeg)
+    ny = len(ydeg)
+
+    # Chebyshev points of the tsr, solidity and each piece
+    def chebpts(n):
+        return cos(pi*(np.arange(n) + 0.5)/n)
+    def scale(t,a,b):
+        return 0.5*(a + b) + 0.5*(b - a)*t
+    tsrp = scale(chebpts(deg[0]),tsr[0],tsr[1])
+    solp = scale(chebpts(deg[1]),sol[0],sol[1])
+    xp = [scale(chebpts(xdeg[i]),xbreak[i],xbreak[i+1]) for i in range(nx)]
+    yp = [scale(chebpts(ydeg[j]),ybreak[j],ybreak[j+1]) for j in range(ny)]
+    XL = np.concatenate([np.repeat(xp[i],sum(ydeg)) for i in range(nx)])
+    Y = np.tile(np.concatenate(yp),sum(xdeg))
+
+    # velocities at every point (unit diameter and free stream velocity; one blade with the chord giving the solidity)
+    val = np.zeros((2,deg[0],deg[1],np.size(XL)))
+    for i in range(deg[0]):
+        for j in range(deg[1]):
+            X = XL*(_parameterval(tsrp[i],solp[j],length) + 5.)
+            val[:,i,j] = velocity_field(0.,0.,X,Y,1.,1.,2.*tsrp[i],solp[j]/2.,1,veltype='ind',integration=integration)
+    val = val.reshape((2,deg[0],deg[1],sum(xdeg),sum(ydeg)))
+
+    # coefficients from the discrete orthogonality of the Chebyshev polynomials along each dimension
+    def transform(n):
+        tk = chebyshev.chebvander(chebpts(n),n-1)*(2./n)
+        tk[:,0] *= 0.5
+        return tk
+    coef = np.tensordot(val,transform(deg[0]),axes=([1],[0]))
+    coef = np.tensordot(coef,transform(deg[1]),axes=([1],[0]))
+    coef = np.moveaxis(coef,(3,4),(1,2))
+    pieces = {}
+    ix = np.cumsum((0,)+tuple(xdeg))
+    iy = np.cumsum((0,)+tuple(ydeg))
+    for i in range(nx):
+        for j in range(ny):
+            c = np.tensordot(coef[:,:,:,ix[i]:ix[i+1],iy[j]:iy[j+1]],transform(xdeg[i]),axes=([3],[0]))
+            c = np.tensordot(c,transform(ydeg[j]),axes=([3],[0]))
+            pieces['coef_%d_%d' % (i,j)] = c.astype(np.float32)
+
+    np.savez_compressed(file,bounds=bounds,xbreak=xbreak,ybreak=ybreak,length=length,integration=integration,err_max=0.,err_rms=0.,**pieces)
+
+    # error at random held-out points
+    surrogate = WakeSurrogate(file)
+    np.random.seed(0)
+    err = np.zeros(ntest)
+    for l in range(ntest):
+        tsrl = tsr[0] + (tsr[1] - tsr[0])*np.random.rand()
+        soll = sol[0] + (sol[1] - sol[0])*np.random.rand()
+        xl = (xbreak[0] + (xbreak[-1] - xbreak[0])*np.random.rand())*surrogate.length(tsrl,soll)
+        yl = ybreak[0] + (ybreak[-1] - ybreak[0])*np.random.rand()
+        velx,vely = velocity_field(0.,0.,xl,yl,1.,1.,2.*tsrl,soll/2.,1,veltype='ind',integration=integration)
+        velxs,velys,_ = surrogate.velocity(tsrl,soll,xl,yl)
+        err[l] = sqrt((velxs - velx)**2 + (velys - vely)**2)
+    err_max = np.max(err)
+    err_rms = sqrt(np.mean(err**2))
+
+    np.savez_compressed(file,bounds=bounds,xbreak=xbreak,ybreak=ybreak,length=length,integration=integration,err_max=err_max,err_rms=err_rms,**pieces)
+
+    return err_max,err_rms
+
+
+def wake_surrogate():
+    """
+    Returning the wake surrogate in data/VAWTWakeSurrogate.npz (read on the first request and cached)
+
+    Parameters
+    ----------
+    no parameters
+
+    Returns
+    ----------
+    surrogate : WakeSurrogate
+        the wake surrogate
+    """
+    with _influence_maps_lock:
+        if len(_surrogate) == 0:
+            _surrogate.append(WakeSurrogate(path.join(path.dirname(path.realpath(__file__)),'data','VAWTWakeSurrogate.npz')))
+
+        return _surrogate[0]
+
+
+def wake_buffers(nturb,ntheta):
+    """
+    Preallocating the farm-wide wake velocity arrays that overlap_farm writes in place
+
+    Parameters
+    ----------
+    nturb : int
+        number of turbines in the farm
+    ntheta : int
+        number of points around the flight path of the blades of each turbine
+
+    Returns
+    ----------
+    velx : array
+        Fortran-ordered (ntheta by nturb) array for the x-velocities around each turbine (column i for turbine i;
+        velx.ravel(order='F') is a view with the turbines one after another)
+    vely : array
+        Fortran-ordered (ntheta by nturb) array for the y-velocities around each turbine
+    """
+    velx = np.zeros((ntheta,nturb),order='F')
+    vely = np.zeros((ntheta,nturb),order='F')
+
+    return velx,vely
+
+
+def overlap_farm(xt,yt,diat,rott,chord,B,Vinf,velx,vely,m=220,n=200,tol=0.,coef=None,nsample=0,sample_tol=1e-5):
+    """
+    Calculating the effective velocities around every turbine of a farm due to the wakes of the other turbines
+    with Simpson's Rule (overlap for each turbine in one call)
+    The velocities are written into the given arrays, so once the wake sources are cached no arrays are allocated
+
+    Parameters
+    ----------
+    xt : array
+        downstream positions of the turbines in flow domain (m)
+    yt : array
+        lateral positions of the turbines in flow domain (m)
+    diat : array
+        diameters of the turbines (m)
+    rott : array
+        rotation rates of the turbines (rad/s)
+    chord : float
+        chord length of the turbines (m)
+    B : int
+        number of turbine blades
+    Vinf : float
+        free stream velocity (m/s)
+    velx : array
+        Fortran-ordered float array (ntheta by nturb) overwritten with the x-velocities (see wake_buffers)
+    vely : array
+        Fortran-ordered float array (ntheta by nturb) overwritten with the y-velocities (see wake_buffers)
+    m : int
+        the number of downstream divisions requested for Simpson's Rule (must be divisible by 2)
+    n : int
+        the number of lateral divisions requested for Simpson's Rule (must be divisible by 2)
+    tol : float
+        error tolerance of the tree code (0 sums every node of the wakes directly)
+    coef : tuple or string
+        the ten arrays of polynomial surface coefficients or the key of a registered set (see register_coef;
+        'None' will use coef_val())
+    nsample : int
+        number of points first calculated around the blade flight paths, with the velocity of each wake at the
+        ntheta points interpolated from its Fourier series (0 calculates all ntheta points in place)
+    sample_tol : float
+        error tolerance of the interpolated velocities normalized by the free stream velocity (the number of
+        calculated points of each wake is doubled until it is met)
+
+    Returns
+    ----------
+    velx : array
+        the given x-velocity array with the induced x-velocity at each point around each turbine (m/s)
+    vely : array
+        the given y-velocity array with the induced y-velocity at each point around each turbine (m/s)
+    """
+    for vel in [velx,vely]:
+        if vel.dtype != np.float64 or not vel.flags.f_contiguous or np.shape(vel) != (np.shape(velx)[0],np.size(xt)):
+            raise ValueError('velx and vely must be Fortran-ordered float arrays of shape (ntheta,nturb); see wake_buffers')
+
+    sid,xg,yg,gw,wx,wy,dias,emg,fac = wake_sources(diat,rott,chord,B,Vinf,m,n,1,coef)
+    if nsample > 0:
+        # Fourier interpolation of the velocity of each wake (j) around each turbine (i) before the wake overlap
+        def pairs(theta,rows):
+            if rows is None:
+                rows = np.ones((np.size(xt),np.size(xt)),dtype=bool)
+            velxp,velyp = _vawtwake.farm_velocity(xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,diat,theta,rows,tol=tol)
+            return np.transpose(np.array([velxp,velyp]),(0,2,3,1))
+        t = np.size(xt)
+        p = np.shape(velx)[0]
+        velx_w,vely_w = _rotor_samples(pairs,p,pi/p,nsample,sample_tol)
+
+        if (t == 2): # coupled configuration (only two VAWTs)
+            velx[:] = np.sum(velx_w,axis=0).T*Vinf
+            vely[:] = np.sum(vely_w,axis=0).T*Vinf
+        else: # multiple turbine wake overlap
+            # sum of squares of velocity deficits
+            intex = np.sum(-velx_w*fabs(velx_w),axis=0).T
+            intey = np.sum(vely_w*fabs(vely_w),axis=0).T
+
+            # square root of sum of squares
+            velx[:] = np.where(intex >= 0.0,-Vinf*sqrt(fabs(intex)),Vinf*sqrt(fabs(intex)))
+            vely[:] = np.where(intey >= 0.0,Vinf*sqrt(fabs(intey)),-Vinf*sqrt(fabs(intey)))
+    else:
+        _vawtwake.overlap_farm(xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,diat,Vinf,velx,vely,tol=tol)
+
+    return velx,vely
+
+
+def _velocity_auto(x0,y0,Vinf,dia,rot,chord,B,emg,tol,far,coef):
+    """
+    Calculating the induced velocities of a wake at points relative to the turbine with the cheapest method
+    meeting tol at each point: the far-field moments where their error bound meets tol, then Simpson's Rule on
+    the wake sources of _auto_levels where the difference from the Trapezoidal Rule on the same nodes is below
+    _auto_safety*tol, and adaptive Gauss-Kronrod integration for the points left (the points near the wake sheet)
+
+    Parameters
+    ----------
+    x0 : array
+        downstream positions relative to the turbine (m)
+    y0 : array
+        lateral positions relative to the turbine (m)
+    emg : tuple
+        the EMG distribution parameters (loc1, loc2, loc3, spr1, spr2, skw1, skw2, scl1, scl2, scl3) for 'gskr'
+    tol : float
+        the error tolerance of the normalized induced velocities
+    far : float
+        the smallest distance from the wake centroid using the moments as a multiple of the wake extent
+    coef : string
+        the key of the registered polynomial surface coefficients of the wake sources
+
+    Returns
+    ----------
+    velx : array
+        x-induced velocity normalized by the free stream velocity
+    vely : array
+        y-induced velocity normalized by the free stream velocity
+    info : dict
+        'method' (the method used at each point: 'far', 'simp' or 'gskr'), 'err' (estimated error of the
+        normalized induced velocities), 'm' and 'n' (the divisions of Simpson's Rule, 0 for the other methods)
+    """
+    npt = np.size(x0)
+    err = np.zeros(npt)
+    method = np.empty(npt,dtype='S4')
+    mout = np.zeros(npt,dtype=int)
+    nout = np.zeros(npt,dtype=int)
+
+    # Far-field moments of the finest wake source
+    m,n = _auto_levels[-1]
+    source = wake_source(dia,rot,chord,B,Vinf,m,n,1,coef)
+    velx,vely,todo = source.far_field(x0,y0,far,0.,atol=tol)
+    zc,rad,gabs3,_ = source._moments
+    r = np.abs(x0[~todo] + 1j*y0[~todo] - zc)
+    err[~todo] = gabs3/(r**3*(r - rad))
+    method[~todo] = 'far'
+
+    # Simpson's Rule from the coarsest wake source, with the Trapezoidal Rule on the same nodes as the error estimate
+    for m,n in _auto_levels:
+        if not np.any(todo):
+            break
+        idx = np.nonzero(todo)[0]
+        vxs,vys = wake_source(dia,rot,chord,B,Vinf,m,n,1,coef).velocity(x0[idx],y0[idx])
+        vxt,vyt = wake_source(dia,rot,chord,B,Vinf,m,n,2,coef).velocity(x0[idx],y0[idx])
+        est = np.sqrt((vxs - vxt)**2 + (vys - vyt)**2)
+        ok = est <= _auto_safety*tol
+        met = idx[ok]
+        velx[met] = vxs[ok]
+        vely[met] = vys[ok]
+        err[met] = est[ok]
+        method[met] = 'simp'
+        mout[met] = m
+        nout[met] = n
+        todo[met] = False
+
+    # Gauss-Kronrod integration near the wake sheet (the absolute tolerance scaled to the unnormalized integrals)
+    if np.any(todo):
+        loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3 = emg
+        scale = fabs(rot)/(2.*pi*Vinf)
+        vxg,vyg,errg,_ = _vawtwake.vel_gskr(x0[todo],y0[todo],dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,epsabs=_auto_safety*tol/scale,epsrel=0.)
+        velx[todo] = vxg*scale
+        vely[todo] = vyg*scale
+        err[todo] = errg*scale
+        method[todo] = 'gskr'
+
+    return velx,vely,{'method':method,'err':err,'m':mout,'n':nout}
+
+
+def velocity_field(xt,yt,x0,y0,Vinf,dia,rot,chord,B,param=None,veltype='all',integration='simp',m=220,n=200,tol=1e-3,full_output=False,panels=(12,10),order=8,precision='double',far=0.,far_tol=1e-3,imap=None,coef=None):
     """
     Calculating normalized velocity from the vorticity data at (x0,y0) in global flow domain
 
@@ -229,10 +1329,10 @@ def velocity_field(xt,yt,x0,y0,Vinf,dia,rot,chord,B,param=None,veltype='all',int
         downstream position of surrounding turbine in flow domain (m)
     yt : float
         lateral position of surrounding turbine in flow domain (m)
-    x0 : float
-        downstream position in flow domain to be calculated (m)
-    y0 : float
-        lateral position in flow domain to be calculated (m)
+    x0 : float or array
+        downstream position(s) in flow domain to be calculated (m)
+    y0 : float or array
+        lateral position(s) in flow domain to be calculated (m)
     Vinf : float
         free stream velocity (m/s)
     dia : float
@@ -246,39 +1346,89 @@ def velocity_field(xt,yt,x0,y0,Vinf,dia,rot,chord,B,param=None,veltype='all',int
         the type of velocity to calculate ('all': velocity magnitude, 'x': x-induced velocity, 'y': y-induced velocity,
         'ind': vector of both x- and y-induced velocities without free stream, 'vort': vorticity profile neglecting integration)
     integration : string
-        the type of integration method used ('simp': Simpson's Rule, 'gskr': 21 Point Gauss-Kronrod Rule)
+        the type of integration method used ('simp': Simpson's Rule, 'gskr': 21 Point Gauss-Kronrod Rule,
+        'semi': semi-analytic integration with the lateral integral calculated analytically,
+        'adapt': adaptive Simpson's Rule with the divisions chosen automatically to meet tol,
+        'graded': Simpson's Rule with lateral nodes clustered on the shear layers and the decayed wake trimmed,
+        'gauss': composite Gauss-Legendre Rule with panels and order,
+        'sym': Simpson's Rule folded about the wake centerline with the vorticity calculated once per mirrored node pair,
+        'map': bicubic lookup in the stored influence map of the turbine type, with 'gskr' outside the map,
+        'surrogate': the Chebyshev series of wake_surrogate(), integrated outside its downstream and lateral bounds,
+        'auto': the cheapest of the far-field moments, Simpson's Rule at increasing divisions and 'gskr' meeting tol
+        at each point)
     m : int
         the number of downstream divisions requested for Simpson's Rule (must be divisible by 2); neglected otherwise
     n : int
-        the number of downstream divisions requested for Simpson's Rule (must be divisible by 2); neglected otherwise
+        the number of lateral divisions requested for Simpson's Rule (must be divisible by 2, or 4 for 'sym');
+        neglected otherwise
+    tol : float
+        the relative tolerance of the velocity for adaptive Simpson's Rule, or the error tolerance of the normalized
+        induced velocities for 'auto'; neglected otherwise
+    full_output : bool
+        return a dictionary of integration information with the velocity ('adapt' and 'auto' only)
+    panels : tuple
+        the number of downstream and lateral panels for the Gauss-Legendre Rule; neglected otherwise
+    order : int
+        the number of Gauss-Legendre points in each direction of a panel; neglected otherwise
+    precision : string
+        'double' or 'single' (float32 wake source and velocities for Simpson's Rule; 'simp' only)
+    far : float
+        points farther from the wake centroid than far times the wake extent are calculated from the total
+        circulation, dipole and quadrupole of the wake source when the error bound meets far_tol, with the other
+        points integrated (0 integrates every point; not used with full_output); with 'auto' the moments are
+        tried beyond max(far,1) times the wake extent and must meet tol instead of far_tol
+    far_tol : float
+        bound of the truncation error of the far-field velocity relative to the induced velocity
+    imap : InfluenceMap
+        the influence map used with 'map' ('None' will use influence_map() of the turbine; e.g.
+        influence_map(tsr,sol,integration='simp') for a map calculated more cheaply)
+    coef : tuple or string
+        the ten arrays of polynomial surface coefficients or the key of a registered set (see register_coef;
+        'None' will use coef_val())
 
     Returns
     ----------
-    vel : float
+    vel : float or array
         final normalized velocity at (x0,y0) with respect to the free stream velocity (m/s)
+        (arrays of x0 and y0 are broadcast together and an array of the same shape is returned; 'ind' adds
+        a leading axis of length 2 for the x- and y-induced velocities)
+    info : dict
+        only returned with full_output: 'err' (estimated error of the normalized induced velocities), 'neval'
+        (number of vorticity evaluations), 'm' and 'n' (the final downstream and lateral divisions); 'auto' returns
+        'method' (the method used at each point: 'far', 'simp' or 'gskr') in place of 'neval'
     """
+    if precision not in ['double','single']:
+        raise ValueError("precision must be 'double' or 'single'")
+    if precision == 'single' and integration != 'simp' and veltype != 'vort':
+        raise ValueError("precision='single' is only available with integration='simp'")
+    if integration == 'sym' and n % 4 != 0:
+        # the centerline must be a node of even index for the folded half of Simpson's Rule
+        raise ValueError("n must be divisible by 4 with integration='sym'")
+
     rad = dia/2.
     tsr = rad*fabs(rot)/Vinf
     solidity = (chord*B)/rad
 
+    # Arranging the calculation points (arrays of points are evaluated together)
+    multi = np.ndim(x0) > 0 or np.ndim(y0) > 0
+    x0,y0 = np.broadcast_arrays(np.asarray(x0,dtype=float),np.asarray(y0,dtype=float))
+    shape = x0.shape
+    x0 = x0.flatten()
+    y0 = y0.flatten()
+    npt = np.size(x0)
+
     # Translating the turbine position
     x0t = x0 - xt
     y0t = y0 - yt
+    farcalc = far > 0. and veltype != 'vort' and not full_output and integration != 'auto'
 
-    coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9 = coef_val()
+    # Polynomial surface coefficients (looked up once and passed by key to the wake sources and inner calls)
+    ckey,coef = _coef_set(coef)
+    coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9 = coef
 
     # Calculating EMG distribution parameters (based on polynomial surface fitting)
     if param is None:
-        loc1 = _parameterval(tsr,solidity,coef0)
-        loc2 = _parameterval(tsr,solidity,coef1)
-        loc3 = _parameterval(tsr,solidity,coef2)
-        spr1 = _parameterval(tsr,solidity,coef3)
-        spr2 = _parameterval(tsr,solidity,coef4)
-        skw1 = _parameterval(tsr,solidity,coef5)
-        skw2 = _parameterval(tsr,solidity,coef6)
-        scl1 = _parameterval(tsr,solidity,coef7)
-        scl2 = _parameterval(tsr,solidity,coef8)
-        scl3 = _parameterval(tsr,solidity,coef9)
+        loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3 = parameterval(tsr,solidity,ckey)
 
     else:
         # Reading in EMG distribution parameters
@@ -296,10 +1446,17 @@ def velocity_field(xt,yt,x0,y0,Vinf,dia,rot,chord,B,param=None,veltype='all',int
     ###################################
     if veltype == 'vort':
         # VORTICITY CALCULATION (NO INTEGRATION)
-        if x0t < 0.:
-            vel = 0.
-        else:
-            vel = _vawtwake.vorticitystrength(x0t,y0t,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3)/rot
+        vel = np.zeros(npt)
+        for i in range(npt):
+            if x0t[i] >= 0.:
+                vel[i] = _vawtwake.vorticitystrength(x0t[i],y0t[i],dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3)/rot
+    ###################################
+    elif farcalc:
+        # FAR-FIELD EXPANSION OF THE WAKE SOURCE (the points near the wake are integrated with the chosen method)
+        source = wake_source(dia,rot,chord,B,Vinf,coef=ckey)
+        vel_xs,vel_ys,near = source.far_field(x0t,y0t,far,far_tol)
+        if np.any(near):
+            vel_xs[near],vel_ys[near] = velocity_field(xt,yt,x0[near],y0[near],Vinf,dia,rot,chord,B,param,'ind',integration,m,n,tol,False,panels,order,precision,imap=imap,coef=ckey)
     ###################################
     else:
         # Integration of the vorticity profile to calculate velocity
@@ -311,44 +1468,497 @@ def velocity_field(xt,yt,x0,y0,Vinf,dia,rot,chord,B,param=None,veltype='all',int
             if param is not None:
                 print "**** Using polynomial surface coefficients from VAWTPolySurfaceCoef.csv for Simpson's rule integration ****"
 
-            vel_xs,vel_ys = _vawtwake.vel_field(xt,yt,x0,y0,dia,rot,chord,B,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m,n,inte)
+            # the wake source of the turbine is calculated once and reused for all of the points
+            source = wake_source(dia,rot,chord,B,Vinf,m,n,inte,ckey)
+            vel_xs,vel_ys = source.velocity(x0t,y0t,precision=precision)
+    ###################################
+        elif integration == 'sym':
+            # SIMPSON'S RULE FOLDED ABOUT THE WAKE CENTERLINE (antisymmetric vorticity calculated once per node pair)
+            inte = 6
+
+            if param is not None:
+                print "**** Using polynomial surface coefficients from VAWTPolySurfaceCoef.csv for Simpson's rule integration ****"
+
+            vel_xs,vel_ys = _vawtwake.vel_field_mult(xt,yt,x0,y0,dia,rot,chord,B,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m,n,inte)
+    ###################################
+        elif integration == 'semi':
+            # SEMI-ANALYTIC INTEGRATION (lateral integral of the vorticity calculated analytically)
+            inte = 3
+            ms = 32 # downstream Gauss-Legendre points on each side of the point
+            ns = 50 # lateral panels of the vorticity
+
+            if param is not None:
+                print "**** Using polynomial surface coefficients from VAWTPolySurfaceCoef.csv for semi-analytic integration ****"
+
+            vel_xs,vel_ys = _vawtwake.vel_field_mult(xt,yt,x0,y0,dia,rot,chord,B,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,ms,ns,inte)
+    ###################################
+        elif integration == 'graded':
+            # SIMPSON'S RULE ON GRADED NODES (clustered on the shear layers, wake trimmed where the vorticity decays)
+            inte = 4
+            mg = 100 # downstream divisions
+            ng = 50 # lateral divisions on each side of the wake
+
+            if param is not None:
+                print "**** Using polynomial surface coefficients from VAWTPolySurfaceCoef.csv for graded Simpson's rule integration ****"
+
+            vel_xs,vel_ys = _vawtwake.vel_field_mult(xt,yt,x0,y0,dia,rot,chord,B,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,mg,ng,inte)
+    ###################################
+        elif integration == 'gauss':
+            # COMPOSITE GAUSS-LEGENDRE RULE
+            inte = 5
+            mp,np_ = panels
+
+            if param is not None:
+                print "**** Using polynomial surface coefficients from VAWTPolySurfaceCoef.csv for Gauss-Legendre Rule integration ****"
+
+            vel_xs,vel_ys = _vawtwake.vel_field_mult(xt,yt,x0,y0,dia,rot,chord,B,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,mp,np_,inte,nq=order)
+    ###################################
+        elif integration == 'adapt':
+            # ADAPTIVE SIMPSON'S RULE INTEGRATION (divisions doubled until the error estimate meets tol)
+            if param is not None:
+                print "**** Using polynomial surface coefficients from VAWTPolySurfaceCoef.csv for adaptive Simpson's rule integration ****"
+
+            vel_xs,vel_ys,err,neval,mout,nout = _vawtwake.vel_adapt(xt,yt,x0,y0,dia,rot,chord,B,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,tol)
+            info = {'err':err,'neval':neval,'m':mout,'n':nout}
+    ###################################
+        elif integration == 'map':
+            # BICUBIC LOOKUP IN THE INFLUENCE MAP (points outside the map use Gauss-Kronrod integration)
+            if param is not None:
+                print "**** Using polynomial surface coefficients from VAWTPolySurfaceCoef.csv for the influence map ****"
+
+            if imap is None:
+                imap = influence_map(tsr,solidity,ckey)
+            vel_xs,vel_ys,out = imap.velocity(x0t/dia,y0t/dia)
+            if np.any(out):
+                vel_xs[out],vel_ys[out] = velocity_field(xt,yt,x0[out],y0[out],Vinf,dia,rot,chord,B,param,'ind','gskr',coef=ckey)
+    ###################################
+        elif integration == 'surrogate':
+            # CHEBYSHEV SURROGATE OF THE WAKE (points outside the surrogate use the integration it was fitted to)
+            if param is not None:
+                print "**** Using polynomial surface coefficients from VAWTPolySurfaceCoef.csv for the wake surrogate ****"
+
+            if ckey != _coef_file(_coef_default):
+                raise ValueError("the wake surrogate is fitted with the coefficients of coef_val(); use another integration with coef")
 
-            if veltype == 'all':
-                vel = sqrt((vel_xs*Vinf + Vinf)**2 + (vel_ys*Vinf)**2)/Vinf
-            elif veltype == 'x':
-                vel = (vel_xs*Vinf + Vinf)/Vinf
-            elif veltype == 'y':
-                vel = vel_ys
-            elif veltype == 'ind':
-                vel = np.array([vel_xs,vel_ys])
+            surrogate = wake_surrogate()
+            vel_xs,vel_ys,out = surrogate.velocity(tsr,solidity,x0t/dia,y0t/dia)
+            if np.any(out):
+                vel_xs[out],vel_ys[out] = velocity_field(xt,yt,x0[out],y0[out],Vinf,dia,rot,chord,B,param,'ind',surrogate.integration,coef=ckey)
+    ###################################
+        elif integration == 'auto':
+            # CHEAPEST METHOD MEETING THE TOLERANCE AT EACH POINT (the method used is reported in info['method'])
+            if param is not None:
+                print "**** Using polynomial surface coefficients from VAWTPolySurfaceCoef.csv for Simpson's rule integration ****"
+
+            emg = (loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3)
+            vel_xs,vel_ys,info = _velocity_auto(x0t,y0t,Vinf,dia,rot,chord,B,emg,tol,far,ckey)
     ###################################
         elif integration == 'gskr':
             # 21-POINT GAUSS-KRONROD RULE QUADRATURE INTEGRATION
-            xbound = (scl3+5.)*dia
-            argval = (x0t,y0t,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3)
-            if veltype == 'all' or veltype == 'x' or veltype == 'ind':
-                vel_x = _dblquad(_vawtwake.integrandx,0.,xbound,lambda x: -1.*dia,lambda x: 1.*dia,args=argval)
-                vel_xs = (vel_x[0]*fabs(rot))/(2.*pi)
-            if veltype == 'all' or veltype == 'y' or veltype == 'ind':
-                vel_y = _dblquad(_vawtwake.integrandy,0.,xbound,lambda x: -1.*dia,lambda x: 1.*dia,args=argval)
-                vel_ys = (vel_y[0]*fabs(rot))/(2.*pi)
-
-            if veltype == 'all':
-                vel = sqrt((vel_xs + Vinf)**2 + (vel_ys)**2)/Vinf
-            elif veltype == 'x':
-                vel = (vel_xs + Vinf)/Vinf
-            elif veltype == 'y':
-                vel = vel_ys/Vinf
-            elif veltype == 'ind':
-                vel = np.array([vel_xs,vel_ys])/Vinf
+            # (both components are integrated together in one adaptive pass)
+            vel_xs,vel_ys,_,_ = _vawtwake.vel_gskr(x0t,y0t,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3)
+            vel_xs = (vel_xs*fabs(rot))/(2.*pi*Vinf)
+            vel_ys = (vel_ys*fabs(rot))/(2.*pi*Vinf)
     ###################################
 
+    # Calculating the velocity type from the normalized induced velocities (the vorticity is returned directly)
+    if veltype == 'all':
+        vel = sqrt((vel_xs*Vinf + Vinf)**2 + (vel_ys*Vinf)**2)/Vinf
+    elif veltype == 'x':
+        vel = (vel_xs*Vinf + Vinf)/Vinf
+    elif veltype == 'y':
+        vel = vel_ys
+    elif veltype == 'ind':
+        vel = np.array([vel_xs,vel_ys])
+
+    # Returning the velocities in the shape of the given points
+    if veltype == 'ind':
+        if multi:
+            vel = vel.reshape((2,)+shape)
+        else:
+            vel = vel[:,0]
+    else:
+        if multi:
+            vel = vel.reshape(shape)
+        else:
+            vel = vel[0]
+
+    if full_output and integration in ['adapt','auto'] and veltype != 'vort':
+        for key in info:
+            if multi:
+                info[key] = info[key].reshape(shape)
+            else:
+                info[key] = info[key][0]
+        return vel,info
+    else:
+        return vel
+
+def velocity_jacobian(xt,yt,x0,y0,Vinf,dia,rot,chord,B,m=220,n=200,coef=None):
+    """
+    Calculating the normalized induced velocities at (x0,y0) in global flow domain with their derivatives with
+    respect to the point and turbine positions (Simpson's Rule with the wake source of the turbine; about 1.5 times
+    the cost of the velocities, instead of four evaluations for central differences)
+
+    Parameters
+    ----------
+    xt : float
+        downstream position of surrounding turbine in flow domain (m)
+    yt : float
+        lateral position of surrounding turbine in flow domain (m)
+    x0 : float or array
+        downstream position(s) in flow domain to be calculated (m)
+    y0 : float or array
+        lateral position(s) in flow domain to be calculated (m)
+    Vinf : float
+        free stream velocity (m/s)
+    dia : float
+        turbine diameter (m)
+    rot : float
+        turbine rotation rate (rad/s)
+    chord : float
+        chord length of the turbine (m)
+    B : int
+        number of turbine blades
+    m : int
+        the number of downstream divisions requested for Simpson's Rule (must be divisible by 2)
+    n : int
+        the number of lateral divisions requested for Simpson's Rule (must be divisible by 2)
+    coef : tuple or string
+        the ten arrays of polynomial surface coefficients or the key of a registered set (see register_coef;
+        'None' will use coef_val())
+
+    Returns
+    ----------
+    vel : array
+        x- and y-induced velocities normalized by the free stream velocity (a leading axis of length 2 added to
+        the shape of x0 and y0 broadcast together, as with veltype='ind' of velocity_field)
+    jac0 : array
+        derivatives of the normalized induced velocities with respect to the point position (jac0[i,k] is the
+        derivative of the x- (i = 0) or y-induced (i = 1) velocity with respect to x0 (k = 0) or y0 (k = 1)) (1/m)
+    jact : array
+        derivatives of the normalized induced velocities with respect to the turbine position (xt,yt), the negative
+        of jac0 as the wake moves with the turbine (1/m)
+    """
+    x0,y0 = np.broadcast_arrays(np.asarray(x0,dtype=float),np.asarray(y0,dtype=float))
+    shape = np.shape(x0)
+
+    source = wake_source(dia,rot,chord,B,Vinf,m,n,1,coef)
+    velx,vely,jac = source.jacobian(np.ravel(x0) - xt,np.ravel(y0) - yt)
+
+    vel = np.reshape(np.array([velx,vely]),(2,) + shape)
+    jac0 = np.reshape(jac,(2,2) + shape)
+
+    return vel,jac0,-jac0
+
+
+def overlap_jacobian(p,xt,yt,diat,rott,chord,B,x0,y0,dia,Vinf,pointcalc,coef=None):
+    """
+    Calculating wake velocities around a turbine based on wake overlap from surrounding turbines with their
+    derivatives with respect to the position of the turbine and of each surrounding turbine (Simpson's rule
+    integration with cached wake sources, as overlap with integration='simp')
+
+    Parameters
+    ----------
+    see overlap
+
+    Returns
+    ----------
+    velx : array
+        final induced x-velocity at each point around the turbine being calculated (m/s)
+    vely : array
+        final induced y-velocity at each point around the turbine being calculated (m/s)
+    jac0 : array
+        derivatives of the velocities with respect to the position of the turbine being calculated, shaped (2,2,p)
+        (jac0[i,k,l] is the derivative of velx[l] (i = 0) or vely[l] (i = 1) with respect to x0 (k = 0) or
+        y0 (k = 1)) (1/s)
+    jact : array
+        derivatives of the velocities with respect to the positions of the surrounding turbines, shaped (2,2,t,p)
+        for t turbines (jact[i,k,j,l] is the derivative of velx[l] (i = 0) or vely[l] (i = 1) with respect to
+        xt[j] (k = 0) or yt[j] (k = 1)) (1/s)
+    """
+    t = np.size(xt) # number of turbines
+
+    if pointcalc == True:
+        xd = np.array([x0])
+        yd = np.array([y0])
+    else:
+        # finding points around the flight path of the blades
+        theta = (2.0*pi/p)*np.arange(p)-(2.0*pi/p)/2.0
+        xd = x0 - sin(theta)*(dia/2.0)
+        yd = y0 + cos(theta)*(dia/2.0)
+
+    # induced velocities of each turbine wake and their derivatives with respect to the points
+    velx_w = np.zeros((t,p))
+    vely_w = np.zeros((t,p))
+    jac_w = np.zeros((2,2,t,p))
+    coef,_ = _coef_set(coef)
+    for w in range(t):
+        source = wake_source(diat[w],rott[w],chord,B,Vinf,coef=coef)
+        velx_w[w,:np.size(xd)],vely_w[w,:np.size(xd)],jac_w[:,:,w,:np.size(xd)] = source.jacobian(xd-xt[w],yd-yt[w])
+
+    if (t == 1): # coupled configuration (only two VAWTs)
+        velx = velx_w[0]*Vinf
+        vely = vely_w[0]*Vinf
+        dvel = jac_w*Vinf
+    else: # multiple turbine wake overlap
+        # sum of squares of velocity deficits
+        intex = np.sum(-velx_w*fabs(velx_w),axis=0)
+        intey = np.sum(vely_w*fabs(vely_w),axis=0)
+
+        # square root of sum of squares
+        velx = np.where(intex >= 0.0,-Vinf*sqrt(fabs(intex)),Vinf*sqrt(fabs(intex)))
+        vely = np.where(intey >= 0.0,Vinf*sqrt(fabs(intey)),-Vinf*sqrt(fabs(intey)))
+
+        # chain rule through the square root of sum of squares (dvelx/dvelx_w = Vinf*|velx_w|/sqrt(|intex|))
+        sx = np.sqrt(fabs(intex))
+        sy = np.sqrt(fabs(intey))
+        cx = np.where(sx > 0.0,Vinf*fabs(velx_w)/np.where(sx > 0.0,sx,1.0),0.0)
+        cy = np.where(sy > 0.0,Vinf*fabs(vely_w)/np.where(sy > 0.0,sy,1.0),0.0)
+        dvel = np.array([cx*jac_w[0],cy*jac_w[1]])
+
+    # the wakes move with the surrounding turbines and the points with the turbine being calculated
+    jac0 = np.sum(dvel,axis=2)
+    jact = -dvel
+
+    return velx,vely,jac0,jact
+
+
+def _fftconvolve_single(kern,gam):
+    """
+    Valid mode convolution of a complex kernel with the smaller vorticity array using single precision FFTs
+
+    Parameters
+    ----------
+    kern : array
+        complex kernel (larger than gam in both directions)
+    gam : array
+        real weighted vorticity
+
+    Returns
+    ----------
+    conv : array
+        complex64 convolution at the positions where gam lies entirely within kern
+    """
+    nk = np.array(np.shape(kern))
+    ng = np.array(np.shape(gam))
+    fshape = [fftpack.next_fast_len(int(d)) for d in nk + ng - 1]
+
+    spk = fftpack.fftn(np.asarray(kern,dtype=np.complex64),fshape,overwrite_x=True)
+    spg = fftpack.fftn(np.asarray(gam,dtype=np.complex64),fshape,overwrite_x=True)
+    conv = fftpack.ifftn(spk*spg,overwrite_x=True)
+
+    return conv[ng[0]-1:nk[0],ng[1]-1:nk[1]]
+
+
+def velocity_grid(xt,yt,x,y,Vinf,dia,rot,chord,B,veltype='all',m=220,n=200,precision='double',coef=None):
+    """
+    Calculating normalized velocity over a uniform grid of points in global flow domain by FFT convolution
+    of the gridded vorticity with the induced velocity kernel (for full velocity maps of a wake)
+
+    Parameters
+    ----------
+    xt : float
+        downstream position of surrounding turbine in flow domain (m)
+    yt : float
+        lateral position of surrounding turbine in flow domain (m)
+    x : array
+        uniformly spaced downstream positions of the grid (m)
+    y : array
+        uniformly spaced lateral positions of the grid (m)
+    Vinf : float
+        free stream velocity (m/s)
+    dia : float
+        turbine diameter (m)
+    rot : float
+        turbine rotation rate (rad/s)
+    chord : float
+        chord length of the turbine (m)
+    B : int
+        number of turbine blades
+    veltype : string
+        the type of velocity to calculate ('all': velocity magnitude, 'x': x-induced velocity, 'y': y-induced velocity,
+        'ind': vector of both x- and y-induced velocities without free stream)
+    m : int
+        the number of downstream divisions of the wake; the grid is refined so the vorticity is sampled at least this finely
+    n : int
+        the number of lateral divisions of the wake; the grid is refined so the vorticity is sampled at least this finely
+    precision : string
+        'double' or 'single' (both induced velocities from one complex convolution with single precision FFTs)
+    coef : tuple or string
+        the ten arrays of polynomial surface coefficients or the key of a registered set (see register_coef;
+        'None' will use coef_val())
+
+    Returns
+    ----------
+    vel : array
+        final normalized velocity at each grid point with respect to the free stream velocity (m/s)
+        (shape of np.meshgrid(x,y); 'ind' adds a leading axis of length 2 for the x- and y-induced velocities)
+    """
+    if precision not in ['double','single']:
+        raise ValueError("precision must be 'double' or 'single'")
+
+    x = np.asarray(x,dtype=float)
+    y = np.asarray(y,dtype=float)
+    nx = np.size(x)
+    ny = np.size(y)
+    if nx < 2 or ny < 2:
+        raise ValueError('velocity_grid requires at least two points in each direction')
+    hx = (x[-1] - x[0])/(nx - 1)
+    hy = (y[-1] - y[0])/(ny - 1)
+    if hx <= 0. or hy <= 0. or not np.allclose(np.diff(x),hx) or not np.allclose(np.diff(y),hy):
+        raise ValueError('velocity_grid requires increasing, uniformly spaced x and y')
+
+    # EMG parameters and downstream extent of the wake
+    source = wake_source(dia,rot,chord,B,Vinf,m,n,1,coef)
+    xb = source.xg[-1]
+
+    # Refining the grid so the vorticity is sampled at least as finely as the Simpson's rule nodes
+    rx = int(np.ceil(hx/(xb/m)))
+    ry = int(np.ceil(hy/(2.*dia/n)))
+    hx = hx/rx
+    hy = hy/ry
+    nxr = (nx - 1)*rx + 1
+    nyr = (ny - 1)*ry + 1
+
+    # Vorticity nodes on the refined grid covering the wake (relative to the turbine)
+    i0 = int(np.floor((xt - x[0])/hx))
+    i1 = int(np.ceil((xt + xb - x[0])/hx))
+    j0 = int(np.floor((yt - dia - y[0])/hy))
+    j1 = int(np.ceil((yt + dia - y[0])/hy))
+    xs = x[0] + np.arange(i0,i1+1)*hx - xt
+    ys = y[0] + np.arange(j0,j1+1)*hy - yt
+    nxs = np.size(xs)
+    nys = np.size(ys)
+
+    # Lengths of the cells of each node lying within the wake
+    wx = np.clip(np.minimum(xs + hx/2.,xb) - np.maximum(xs - hx/2.,0.),0.,None)
+    wy = np.clip(np.minimum(ys + hy/2.,dia) - np.maximum(ys - hy/2.,-dia),0.,None)
+
+    gam = np.zeros((nys,nxs))
+    for i in range(nxs):
+        if wx[i] > 0.:
+            loc,spr,skw,scl = _vawtwake.emgcolumn(xs[i],dia,*source.emg)
+            gam[:,i] = _vawtwake.vorticity_column(ys/dia,loc,spr,skw,scl)
+    gam = gam*np.outer(wy,wx)*(fabs(rot)/(2.*pi))/Vinf
+
+    # Induced velocity kernel at every separation between the grid and the vorticity nodes
+    dx = (np.arange(nxr + nxs - 1) - (i0 + nxs - 1))*hx
+    dy = (np.arange(nyr + nys - 1) - (j0 + nys - 1))*hy
+    DX,DY = np.meshgrid(dx,dy)
+    r2 = DX**2 + DY**2
+    r2[r2 == 0.] = np.inf # a node at the point itself does not contribute
+
+    if precision == 'single':
+        vel = _fftconvolve_single(-DY/r2 + 1j*(DX/r2),gam)[::ry,::rx]
+        vel_xs = vel.real
+        vel_ys = vel.imag
+    else:
+        vel_xs = fftconvolve(-DY/r2,gam,mode='valid')[::ry,::rx]
+        vel_ys = fftconvolve(DX/r2,gam,mode='valid')[::ry,::rx]
+
+    if veltype == 'all':
+        vel = sqrt((vel_xs*Vinf + Vinf)**2 + (vel_ys*Vinf)**2)/Vinf
+    elif veltype == 'x':
+        vel = (vel_xs*Vinf + Vinf)/Vinf
+    elif veltype == 'y':
+        vel = vel_ys
+    elif veltype == 'ind':
+        vel = np.array([vel_xs,vel_ys])
+
     return vel
 
-def overlap(p,xt,yt,diat,rott,chord,B,x0,y0,dia,Vinf,pointcalc,param=None,veltype='ind',integration='gskr'):
+
+def _fourier_interp(val,p):
+    """
+    Interpolating equally spaced samples of a periodic function to p equally spaced points with the same first
+    angle by zero-padding the Fourier series of the samples
+
+    Parameters
+    ----------
+    val : array
+        the samples (angle along the last axis)
+    p : int
+        number of points (at least the number of samples)
+
+    Returns
+    ----------
+    valp : array
+        the interpolated values at the p points (angle along the last axis)
+    """
+    n = np.shape(val)[-1]
+    if n == p:
+        return val
+
+    coef = np.fft.rfft(val,axis=-1)
+    if n % 2 == 0:
+        coef[...,-1] *= 0.5 # the Nyquist term is shared by the positive and negative frequencies
+    coefp = np.zeros(np.shape(val)[:-1]+(p//2+1,),dtype=complex)
+    coefp[...,:np.shape(coef)[-1]] = coef
+
+    return np.fft.irfft(coefp,p,axis=-1)*(float(p)/n)
+
+
+def _rotor_samples(func,p,theta0,nsample,tol):
+    """
+    Sampling smooth periodic functions of the angle around the blade flight path and interpolating them to the p
+    equally spaced points theta0 + 2*pi*i/p with their Fourier series
+    The samples of each row are doubled until the interpolation of the samples predicts the values halfway between
+    them within tol; the rows not reaching this with fewer than p samples (e.g. a flight path crossing the shear layer
+    of a wake) are calculated at all p points
+
+    Parameters
+    ----------
+    func : function
+        func(theta,rows) gives the values at an array of angles with the components along the first axis and the
+        angle along the last axis (only the rows flagged in the boolean array rows are needed)
+    p : int
+        number of points around the blade flight path
+    theta0 : float
+        angle of the first point (rad)
+    nsample : int
+        initial number of samples (a divisor of p avoids calculating the points again when tol is not reached)
+    tol : float
+        absolute error tolerance of the interpolated values
+
+    Returns
+    ----------
+    valp : array
+        the functions at the p points (angle along the last axis)
+    """
+    n = nsample
+    val = func(theta0 + (2.*pi/n)*np.arange(n),None)
+    rows = np.ones(np.shape(val)[1:-1],dtype=bool)
+    valp = np.zeros(np.shape(val)[:-1]+(p,))
+
+    while 2*n <= p:
+        valm = func(theta0 + (2.*pi/n)*(np.arange(n) + 0.5),rows)
+        err = np.max(np.fabs(_fourier_interp(val,2*n)[...,1::2] - valm),axis=-1)
+        err = np.max(err,axis=0)
+
+        val2 = np.empty(np.shape(val)[:-1]+(2*n,))
+        val2[...,::2] = val
+        val2[...,1::2] = valm
+        val = val2
+        n = 2*n
+
+        if n == p:
+            done = rows
+        else:
+            done = rows & (err <= tol)
+        valp[:,done] = _fourier_interp(val[:,done],p)
+        rows = rows & ~done
+        if not np.any(rows):
+            return valp
+
+    valp[:,rows] = func(theta0 + (2.*pi/p)*np.arange(p),rows)[:,rows]
+
+    return valp
+
+
+def overlap(p,xt,yt,diat,rott,chord,B,x0,y0,dia,Vinf,pointcalc,param=None,veltype='ind',integration='gskr',m=220,n=200,tol=0.,precision='double',nsample=0,sample_tol=1e-5,coef=None):
     """
     Calculating wake velocities around a turbine based on wake overlap from surrounding turbines
-    (using the 21-point Gauss-Kronrod rule quadrature integration; Simpson's rule integration can be used via VAWT_Wake_Model.f90)
+    (using the 21-point Gauss-Kronrod rule quadrature integration or Simpson's rule integration with cached wake sources)
 
     Parameters
     ----------
@@ -382,11 +1992,25 @@ def overlap(p,xt,yt,diat,rott,chord,B,x0,y0,dia,Vinf,pointcalc,param=None,veltyp
         the type of velocity to calculate ('all': velocity magnitude, 'x': x-induced velocity, 'y': y-induced velocity,
         'ind': vector of both x- and y-induced velocities without free stream, 'vort': vorticity profile neglecting integration)
     integration : string
-        the type of integration method used ('simp': Simpson's Rule, 'gskr': 21 Point Gauss-Kronrod Rule)
+        the type of integration method used ('simp': Simpson's Rule, 'gskr': 21 Point Gauss-Kronrod Rule, or another
+        method of velocity_field such as 'map' for influence map lookups)
     m : int
         the number of downstream divisions requested for Simpson's Rule (must be divisible by 2); neglected otherwise
     n : int
-        the number of downstream divisions requested for Simpson's Rule (must be divisible by 2); neglected otherwise
+        the number of lateral divisions requested for Simpson's Rule (must be divisible by 2); neglected otherwise
+    tol : float
+        error tolerance of the tree code used with Simpson's Rule (0 sums every node of the wakes directly)
+    precision : string
+        'double' or 'single' (float32 wake sources for Simpson's Rule; 'simp' only)
+    nsample : int
+        number of points first calculated around the blade flight path, with the velocity of each wake at the p
+        points interpolated from its Fourier series (0 calculates all p points)
+    sample_tol : float
+        error tolerance of the interpolated velocities normalized by the free stream velocity (the number of
+        calculated points of each wake is doubled until it is met)
+    coef : tuple or string
+        the ten arrays of polynomial surface coefficients or the key of a registered set (see register_coef;
+        'None' will use coef_val())
 
     Returns
     ----------
@@ -395,100 +2019,52 @@ def overlap(p,xt,yt,diat,rott,chord,B,x0,y0,dia,Vinf,pointcalc,param=None,veltyp
     vely : array
         final induced y-velocity at each point around the turbine being calculated (m/s)
     """
-    # initializing local variables and arrays
     t = np.size(xt) # number of turbines
-    xd = np.zeros(p)
-    yd = np.zeros(p)
-    velx = np.zeros(p)
-    vely = np.zeros(p)
-    velx_int = np.zeros(p)
-    vely_int = np.zeros(p)
-
-    # Use parallelization (with joblib)
-    parallel = True
-    # parallel = False
-
-    # finding points around the flight path of the blades
-    for i in range(p):
-        if pointcalc == False:
-            theta = (2.0*pi/p)*i-(2.0*pi/p)/2.0
-            xd[i] = x0 - sin(theta)*(dia/2.0)
-            yd[i] = y0 + cos(theta)*(dia/2.0)
-        elif pointcalc == True:
-            xd[0] = x0
-            yd[0] = y0
-    intex = np.zeros(p)
-    intey = np.zeros(p)
 
-    if (t == 1): # coupled configuration (only two VAWTs)
-        if pointcalc == False:
-            if parallel == True:
-                wake = Parallel(n_jobs=-1)(delayed(velocity_field)(xt[0],yt[0],xd[j],yd[j],Vinf,diat[0],rott[0],chord,B,param,veltype,integration) for j in range(p) )
-                for i in range(p):
-                    velx[i] = wake[i][0]*Vinf
-                    vely[i] = wake[i][1]*Vinf
-            elif parallel == False:
-                for j in range(p):
-                    wake = velocity_field(xt[0],yt[0],xd[j],yd[j],Vinf,diat[0],rott[0],chord,B,param,veltype,integration)
-                    velx[j] = wake[0]*Vinf
-                    vely[j] = wake[1]*Vinf
-        elif pointcalc == True:
-            wake = velocity_field(xt[0],yt[0],xd[0],yd[0],Vinf,diat[0],rott[0],chord,B,param,veltype,integration)
-            velx[0] = wake[0]*Vinf
-            vely[0] = wake[1]*Vinf
+    if integration == 'simp' and param is not None:
+        print "**** Using polynomial surface coefficients from VAWTPolySurfaceCoef.csv for Simpson's rule integration ****"
+    coef,_ = _coef_set(coef)
+
+    def wakes(xd,yd,rows=None):
+        # induced velocities of each turbine wake (flagged in rows) at all of the points (parallelized in the Fortran routines)
+        velx_w = np.zeros((t,np.size(xd)))
+        vely_w = np.zeros((t,np.size(xd)))
+        for w in range(t):
+            if rows is not None and not rows[w]:
+                continue
+            if integration == 'simp':
+                # SIMPSON'S RULE INTEGRATION (wake sources shared by turbines of the same type and rotation rate)
+                source = wake_source(diat[w],rott[w],chord,B,Vinf,m,n,1,coef)
+                velx_w[w],vely_w[w] = source.velocity(xd-xt[w],yd-yt[w],tol,precision)
+            else:
+                wake = velocity_field(xt[w],yt[w],xd,yd,Vinf,diat[w],rott[w],chord,B,param,veltype,integration,precision=precision,coef=coef)
+                velx_w[w] = wake[0]
+                vely_w[w] = wake[1]
+        return np.array([velx_w,vely_w])
+
+    if pointcalc == True:
+        velx_w = np.zeros((t,p))
+        vely_w = np.zeros((t,p))
+        velx_w[:,:1],vely_w[:,:1] = wakes(np.array([x0]),np.array([y0]))
+    elif nsample > 0:
+        # Fourier interpolation of the wake velocities around the blade flight path
+        velx_w,vely_w = _rotor_samples(lambda theta,rows: wakes(x0 - sin(theta)*(dia/2.0),y0 + cos(theta)*(dia/2.0),rows),p,-pi/p,nsample,sample_tol)
+    else:
+        # finding points around the flight path of the blades
+        theta = (2.0*pi/p)*np.arange(p)-(2.0*pi/p)/2.0
+        velx_w,vely_w = wakes(x0 - sin(theta)*(dia/2.0),y0 + cos(theta)*(dia/2.0))
 
+    if (t == 1): # coupled configuration (only two VAWTs)
+        velx = velx_w[0]*Vinf
+        vely = vely_w[0]*Vinf
     else: # multiple turbine wake overlap
-        if pointcalc == False:
-            if parallel == True:
-                wake = Parallel(n_jobs=-1)(delayed(velocity_field)(xt[w],yt[w],xd[q],yd[q],Vinf,diat[w],rott[w],chord,B,param,veltype,integration) for w in range(t) for q in range(p) )
-            for j in range(t):
-                for k in range(p):
-                    if parallel == True:
-                        velx_int[k] = -wake[k+j*p][0]
-                        vely_int[k] = wake[k+j*p][1]
-                    elif parallel == False:
-                        wake = velocity_field(xt[j],yt[j],xd[k],yd[k],Vinf,diat[j],rott[j],chord,B,param,veltype,integration)
-                        velx_int[k] = -wake[0]
-                        vely_int[k] = wake[1]
-
-                    # sum of squares of velocity deficits
-                    if (velx_int[k] >= 0.0):
-                        intex[k] = intex[k] + (velx_int[k])**2
-                    else:
-                        intex[k] = intex[k] - (velx_int[k])**2
-
-                    if (vely_int[k] >= 0.0):
-                        intey[k] = intey[k] + (vely_int[k])**2
-                    else:
-                        intey[k] = intey[k] - (vely_int[k])**2
-        elif pointcalc == True:
-            for j in range(t):
-                wake = velocity_field(xt[j],yt[j],xd[0],yd[0],Vinf,diat[j],rott[j],chord,B,param,veltype,integration)
-                velx_int[0] = -wake[0]
-                vely_int[0] = wake[1]
-
-                # sum of squares of velocity deficits
-                if (velx_int[0] >= 0.0):
-                    intex[0] = intex[0] + (velx_int[0])**2
-                else:
-                    intex[0] = intex[0] - (velx_int[0])**2
-
-                if (vely_int[0] >= 0.0):
-                    intey[0] = intey[0] + (vely_int[0])**2
-                else:
-                    intey[0] = intey[0] - (vely_int[0])**2
+        # sum of squares of velocity deficits
+        intex = np.sum(-velx_w*fabs(velx_w),axis=0)
+        intey = np.sum(vely_w*fabs(vely_w),axis=0)
 
         # square root of sum of squares
-        for l in range(p):
-            if (intex[l] >= 0.0):
-                velx[l] = -Vinf*(sqrt(intex[l]))
-            else:
-                velx[l] = Vinf*(sqrt(fabs(intex[l])))
-
-            if (intey[l] >= 0.0):
-                vely[l] = Vinf*(sqrt(intey[l]))
-            else:
-                vely[l] = -Vinf*(sqrt(fabs(intey[l])))
+        velx = np.where(intex >= 0.0,-Vinf*sqrt(fabs(intex)),Vinf*sqrt(fabs(intex)))
+        vely = np.where(intey >= 0.0,Vinf*sqrt(fabs(intey)),-Vinf*sqrt(fabs(intey)))
 
     return velx,vely
 
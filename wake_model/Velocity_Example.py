@@ -1,6 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from VAWT_Wake_Model import velocity_field
+from VAWT_Wake_Model import velocity_field,velocity_grid
 import time,sys
 from matplotlib import rcParams
 rcParams['font.family'] = 'Times New Roman'
@@ -58,6 +58,9 @@ integration = 'simp'    # use Simpson's Rule integration (Fortran code)
 m = 220                 # number of divisions in the downstream direction (for Simpson's Rule)
 n = 200                 # number of divisions in the lateral direction (for Simpson's Rule)
 # integration = 'gskr'  # use 21 Point Gauss-Kronrod Rule Quadrature integration
+# integration = 'semi'  # use semi-analytic integration (analytic in the lateral direction)
+# integration = 'adapt' # use adaptive Simpson's Rule integration (divisions chosen automatically)
+tol = 1e-3              # relative tolerance of the velocity (for adaptive Simpson's Rule)
 
 ########################################################################################################################
 ########################################################################################################################
@@ -65,7 +68,7 @@ n = 200                 # number of divisions in the lateral direction (for Simp
 ########################################################################################################################
 
 # CALCULATING VELOCITY AT GIVEN POINT (x0,y0)
-vel = velocity_field(xt,yt,x0,y0,Vinf,dia,rot,chord,B,param=None,veltype=veltype,integration=integration,m=m,n=n)
+vel = velocity_field(xt,yt,x0,y0,Vinf,dia,rot,chord,B,param=None,veltype=veltype,integration=integration,m=m,n=n,tol=tol)
 print '\nNormalized velocity at (',x0,',',y0,') =',vel,'\n' # output velocity (normalized by free stream wind speed)
 pointval1 = 1.
 pointval2 = 0.
@@ -92,16 +95,13 @@ if vel_slice == True:
     iterp = 0
     time0 = time.time()
     for i in range(int(np.size(x))):
-        vel = np.array([])
         val = str(x[i]/dia)
         lab = '$x/D$ = '+val
-        for j in range(int(np.size(y))):
-            velp = velocity_field(xt,yt,x[i],y[j],Vinf,dia,rot,chord,B,param=None,veltype=veltype,integration=integration,m=m,n=n)
-            vel = np.append(vel,velp)
-            iterp += 1
-            runtime = time.time()-time0
-            progress_bar(float(iterp)/(pointval2),pointval2,runtime)
-            time0 = time.time()
+        vel = velocity_field(xt,yt,x[i],y,Vinf,dia,rot,chord,B,param=None,veltype=veltype,integration=integration,m=m,n=n) # entire profile in one call
+        iterp += np.size(y)
+        runtime = (time.time()-time0)/np.size(y)
+        progress_bar(float(iterp)/(pointval2),pointval2,runtime)
+        time0 = time.time()
         plt.figure(1)
         plt.plot(vel,y,color[i],label=lab)
 
@@ -136,24 +136,27 @@ if plot_dist == True:
 
     iter = 0
     time0 = time.time()
-    for i in range(N):
-        for j in range(N):
-            if veltype == 'all' or veltype == 'x' or veltype == 'y' or veltype == 'Vinfort':
-                VEL[i,j] = velocity_field(xt,yt,X[i,j],Y[i,j],Vinf,dia,rot,chord,B,param=None,veltype=veltype,integration=integration,m=m,n=n)
-            elif veltype == 'ind':
-                Vinfd = velocity_field(xt,yt,X[i,j],Y[i,j],Vinf,dia,rot,chord,B,param=None,veltype=veltype,integration=integration,m=m,n=n)
-                VEL[i,j] = Vinfd[0]
-                VELy[i,j] = Vinfd[1]
-            elif veltype == 'vort':
-                VEL[i,j] = velocity_field(xt,yt,X[i,j],Y[i,j],Vinf,dia,rot,chord,B,param=None,veltype=veltype,integration=integration,m=m,n=n)
-            elif veltype == 'error':
+    if integration == 'simp' and (veltype == 'all' or veltype == 'x' or veltype == 'y' or veltype == 'ind'):
+        VEL = velocity_grid(xt,yt,xp,yp,Vinf,dia,rot,chord,B,veltype=veltype,m=m,n=n,precision='single') # entire domain by FFT convolution
+        if veltype == 'ind':
+            VEL,VELy = VEL
+        progress_bar(1.,N*N,0.)
+    elif veltype == 'all' or veltype == 'x' or veltype == 'y' or veltype == 'vort':
+        VEL = velocity_field(xt,yt,X,Y,Vinf,dia,rot,chord,B,param=None,veltype=veltype,integration=integration,m=m,n=n) # entire domain in one call
+        progress_bar(1.,N*N,0.)
+    elif veltype == 'ind':
+        VEL,VELy = velocity_field(xt,yt,X,Y,Vinf,dia,rot,chord,B,param=None,veltype=veltype,integration=integration,m=m,n=n)
+        progress_bar(1.,N*N,0.)
+    elif veltype == 'error':
+        for i in range(N):
+            for j in range(N):
                 vel1 = velocity_field(xt,yt,X[i,j],Y[i,j],Vinf,dia,rot,chord,B,param=None,veltype='x',integration='gskr')
                 vel2 = velocity_field(xt,yt,X[i,j],Y[i,j],Vinf,dia,rot,chord,B,param=None,veltype='x',integration='simp',m=m,n=n)
                 VEL[i,j] = np.fabs((vel2-vel1)/vel1)
-            iter += 1
-            runtime = time.time()-time0
-            progress_bar(float(iter)/(N*N),N*N,runtime)
-            time0 = time.time()
+                iter += 1
+                runtime = time.time()-time0
+                progress_bar(float(iter)/(N*N),N*N,runtime)
+                time0 = time.time()
 
     if veltype == 'all' or veltype == 'x' or veltype == 'y':
         fig = plt.figure(2,figsize=(19,5))
@@ -0,0 +1,1067 @@
+"""
+Parameterized VAWT Wake Model NumPy Routines
+Vectorized NumPy versions of the routines of the Fortran module _vawtwake (VAWT_Wake_Model.f90) with the same
+arguments and results, used by vawt_backend when _vawtwake has not been built
+
+The wake source, Simpson's and the trapezoidal rules, the adaptive Gauss-Kronrod quadrature, the wake overlap, the
+far-field moments and the actuator cylinder routines are available; the vorticity of whole grids and the induced
+velocities of batches of points are calculated as array expressions (the points in blocks of about _block nodes by
+points)
+
+The tree code, the adaptive, semi-analytic, graded, Gauss-Legendre and folded integrations are only available in the
+Fortran module, and tol of the overlap routines is neglected (the wakes are always summed directly)
+"""
+
+import numpy as np
+from scipy.special import erf,erfcx
+
+_pi2 = 6.28318530718 # 2*pi as used in the Fortran routines
+_block = 2**20 # nodes times points calculated together by vel_source
+_kern = [0] # EMG kernel selected with emg_kernel
+
+
+def set_threads(nthreads):
+    """
+    Setting the number of threads (the NumPy routines are not threaded; kept for the interface of _vawtwake)
+    set_threads(nthreads)
+    """
+    pass
+
+
+def get_threads():
+    """
+    Returning the number of threads of the parallel loops (always 1)
+    nthreads = get_threads()
+    """
+    return 1
+
+
+def emg_kernel(kern):
+    """
+    Selecting the EMG kernel used for the vorticity of the integration nodes (0: exp and erf, 1: scaled erfc form)
+    emg_kernel(kern)
+    """
+    _kern[0] = int(kern)
+
+
+def pInt(theta,f):
+    """
+    Integration for a periodic function where end points don't reach ends (uses trapezoidal method)
+    integral = pInt(theta,f)
+    """
+    dtheta = 2.0*theta[0] # assumes equally spaced, starts at 0
+
+    return np.trapz(f,theta) + dtheta*0.5*(f[0] + f[-1])
+
+
+def interpolate(x,y,xval):
+    """
+    Linear interpolation (specifically for extracting airfoil data) at an array of values
+    yval = interpolate(x,y,xval)
+    """
+    return np.interp(xval,x,y)
+
+
+def splineint(x,y,xval):
+    """
+    Cubic spline interpolation through the three nearest data points (specifically for extracting airfoil data) at
+    an array of values
+    yval = splineint(x,y,xval)
+    """
+    x = np.asarray(x,dtype=float)
+    y = np.asarray(y,dtype=float)
+    xval = np.asarray(xval,dtype=float)
+    n = np.size(x)
+
+    # i is the first data point above the value (0-based), choosing the three points of cubspline
+    i = np.clip(np.searchsorted(x,xval,side='right'),1,n-1)
+    i1 = np.where(xval <= (x[i] + x[i-1])/2.0,i-2,i-1)
+    i1 = np.where(i == 1,0,np.where(i == n-1,n-3,i1))
+    yval = cubspline(x[i1],x[i1+1],x[i1+2],y[i1],y[i1+1],y[i1+2],xval)
+
+    # no interpolation needed for values in the data set
+    k = np.clip(np.searchsorted(x,xval,side='left'),0,n-1)
+    return np.where(x[k] == xval,y[k],yval)
+
+
+def cubspline(x1,x2,x3,y1,y2,y3,xval):
+    """
+    Cubic spline interpolation (specifically for extracting airfoil data)
+    yval = cubspline(x1,x2,x3,y1,y2,y3,xval)
+    """
+    # solving tridiagonal linear equation system
+    a11 = 2.0/(x2-x1)
+    a12 = 1.0/(x2-x1)
+    a21 = 1.0/(x2-x1)
+    a22 = 2.0*((1.0/(x2-x1))+(1.0/(x3-x2)))
+    a23 = 1.0/(x3-x2)
+    a32 = 1.0/(x3-x2)
+    a33 = 2.0/(x3-x2)
+    b1 = 3.0*(y2-y1)/(x2-x1)**2
+    b2 = 3.0*(((y2-y1)/(x2-x1)**2)+((y3-y2)/(x3-x2)**2))
+    b3 = 3.0*(y3-y2)/(x3-x2)**2
+
+    # solving using inverse matrix method
+    bot = a11*a22*a33 - a12*a21*a33 - a11*a23*a32
+    xtop = b1*a22*a33 + a12*a23*b3 - a12*b2*a33 - b1*a23*a32
+    ytop = a11*b2*a33 - b1*a21*a33 - a11*a23*b3
+    ztop = a11*a22*b3 + b1*a21*a32 - a12*a21*b3 - a11*b2*a32
+    k1 = xtop/bot
+    k2 = ytop/bot
+    k3 = ztop/bot
+
+    # first or second interval of the three points
+    low = xval < x2
+    xa = np.where(low,x1,x2)
+    xb = np.where(low,x2,x3)
+    ya = np.where(low,y1,y2)
+    yb = np.where(low,y2,y3)
+    a = np.where(low,k1,k2)*(xb-xa) - (yb-ya)
+    b = -np.where(low,k2,k3)*(xb-xa) + (yb-ya)
+    t = (xval-xa)/(xb-xa)
+
+    return (1.0 - t)*ya + t*yb + t*(1.0 - t)*(a*(1.0 - t) + b*t)
+
+
+def parameterval(tsr,sol,coef):
+    """
+    Calculating EMG parameter values based on given polynomial surface
+    val = parameterval(tsr,sol,coef)
+    """
+    a,b,c,d,e,f,g,h,i,j = coef
+
+    return a + b*tsr + c*sol + d*tsr**2 + e*tsr*sol + f*sol**2 + g*tsr**3 + h*tsr**2*sol + i*tsr*sol**2 + j*sol**3
+
+
+def emgclamp(loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3):
+    """
+    Limiting the EMG parameter components to create expected behavior of the vorticity distribution
+    loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d = emgclamp(loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3)
+    """
+    return (np.minimum(loc1,-0.001), # ensure concave down
+            np.maximum(loc2,0.01), # ensure slight increase moving downstream
+            np.maximum(loc3,0.48), # ensure wake originating from edge of turbine
+            np.minimum(spr1,-0.001), # ensure decrease in value (more spread downstream)
+            np.minimum(spr2,0.0), # ensure value does not begin positive
+            skw1, # no limitations necessary
+            np.minimum(skw2,0.0), # ensure value does not begin positive
+            np.maximum(scl1,0.0), # ensure positive maximum vorticity strength
+            np.maximum(scl2,0.05), # ensure decay moving downstream
+            np.maximum(scl3,0.0)) # ensure decay occurs downstream
+
+
+def emgcolumn(x,dia,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d):
+    """
+    Calculating the EMG parameters at downstream positions from the limited parameter components
+    loc,spr,skw,scl = emgcolumn(x,dia,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d)
+    """
+    xd = x/dia # normalizing x by the diameter
+
+    loc = loc1d*xd*xd + loc2d*xd + loc3d # EMG Location
+    spr = spr1d*xd + spr2d # EMG Spread
+    skw = skw1d*xd + skw2d # EMG Skew
+    scl = scl1d/(1.0 + np.exp(scl2d*(xd - scl3d))) # EMG Scale
+
+    # Limiting the parameters to the maximum values the EMG distribution can handle
+    return np.maximum(loc,0.2),np.clip(spr,-0.5,-0.001),np.minimum(skw,0.0),scl
+
+
+def vorticity_column(yd,loc,spr,skw,scl):
+    """
+    Calculating the vorticity strength at normalized lateral positions (the EMG parameters are broadcast with yd,
+    e.g. yd[:,None] with parameters of each downstream column for a grid)
+    gam = vorticity_column(yd,loc,spr,skw,scl)
+    """
+    c0 = scl*skw/2.0
+    c1 = skw/2.0
+    s = skw*spr*spr
+    q = np.sqrt(2.0)*spr
+
+    # EMG(y;loc,spr,skw,scl) - EMG(y;-loc,-spr,-skw,-scl)
+    if _kern[0] == 1:
+        # overflow-safe form with the scaled complementary error function (exp(-u^2/2)*erfcx(z) for z >= 0 and
+        # exp(A)*(1 - erf(z)) for z < 0), with y mirrored for the second distribution
+        def term(y):
+            z = (loc + s - y)/q
+            with np.errstate(over='ignore',invalid='ignore'):
+                return np.where(z >= 0.0,np.exp(-0.5*((loc - y)/spr)**2)*erfcx(np.maximum(z,0.0)),
+                                np.exp(c1*(2.0*loc + s - 2.0*y))*(1.0 - erf(np.minimum(z,0.0))))
+        return c0*(term(yd) - term(-yd))
+    else:
+        return c0*(np.exp(c1*(2.0*loc + s - 2.0*yd))*(1.0 - erf((loc + s - yd)/q))
+                   - np.exp(c1*(2.0*loc + s + 2.0*yd))*(1.0 - erf((loc + s + yd)/q)))
+
+
+def vorticitystrength(x,y,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3):
+    """
+    Calculating vorticity strength at positions relative to the turbine (arrays of x and y are broadcast together)
+    gam_lat = vorticitystrength(x,y,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3)
+    """
+    emg = emgclamp(loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3)
+    loc,spr,skw,scl = emgcolumn(np.asarray(x,dtype=float),dia,*emg)
+
+    gam_lat = vorticity_column(np.asarray(y,dtype=float)/dia,loc,spr,skw,scl)
+    return gam_lat if np.ndim(gam_lat) > 0 else float(gam_lat)
+
+
+def emgturbine(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d):
+    """
+    Calculating the limited EMG parameter components of a turbine and the bounds of integration of its wake
+    emg,a,b,c,d = emgturbine(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d)
+    """
+    tsr = (dia/2.0)*abs(rot)/Vinf
+    sol = blades*chord/(dia/2.0)
+
+    par = [parameterval(tsr,sol,coef) for coef in (loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d)]
+
+    # Limiting the parameter components to create expected behavior
+    emg = np.array(emgclamp(*par),dtype=float)
+
+    # Bounds of integration (from the turbine to the inflection point of the vorticity, one diameter laterally)
+    return emg,0.0,(par[9] + 5.0)*dia,-1.0*dia,1.0*dia
+
+
+def quadweights(n_in,inte):
+    """
+    Calculating the quadrature weights of the integration divisions (1: Simpson's Rule, 2: Trapezoidal Rule)
+    w = quadweights(n_in,inte)
+    """
+    w = np.zeros(n_in+1)
+    if inte == 1:
+        w[1:n_in:2] = 4.0
+        w[2:n_in:2] = 2.0
+        w[0] = 1.0
+        w[n_in] = 1.0
+    elif inte == 2:
+        w[1:n_in] = 2.0
+        w[0] = 1.0
+        w[n_in] = 1.0
+
+    return w
+
+
+def quadgrid(m_in,n_in,inte,a,b,c,d):
+    """
+    Creating the integration nodes and weights of Simpson's or the trapezoidal rule over the wake domain
+    (the downstream weights include the h*k factor of the rule)
+    xg,yg,wx,wy = quadgrid(m_in,n_in,inte,a,b,c,d)
+    """
+    h = (b - a)/m_in
+    k = (d - c)/n_in
+
+    xg = a + np.arange(m_in+1)*h
+    xg[m_in] = b
+    yg = c + np.arange(n_in+1)*k
+    yg[n_in] = d
+
+    wx = quadweights(m_in,inte)
+    wy = quadweights(n_in,inte)
+    if inte == 1:
+        wx = wx*(h*k/9.0)
+    else:
+        wx = wx*(h*k/4.0)
+
+    return xg,yg,wx,wy
+
+
+def vorticity_grid(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte):
+    """
+    Calculating the weighted vorticity at the integration nodes of a turbine wake (the wake source)
+    (gw = wx*wy*gam; wy includes the normalization fac of the velocity)
+    xg,yg,gw,wx,wy,emg,fac = vorticity_grid(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte)
+    """
+    # Limited EMG parameter components of the turbine and bounds of integration
+    emg,a,b,c,d = emgturbine(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d)
+
+    # Creating the integration nodes and weights
+    xg,yg,wx,wy = quadgrid(m_in,n_in,inte,a,b,c,d)
+    fac = (abs(rot)/_pi2)/Vinf
+    wy = wy*fac
+
+    # Weighted vorticity strength at each node (lateral by downstream)
+    loc,spr,skw,scl = emgcolumn(xg,dia,*emg)
+    gw = wx*wy[:,np.newaxis]*vorticity_column((yg/dia)[:,np.newaxis],loc,spr,skw,scl)
+
+    return xg,yg,np.asfortranarray(gw),wx,wy,emg,fac
+
+
+def vel_source(xg,yg,gw,wx,wy,dia,emg,fac,x0,y0):
+    """
+    Calculating induced velocity at points (relative to the turbine) from the weighted vorticity of a wake source
+    Nodes closer to the point than the rounding of the coordinates are taken to be at the point and do not contribute
+    (the linear expansion of the vorticity about a point inside the wake is subtracted and integrated analytically)
+    velx,vely = vel_source(xg,yg,gw,wx,wy,dia,emg,fac,x0,y0)
+    """
+    xg = np.asarray(xg)
+    yg = np.asarray(yg)
+    gw = np.asarray(gw)
+    wl = np.asarray(wx)*np.asarray(wy)[:,np.newaxis]
+    x0 = np.atleast_1d(np.asarray(x0,dtype=xg.dtype))
+    y0 = np.atleast_1d(np.asarray(y0,dtype=xg.dtype))
+    npt = np.size(x0)
+
+    ext = max(abs(xg[0]),abs(xg[-1]),abs(yg[0]),abs(yg[-1]))
+    r2min = (8.0*np.finfo(xg.dtype).eps*np.maximum(ext,np.maximum(abs(x0),abs(y0))))**2
+
+    # Linear expansion of the vorticity about the points and its analytic integral with the kernel over the wake
+    gam0,gx,gy,velx,vely = vort_linear(dia,emg,float(xg[0]),float(xg[-1]),float(yg[0]),float(yg[-1]),x0.astype(float),y0.astype(float))
+    velx = fac*velx
+    vely = fac*vely
+    inside = (x0 >= xg[0]) & (x0 <= xg[-1]) & (y0 >= yg[0]) & (y0 <= yg[-1])
+    gam0,gx,gy = [np.asarray(g,dtype=xg.dtype) for g in (gam0,gx,gy)]
+
+    # points in blocks, with the squared distance to every node as one array expression
+    nb = max(1,_block//np.size(gw))
+    for l in range(0,npt,nb):
+        dx = x0[l:l+nb,np.newaxis] - xg
+        dy = yg - y0[l:l+nb,np.newaxis]
+        r2 = dx[:,np.newaxis,:]**2 + (dy**2)[:,:,np.newaxis]
+
+        # a node at the point itself does not contribute (only searched near the nodes)
+        near = np.min(dx**2,axis=1) + np.min(dy**2,axis=1) <= r2min[l:l+nb]
+        if np.any(near):
+            r2[near] = np.where(r2[near] > r2min[l:l+nb][near][:,np.newaxis,np.newaxis],r2[near],np.inf)
+
+        # smooth remainder of the vorticity at the points inside the wake
+        if np.any(inside[l:l+nb]):
+            lin = (gam0[l:l+nb,np.newaxis] - gx[l:l+nb,np.newaxis]*dx)[:,np.newaxis,:] + (gy[l:l+nb,np.newaxis]*dy)[:,:,np.newaxis]
+            gr = (gw - wl*lin)/r2
+        else:
+            gr = gw/r2
+        velx[l:l+nb] += np.sum(np.sum(gr,axis=2)*dy,axis=1)
+        vely[l:l+nb] += np.sum(np.sum(gr,axis=1)*dx,axis=1)
+
+    return velx.astype(xg.dtype),vely.astype(xg.dtype)
+
+
+def vel_source_jac(xg,yg,gw,wx,wy,dia,emg,fac,x0,y0):
+    """
+    Calculating induced velocity and its derivatives with respect to the point position at points (relative to the
+    turbine) from the weighted vorticity of a wake source (with the subtracted linear expansion of vel_source and its
+    derivatives inside the wake)
+    velx,vely,dvxdx,dvydx,dvxdy,dvydy = vel_source_jac(xg,yg,gw,wx,wy,dia,emg,fac,x0,y0)
+    """
+    xg = np.asarray(xg)
+    yg = np.asarray(yg)
+    gw = np.asarray(gw)
+    wl = np.asarray(wx)*np.asarray(wy)[:,np.newaxis]
+    x0 = np.atleast_1d(np.asarray(x0,dtype=xg.dtype))
+    y0 = np.atleast_1d(np.asarray(y0,dtype=xg.dtype))
+    npt = np.size(x0)
+    dvxdx = np.zeros(npt,dtype=xg.dtype)
+    dvydx = np.zeros(npt,dtype=xg.dtype)
+    suv = np.zeros(npt,dtype=xg.dtype)
+    svv = np.zeros(npt,dtype=xg.dtype)
+    sw = np.zeros(npt,dtype=xg.dtype)
+    a,b,c,d = xg[0],xg[-1],yg[0],yg[-1]
+
+    ext = max(abs(a),abs(b),abs(c),abs(d))
+    r2min = (8.0*np.finfo(xg.dtype).eps*np.maximum(ext,np.maximum(abs(x0),abs(y0))))**2
+
+    # Linear expansion of the vorticity about the points and its analytic integral with the kernel over the wake
+    gam0,gx,gy,velx,vely = vort_linear(dia,emg,a,b,c,d,x0,y0)
+    velx = fac*velx
+    vely = fac*vely
+
+    # points in blocks, with the derivative of the kernel accumulated with the velocity
+    nb = max(1,_block//np.size(gw))
+    for l in range(0,npt,nb):
+        dx = x0[l:l+nb,np.newaxis] - xg
+        dy = yg - y0[l:l+nb,np.newaxis]
+        r2 = dx[:,np.newaxis,:]**2 + (dy**2)[:,:,np.newaxis]
+
+        # a node at the point itself does not contribute (only searched near the nodes)
+        near = np.min(dx**2,axis=1) + np.min(dy**2,axis=1) <= r2min[l:l+nb]
+        if np.any(near):
+            r2[near] = np.where(r2[near] > r2min[l:l+nb][near][:,np.newaxis,np.newaxis],r2[near],np.inf)
+        wr = np.where(np.isinf(r2),0.0,wl)/r2
+
+        lin = (gam0[l:l+nb,np.newaxis] - gx[l:l+nb,np.newaxis]*dx)[:,np.newaxis,:] + (gy[l:l+nb,np.newaxis]*dy)[:,:,np.newaxis]
+        gr = gw/r2 - wr*lin
+        velx[l:l+nb] += np.sum(np.sum(gr,axis=2)*dy,axis=1)
+        vely[l:l+nb] += np.sum(np.sum(gr,axis=1)*dx,axis=1)
+        gr /= r2
+        gdx = np.sum(gr,axis=1)*dx
+        dvxdx[l:l+nb] = -2.0*np.sum(np.sum(gr*dx[:,np.newaxis,:],axis=2)*dy,axis=1)
+        dvydx[l:l+nb] = np.sum(np.sum(gr,axis=2)*dy**2,axis=1) - np.sum(gdx*dx,axis=1)
+
+        # moments of the node weights (quadrature of the kernel moments of the linear expansion)
+        suv[l:l+nb] = -np.sum(np.sum(wr*dx[:,np.newaxis,:],axis=2)*dy,axis=1)
+        svv[l:l+nb] = np.sum(np.sum(wr,axis=2)*dy**2,axis=1)
+        sw[l:l+nb] = np.sum(np.where(np.isinf(r2),0.0,wl),axis=(1,2))
+
+    # the sum with fixed weights is analytic in x0 + i*y0 (dvelx/dy0 = dvely/dx0 and dvely/dy0 = -dvelx/dx0)
+    dvxdy = dvydx.copy()
+    dvydy = -dvxdx
+
+    # derivatives of the linear expansion (quadrature errors of the kernel moments times the Hessian) and of its
+    # analytic integral (moving the wake relative to the point) inside the wake
+    inside = (x0 >= a) & (x0 <= b) & (y0 >= c) & (y0 <= d)
+    hxx,hxy,hyy = vort_hessian(dia,emg,x0,y0)
+    kx,ky,kuv,kvv = kernel_int(a,b,c,d,x0,y0)
+    kuu = (b - a)*(d - c) - kvv
+    eu = (fac*kuv - suv,-fac*kuu + (sw - svv))
+    ev = (fac*kvv - svv,-fac*kuv + suv)
+    bx,by = kernel_edge(a,b,c,d,x0,y0,gam0,gx,gy)
+
+    dvxdx += np.where(inside,fac*(gx*kx - bx[0]) + hxx*eu[0] + hxy*ev[0],0.0)
+    dvydx += np.where(inside,fac*(gx*ky - bx[1]) + hxx*eu[1] + hxy*ev[1],0.0)
+    dvxdy += np.where(inside,fac*(gy*kx - by[0]) + hxy*eu[0] + hyy*ev[0],0.0)
+    dvydy += np.where(inside,fac*(gy*ky - by[1]) + hxy*eu[1] + hyy*ev[1],0.0)
+
+    return velx,vely,dvxdx,dvydx,dvxdy,dvydy
+
+
+def vel_source_sp(xg,yg,gw,wx,wy,dia,emg,fac,x0,y0):
+    """
+    Calculating induced velocity at points (relative to the turbine) from the weighted vorticity of a wake source in
+    single precision
+    velx,vely = vel_source_sp(xg,yg,gw,wx,wy,dia,emg,fac,x0,y0)
+    """
+    return vel_source(*([np.asarray(g,dtype=np.float32) for g in (xg,yg,gw,wx,wy)] + [dia,emg,fac,x0,y0]))
+
+
+def kernel_int(a,b,c,d,x0,y0):
+    """
+    Calculating the integrals of the velocity kernels (y-y0)/r^2 and (x0-x)/r^2 and of the moments (x-x0)(y-y0)/r^2
+    and (y-y0)^2/r^2 over the rectangle [a,b]x[c,d] (for arrays of points)
+    kx,ky,kuv,kvv = kernel_int(a,b,c,d,x0,y0)
+    """
+    kx = 0.0
+    ky = 0.0
+    kuv = 0.0
+    kvv = 0.0
+
+    # Antiderivatives in u and v evaluated at the corners of the rectangle
+    with np.errstate(divide='ignore',invalid='ignore'):
+        for i,u in enumerate([a - x0,b - x0]):
+            for j,v in enumerate([c - y0,d - y0]):
+                sgn = (-1.0)**(i+j)
+                r2 = u*u + v*v
+                lg = np.where(r2 > 0.0,np.log(r2),0.0)
+                atu = np.where(v != 0.0,np.arctan(u/v),0.0)
+                atv = np.where(u != 0.0,np.arctan(v/u),0.0)
+                kx = kx + sgn*(0.5*u*lg + v*atu)
+                ky = ky + sgn*(-0.5*v*lg - u*atv)
+                kuv = kuv + sgn*0.25*r2*lg
+                kvv = kvv + sgn*(0.5*u*v + 0.5*v*v*atu - 0.5*u*u*atv)
+
+    return kx,ky,kuv,kvv
+
+
+def kernel_edge(a,b,c,d,x0,y0,gam0,gx,gy):
+    """
+    Calculating the integrals of the linear expansion of the vorticity times the velocity kernels along the edges of
+    the rectangle [a,b]x[c,d] (bx: the downstream edges x = b minus x = a, by: the lateral edges y = d minus y = c)
+    bx,by = kernel_edge(a,b,c,d,x0,y0,gam0,gx,gy)
+    """
+    bx = [0.0,0.0]
+    by = [0.0,0.0]
+
+    # Antiderivatives along each edge evaluated at the corners of the rectangle
+    with np.errstate(divide='ignore',invalid='ignore'):
+        for i,u in enumerate([a - x0,b - x0]):
+            for j,v in enumerate([c - y0,d - y0]):
+                sgn = (-1.0)**(i+j)
+                r2 = u*u + v*v
+                lg = np.where(r2 > 0.0,np.log(r2),0.0)
+                atu = np.where(v != 0.0,np.arctan(u/v),0.0)
+                atv = np.where(u != 0.0,np.arctan(v/u),0.0)
+                bx[0] = bx[0] + sgn*(0.5*(gam0 + gx*u)*lg + gy*(v - u*atv))
+                bx[1] = bx[1] - sgn*((gam0 + gx*u)*atv + 0.5*gy*u*lg)
+                by[0] = by[0] + sgn*((gam0 + gy*v)*atu + 0.5*gx*v*lg)
+                by[1] = by[1] - sgn*(0.5*(gam0 + gy*v)*lg + gx*(u - v*atu))
+
+    return bx,by
+
+
+def vort_hessian(dia,emg,x0,y0):
+    """
+    Calculating the second derivatives of the vorticity at points with central differences
+    hxx,hxy,hyy = vort_hessian(dia,emg,x0,y0)
+    """
+    h = 1.0e-4*dia
+    def gam(x,y):
+        return vorticity_column(y/dia,*emgcolumn(x,dia,*emg))
+
+    hxx = (gam(x0 + h,y0) - 2.0*gam(x0,y0) + gam(x0 - h,y0))/(h*h)
+    hyy = (gam(x0,y0 + h) - 2.0*gam(x0,y0) + gam(x0,y0 - h))/(h*h)
+    hxy = (gam(x0 + h,y0 + h) - gam(x0 + h,y0 - h) - gam(x0 - h,y0 + h) + gam(x0 - h,y0 - h))/(4.0*h*h)
+
+    return hxx,hxy,hyy
+
+
+def vort_linear(dia,emg,a,b,c,d,x0,y0):
+    """
+    Calculating the linear expansion of the vorticity (gam0 + gx*(x - x0) + gy*(y - y0)) about points inside the
+    integration domain [a,b]x[c,d] and its analytic integral with the velocity kernels (zero outside of the domain)
+    gam0,gx,gy,velx,vely = vort_linear(dia,emg,a,b,c,d,x0,y0)
+    """
+    inside = (x0 >= a) & (x0 <= b) & (y0 >= c) & (y0 <= d)
+    xc = np.clip(x0,a,b)
+    yc = np.clip(y0,c,d)
+
+    h = 1.0e-6*dia
+    def gam(x,y):
+        return vorticity_column(y/dia,*emgcolumn(x,dia,*emg))
+    gam0 = np.where(inside,gam(xc,yc),0.0)
+    gx = np.where(inside,(gam(xc + h,yc) - gam(xc - h,yc))/(2.0*h),0.0)
+    gy = np.where(inside,(gam(xc,yc + h) - gam(xc,yc - h))/(2.0*h),0.0)
+
+    kx,ky,kuv,kvv = kernel_int(a,b,c,d,x0,y0)
+    kuu = (b - a)*(d - c) - kvv
+
+    return gam0,gx,gy,np.where(inside,gam0*kx + gx*kuv + gy*kvv,0.0),np.where(inside,gam0*ky - gx*kuu - gy*kuv,0.0)
+
+
+def gk21rule():
+    """
+    Calculating the nodes and weights of the 21-point Gauss-Kronrod rule on [-1,1] (embedded 10-point Gauss weights
+    are zero at the Kronrod nodes)
+    t,wk,wg = gk21rule()
+    """
+    xgk = np.array([0.995657163025808080735527280689003,0.973906528517171720077964012084452,
+                    0.930157491355708226001207180059508,0.865063366688984510732096688423493,
+                    0.780817726586416897063717578345042,0.679409568299024406234327365114874,
+                    0.562757134668604683339000099272694,0.433395394129247190799265943165784,
+                    0.294392862701460198131126603103866,0.148874338981631210884826001129720,0.0])
+    wgk = np.array([0.011694638867371874278064396062192,0.032558162307964727478818972459390,
+                    0.054755896574351996031381300244580,0.075039674810919952767043140916190,
+                    0.093125454583697605535065465083366,0.109387158802297641899210590325805,
+                    0.123491976262065851077208980223048,0.134709217311473325928054001771707,
+                    0.142775938577060080797094273138717,0.147739104901338491374841515972068,
+                    0.149445554002916905664936468389821])
+    wgs = np.array([0.066671344308688137593568809893332,0.149451349150580593145776339657697,
+                    0.219086362515982043995534934228163,0.269266719309996355091226921569469,
+                    0.295524224714752870173892994651146])
+
+    t = np.concatenate((-xgk,xgk[9::-1]))
+    wk = np.concatenate((wgk,wgk[9::-1]))
+    wg = np.zeros(21)
+    wg[1:10:2] = wgs
+    wg[19:10:-2] = wgs
+
+    return t,wk,wg
+
+
+def gk21est(hl,wk,wg,f):
+    """
+    Calculating the 21-point Gauss-Kronrod estimate and its error (as in QUADPACK qk21) of both velocity components
+    (f holds the integrand of each component at the 21 nodes in its columns)
+    res,err = gk21est(hl,wk,wg,f)
+    """
+    epmach = np.finfo(float).eps
+    uflow = np.finfo(float).tiny
+
+    resk = np.dot(wk,f)
+    resg = np.dot(wg,f)
+    resabs = np.dot(wk,np.abs(f))*abs(hl)
+    resasc = np.dot(wk,np.abs(f - 0.5*resk))*abs(hl)
+    e = np.abs((resk - resg)*hl)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        e = np.where((resasc != 0.0) & (e != 0.0),resasc*np.minimum(1.0,(200.0*e/resasc)**1.5),e)
+    e = np.where(resabs > uflow/(50.0*epmach),np.maximum((epmach*50.0)*resabs,e),e)
+
+    return resk*hl,np.sum(e)
+
+
+def gskr_seg(yl,yu,dx,y0,dia,loc,spr,skw,scl,t,wk,wg):
+    """
+    Calculating the 21-point Gauss-Kronrod estimate of both velocity kernels over the lateral interval [yl,yu]
+    (folded about the wake centerline: each node also accounts for its image at -y with the opposite vorticity)
+    res,err = gskr_seg(yl,yu,dx,y0,dia,loc,spr,skw,scl,t,wk,wg)
+    """
+    hl = 0.5*(yu - yl)
+    yk = 0.5*(yu + yl) + hl*t
+    gam = vorticity_column(yk/dia,loc,spr,skw,scl)
+
+    dyp = yk - y0
+    dym = -yk - y0
+    r2p = np.maximum(dx*dx + dyp*dyp,np.finfo(float).tiny)
+    r2m = np.maximum(dx*dx + dym*dym,np.finfo(float).tiny)
+    f = np.column_stack((gam*(dyp/r2p - dym/r2m),gam*dx*(1.0/r2p - 1.0/r2m)))
+
+    return gk21est(hl,wk,wg,f)
+
+
+def _gk21adapt(seg,bounds,epsabs,epsrel,limit):
+    # bisecting the interval with the largest error until the tolerance is met (starting with the intervals between
+    # the bounds); seg(lo,hi) returns the estimate of both components, its error and the error of inner integrals
+    lo = list(bounds[:-1])
+    hi = list(bounds[1:])
+    est = [seg(l,h) for l,h in zip(lo,hi)]
+    while len(lo) < limit:
+        res = np.sum([e[0] for e in est],axis=0)
+        el = [e[1] for e in est]
+        if sum(el) <= max(epsabs,epsrel*(abs(res[0]) + abs(res[1]))):
+            break
+        imax = int(np.argmax(el))
+        mid = 0.5*(lo[imax] + hi[imax])
+        lo.append(mid)
+        hi.append(hi[imax])
+        hi[imax] = mid
+        est[imax] = seg(lo[imax],hi[imax])
+        est.append(seg(lo[-1],hi[-1]))
+
+    return np.sum([e[0] for e in est],axis=0),sum(e[1] for e in est),sum(e[2] for e in est)
+
+
+def gskr_lat(xs,d,dia,emg,x0,y0,epsabs,epsrel,limit,t,wk,wg):
+    """
+    Calculating the lateral integrals of both velocity kernels at a downstream position with adaptive 21-point
+    Gauss-Kronrod quadrature over the folded domain [-d,d]
+    res,err,neval = gskr_lat(xs,d,dia,emg,x0,y0,epsabs,epsrel,limit,t,wk,wg)
+    """
+    loc,spr,skw,scl = emgcolumn(xs,dia,*emg)
+    dx = x0 - xs
+    neval = [0]
+
+    def seg(yl,yu):
+        neval[0] += 21
+        res,err = gskr_seg(yl,yu,dx,y0,dia,loc,spr,skw,scl,t,wk,wg)
+        return res,err,0.0
+
+    # Starting intervals on the upper half [0,d] (split at the lateral position of the point or its image)
+    if (abs(y0) > 0.0) and (abs(y0) < d):
+        bounds = [0.0,abs(y0),d]
+    else:
+        bounds = [0.0,d]
+    res,err,_ = _gk21adapt(seg,bounds,epsabs,epsrel,limit)
+
+    return res,err,neval[0]
+
+
+def gskr_col(xl,xu,d,dia,emg,x0,y0,epsabs,epsrel,limit,t,wk,wg):
+    """
+    Calculating the downstream integral of the lateral integrals over [xl,xu] with the 21-point Gauss-Kronrod rule
+    (errl is the accumulated error of the lateral integrals)
+    res,err,errl,neval = gskr_col(xl,xu,d,dia,emg,x0,y0,epsabs,epsrel,limit,t,wk,wg)
+    """
+    hl = 0.5*(xu - xl)
+    lat = [gskr_lat(0.5*(xu + xl) + hl*tk,d,dia,emg,x0,y0,epsabs,epsrel,limit,t,wk,wg) for tk in t]
+    res,err = gk21est(hl,wk,wg,np.array([l[0] for l in lat]))
+
+    return res,err,abs(hl)*np.dot(wk,[l[1] for l in lat]),sum(l[2] for l in lat)
+
+
+def vel_gskr(x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,epsabs=1.49e-8,epsrel=1.49e-8):
+    """
+    Calculating induced velocity at points relative to the turbine with adaptive 21-point Gauss-Kronrod quadrature
+    in both directions (both velocity components share the subdivision; each rule is calculated as one array
+    expression)
+    velx,vely,err,neval = vel_gskr(x0,y0,dia,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,epsabs=1.49e-8,epsrel=1.49e-8)
+    """
+    limit = 200 # maximum number of intervals in each direction
+    x0 = np.atleast_1d(np.asarray(x0,dtype=float))
+    y0 = np.atleast_1d(np.asarray(y0,dtype=float))
+    npt = np.size(x0)
+    t,wk,wg = gk21rule()
+
+    # Limiting the parameter components to create expected behavior
+    emg = np.array(emgclamp(loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3),dtype=float)
+
+    # Bounds of integration
+    a = 0.0 # starting at turbine
+    b = (scl3 + 5.0)*dia # ending at the inflection point of the vorticity (when it decays)
+    d = 1.0*dia # one diameter laterally (the folded domain spans -d to d)
+
+    velx = np.zeros(npt)
+    vely = np.zeros(npt)
+    err = np.zeros(npt)
+    neval = np.zeros(npt,dtype=np.int32)
+    for p in range(npt):
+        def col(xl,xu):
+            res,el,ell,nev = gskr_col(xl,xu,d,dia,emg,x0[p],y0[p],epsabs,epsrel,limit,t,wk,wg)
+            neval[p] += nev
+            return res,el,ell
+
+        # Starting intervals (split at the downstream position of the point)
+        if (x0[p] > a) and (x0[p] < b):
+            bounds = [a,x0[p],b]
+        else:
+            bounds = [a,b]
+        res,el,ell = _gk21adapt(col,bounds,epsabs,epsrel,limit)
+
+        velx[p],vely[p] = res
+        err[p] = el + ell # downstream and lateral errors
+
+    return velx,vely,err,neval
+
+
+def vel_field(xt,yt,x0t,y0t,dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte,nq=8):
+    """
+    Performing integration to convert vorticity into velocity (Simpson's or the trapezoidal rule with the linear
+    expansion of the vorticity about a point inside the wake integrated analytically)
+    velx,vely = vel_field(xt,yt,x0t,y0t,dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte)
+    """
+    if inte not in [1,2]:
+        raise ValueError('inte = %d is only available in the Fortran routines (_vawtwake)' % inte)
+
+    # Limited EMG parameter components of the turbine and bounds of integration
+    emg,a,b,c,d = emgturbine(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d)
+
+    # Translating the turbine position (placing turbine at 0,0)
+    x0 = x0t - xt
+    y0 = y0t - yt
+
+    # Creating the integration nodes and weights
+    xg,yg,wx,wy = quadgrid(m_in,n_in,inte,a,b,c,d)
+
+    # Linear expansion of the vorticity about the point and its analytic integral with the kernel over the domain
+    gam0,gx,gy,velx,vely = vort_linear(dia,emg,a,b,c,d,x0,y0)
+
+    # smooth remainder of the vorticity at every node (a node at the point itself does not contribute)
+    dx = x0 - xg
+    dy = yg - y0
+    gam = vorticity_column((yg/dia)[:,np.newaxis],*emgcolumn(xg,dia,*emg))
+    gam = gam - (gam0 - gx*dx + gy*dy[:,np.newaxis])
+    r2 = np.maximum(dx**2 + (dy**2)[:,np.newaxis],np.finfo(float).tiny)
+    gr = wx*wy[:,np.newaxis]*gam/r2
+    velx = velx + np.sum(gr*dy[:,np.newaxis])
+    vely = vely + np.sum(gr*dx)
+
+    return velx*(abs(rot)/_pi2)/Vinf,vely*(abs(rot)/_pi2)/Vinf
+
+
+def vel_field_mult(xt,yt,x0t,y0t,dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte,nq=8):
+    """
+    Performing integration to convert vorticity into velocity at multiple points of a single turbine wake
+    (Simpson's or the trapezoidal rule with the wake source calculated once for all of the points)
+    velx,vely = vel_field_mult(xt,yt,x0t,y0t,dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte)
+    """
+    if inte not in [1,2]:
+        raise ValueError('inte = %d is only available in the Fortran routines (_vawtwake)' % inte)
+
+    xg,yg,gw,wx,wy,emg,fac = vorticity_grid(dia,rot,chord,blades,Vinf,loc1d,loc2d,loc3d,spr1d,spr2d,skw1d,skw2d,scl1d,scl2d,scl3d,m_in,n_in,inte)
+
+    return vel_source(xg,yg,gw,wx,wy,dia,emg,fac,np.asarray(x0t) - xt,np.asarray(y0t) - yt)
+
+
+def wake_moments(xg,yg,gw):
+    """
+    Calculating the centroid, extent, total circulation, dipole and quadrupole of a wake source
+    zc,rad,gabs3,mom = wake_moments(xg,yg,gw)
+    """
+    gabs = np.abs(gw)
+    gsum = np.sum(gabs)
+    if gsum > 0.0:
+        zc = complex(np.sum(gabs*xg)/gsum,np.sum(gabs*yg[:,np.newaxis])/gsum)
+    else:
+        zc = 0j
+
+    dz = (xg + 1j*yg[:,np.newaxis] - zc)[gw != 0.0]
+    g = gw[gw != 0.0]
+    rad = np.max(np.abs(dz)) if np.size(dz) > 0 else 0.0
+    gabs3 = np.sum(np.abs(g)*np.abs(dz)**3)
+    mom = np.array([np.sum(g),np.sum(g*dz),np.sum(g*dz*dz)])
+
+    return zc,rad,gabs3,mom
+
+
+def vel_far(x0,y0,zc,rad,gabs3,mom,far,tol,atol=0.0):
+    """
+    Calculating induced velocity at points (relative to the turbine) from the moments of a wake source where the
+    truncation error bound meets tol (relative to the induced velocity) or atol; the others are flagged in near
+    velx,vely,near = vel_far(x0,y0,zc,rad,gabs3,mom,far,tol,atol)
+    """
+    z = np.asarray(x0,dtype=float) + 1j*np.asarray(y0,dtype=float) - zc
+    r = np.abs(z)
+    out = r > max(far,1.0)*rad
+
+    with np.errstate(divide='ignore',invalid='ignore'):
+        w = 1.0/z
+        wsum = w*(mom[0] + w*(mom[1] + w*mom[2]))
+        err = gabs3/(r**3*(r - rad))
+    use = out & (err <= np.maximum(tol*np.abs(wsum),atol))
+
+    return np.where(use,wsum.imag,0.0),np.where(use,wsum.real,0.0),np.where(use,0,1).astype(np.int32)
+
+
+def sheet_vort(xttr,ystr,posdn,poslt,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,dia):
+    """
+    Calculating vorticity strength for polynomial surface fitting
+    vort = sheet_vort(xttr,ystr,posdn,poslt,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,dia)
+    """
+    xttr = np.asarray(xttr,dtype=float)
+    ystr = np.asarray(ystr,dtype=float)
+    par = [parameterval(xttr,ystr,coef) for coef in (coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9)]
+
+    return vorticitystrength(np.asarray(posdn,dtype=float),np.asarray(poslt,dtype=float),dia,*par)
+
+
+def sheet_vel(xttr,ystr,posdn,poslt,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,dia,Vinf,m_in,n_in,inte):
+    """
+    Calculating velocity for polynomial surface fitting
+    vel = sheet_vel(xttr,ystr,posdn,poslt,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,dia,Vinf,m_in,n_in,inte)
+    """
+    vel = np.zeros(np.size(xttr))
+    for i in range(np.size(xttr)):
+        rot = xttr[i]*Vinf/(dia/2.0)
+        chord = ystr[i]*(dia/2.0)/3
+        velx,_ = vel_field(0.0,0.0,posdn[i],poslt[i],dia,rot,chord,3,Vinf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,m_in,n_in,inte)
+        vel[i] = (velx*Vinf + Vinf)/Vinf
+
+    return vel
+
+
+def radialforce(uvec,vvec,thetavec,af_data,cl_data,cd_data,r,chord,twist,delta,B,Omega,Vinf,Vinfx,Vinfy,rho,interp):
+    """
+    Calculating loading forces on VAWT blades and power of the turbine
+    Aerodynamics of multiple vertical-axis wind turbines using a modified Actuator Cylinder approach
+    Developed by Andrew Ning at Brigham Young University
+    q,k,Cp,Tp,Vn,Vt = radialforce(uvec,vvec,thetavec,af_data,cl_data,cd_data,r,chord,twist,delta,B,Omega,Vinf,Vinfx,Vinfy,rho,interp)
+    """
+    uvec = np.asarray(uvec,dtype=float)
+    vvec = np.asarray(vvec,dtype=float)
+    thetavec = np.asarray(thetavec,dtype=float)
+
+    # set the rotation direction
+    rotation = 1.0 if Omega >= 0.0 else -1.0
+
+    sigma = B*chord/r
+
+    # velocity components and angles
+    Vn = (Vinf*(1.0 + uvec) + Vinfx)*np.sin(thetavec) - (Vinf*vvec + Vinfy)*np.cos(thetavec)
+    Vt = rotation*((Vinf*(1.0 + uvec) + Vinfx)*np.cos(thetavec) + (Vinf*vvec + Vinfy)*np.sin(thetavec)) + abs(Omega)*r
+    W2 = Vn**2 + Vt**2
+    phi = np.arctan2(Vn,Vt)
+    alpha = phi - twist
+
+    # airfoil
+    cl,cd = _airfoil(af_data,cl_data,cd_data,alpha*180.0/np.pi,interp)
+
+    # rotate force coefficients
+    cn = cl*np.cos(phi) + cd*np.sin(phi)
+    ct = cl*np.sin(phi) - cd*np.cos(phi)
+
+    # radial force
+    q = sigma/(4.0*np.pi)*cn*(W2/Vinf**2)
+
+    # instantaneous forces
+    qdyn = 0.5*rho*W2
+    Tp = ct*qdyn*chord/np.cos(delta)
+
+    # nonlinear correction factor
+    integrand = (W2/Vinf**2)*(cn*np.sin(thetavec) - rotation*ct*np.cos(thetavec)/np.cos(delta))
+    Cto = sigma/(4.0*np.pi)*pInt(thetavec,integrand)
+
+    if Cto > 2.0: # propeller brake
+        a = 0.5*(1.0 + np.sqrt(1.0 + Cto))
+        k = 1.0/(a-1.0)
+    elif Cto > 0.96: # empirical
+        a = 1.0/7.0*(1.0 + 3.0*np.sqrt(7.0/2.0*Cto - 3.0))
+        k = 18.0*a/(7.0*a**2 - 2.0*a + 4.0)
+    else: # momentum
+        a = 0.5*(1.0 - np.sqrt(1.0 - Cto))
+        k = 1.0/(1.0-a)
+
+    # power coefficient
+    H = 1.0 # per unit height
+    As = 2.0*r*H
+    P = abs(Omega)*B/(2.0*np.pi)*pInt(thetavec,r*Tp)
+    Cp = P/(0.5*rho*Vinf**3*As)
+
+    return q,k,Cp,Tp,Vn,Vt
+
+
+def powercalc(thetavec,Vinf,wake_x,wake_y,Vnp,Vnn,Vtp,Vtn,Cpp,Cpn,Omega,r,H,af_data,cl_data,cd_data,twist,rho,interp):
+    """
+    Calculating power and coefficient of power using velocity vector summation
+    P,Cp = powercalc(thetavec,Vinf,wake_x,wake_y,Vnp,Vnn,Vtp,Vtn,Cpp,Cpn,Omega,r,H,af_data,cl_data,cd_data,twist,rho,interp)
+    """
+    thetavec = np.asarray(thetavec,dtype=float)
+    wake_x = np.asarray(wake_x,dtype=float)
+    wake_y = np.asarray(wake_y,dtype=float)
+
+    if Omega >= 0.0:
+        Vn0,Vt0,Cpb = np.asarray(Vnp),np.asarray(Vtp),np.asarray(Cpp)
+    else:
+        Vn0,Vt0,Cpb = np.asarray(Vnn),np.asarray(Vtn),np.asarray(Cpn)
+
+    # calculate baseline values
+    W20 = Vn0**2 + Vt0**2
+    alpha0 = np.arctan2(Vn0,Vt0) - twist
+    cl0,cd0 = _airfoil(af_data,cl_data,cd_data,alpha0*180.0/np.pi,interp)
+    ct0 = cl0*np.sin(alpha0) - cd0*np.cos(alpha0)
+
+    # correct normal/tangential velocities with wake velocities
+    Vn = Vn0 + wake_x*np.sin(thetavec) - wake_y*np.cos(thetavec)
+    if Omega >= 0.0:
+        Vt = Vt0 + wake_x*np.cos(thetavec) + wake_y*np.sin(thetavec)
+    else:
+        Vt = Vt0 - wake_x*np.cos(thetavec) - wake_y*np.sin(thetavec)
+    W2 = Vn**2 + Vt**2
+
+    # compute new inflow angle
+    phi = np.arctan2(Vn,Vt)
+    alpha = phi - twist
+
+    # airfoil
+    cl,cd = _airfoil(af_data,cl_data,cd_data,alpha*180.0/np.pi,interp)
+
+    # compute new tangential force coefficient (with the inflow angle for negative rotation as in _vawtwake)
+    if Omega >= 0.0:
+        ct = cl*np.sin(alpha) - cd*np.cos(alpha)
+    else:
+        ct = cl*np.sin(phi) - cd*np.cos(phi)
+
+    # provide relative correction to power coefficient and integrate the local power coefficients
+    Cp = pInt(thetavec,Cpb*W2/W20*ct/ct0)
+
+    # power calculation
+    As = 2.0*r*H # swept area
+    P = Cp*0.5*rho*Vinf**3*As
+
+    return P,Cp
+
+
+def _airfoil(af_data,cl_data,cd_data,alpha,interp):
+    # lift and drag coefficients at angles of attack in degrees (1: linear, 2: cubic spline interpolation)
+    if interp == 1:
+        return interpolate(af_data,cl_data,alpha),interpolate(af_data,cd_data,alpha)
+    elif interp == 2:
+        return splineint(af_data,cl_data,alpha),splineint(af_data,cd_data,alpha)
+    else:
+        raise ValueError('interp must be 1 or 2')
+
+
+def overlap(p,xt,yt,diat,rott,chord,blades,x0,y0,dia,Vinf,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,m,n,inte,pointcalc,tol=0.0):
+    """
+    Calculating effective velocities around given turbine due to wake interaction
+    For use only with Simpson's method
+    velx,vely = overlap(p,xt,yt,diat,rott,chord,blades,x0,y0,dia,Vinf,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,m,n,inte,pointcalc)
+    """
+    xt = np.atleast_1d(xt)
+    yt = np.atleast_1d(yt)
+    diat = np.atleast_1d(diat)
+    rott = np.atleast_1d(rott)
+    t = np.size(xt)
+
+    # Calculating the wake source of each turbine type and rotation rate only once
+    sid = np.zeros(t,dtype=np.int32)
+    types = []
+    sources = []
+    for j in range(t):
+        key = (diat[j],abs(rott[j]))
+        if key not in types:
+            types.append(key)
+            xs,ys,gs,wxs,wys,emg,fac = vorticity_grid(diat[j],rott[j],chord,blades,Vinf,loc1,loc2,loc3,spr1,spr2,skw1,skw2,scl1,scl2,scl3,m,n,inte)
+            sources.append((xs,ys,gs,wxs,wys,diat[j],emg,fac))
+        sid[j] = types.index(key) + 1
+    xg,yg,gw,wx,wy,dias,emg,fac = [np.array(a) for a in zip(*sources)]
+
+    return overlap_source(p,xt,yt,sid,xg.T,yg.T,gw.transpose(1,2,0),wx.T,wy.T,dias,emg.T,fac,x0,y0,dia,Vinf,pointcalc,tol)
+
+
+def _source_velocity(xg,yg,gw,wx,wy,dias,emg,fac,sid,xd,yd):
+    # induced velocities of the wake of each turbine (stacked wake sources selected by sid) at its rows of points
+    velx = np.zeros(np.shape(xd))
+    vely = np.zeros(np.shape(xd))
+    for ks in np.unique(sid):
+        # all of the points of the turbines sharing a source in one batch
+        rows = np.nonzero(sid == ks)[0]
+        vx,vy = vel_source(xg[:,ks-1],yg[:,ks-1],gw[:,:,ks-1],wx[:,ks-1],wy[:,ks-1],dias[ks-1],emg[:,ks-1],fac[ks-1],
+                           xd[rows].ravel(),yd[rows].ravel())
+        velx[rows] = vx.reshape(np.shape(xd[rows]))
+        vely[rows] = vy.reshape(np.shape(xd[rows]))
+
+    return velx,vely
+
+
+def _wake_sum(velxi,velyi,Vinf):
+    # sum of squares of the velocity deficits of the wakes (first axis) and its square root
+    intex = np.sum(-velxi*np.abs(velxi),axis=0)
+    intey = np.sum(velyi*np.abs(velyi),axis=0)
+
+    return -Vinf*np.sign(intex)*np.sqrt(np.abs(intex)),Vinf*np.sign(intey)*np.sqrt(np.abs(intey))
+
+
+def _stacked(xg,yg,gw,wx,wy,dias,emg,fac):
+    # stacked wake sources with the source as the last axis (also for a single source)
+    return (np.asarray(xg).reshape((np.shape(xg)[0],-1)),np.asarray(yg).reshape((np.shape(yg)[0],-1)),
+            np.asarray(gw).reshape(np.shape(gw)[:2] + (-1,)),np.asarray(wx).reshape((np.shape(wx)[0],-1)),
+            np.asarray(wy).reshape((np.shape(wy)[0],-1)),np.atleast_1d(dias),np.asarray(emg).reshape((10,-1)),
+            np.atleast_1d(fac))
+
+
+def overlap_source(p,xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,x0,y0,dia,Vinf,pointcalc,tol=0.0):
+    """
+    Calculating effective velocities around given turbine due to wake interaction from precalculated wake sources
+    velx,vely = overlap_source(p,xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,x0,y0,dia,Vinf,pointcalc)
+    """
+    xt = np.atleast_1d(xt)
+    yt = np.atleast_1d(yt)
+    sid = np.atleast_1d(sid)
+    source = _stacked(xg,yg,gw,wx,wy,dias,emg,fac)
+    t = np.size(xt)
+
+    # finding points around the flight path of the blades
+    if pointcalc == 1:
+        theta = (2.0*np.pi/p)*np.arange(1,p+1)-(2.0*np.pi/p)/2.0
+        xd = x0 - np.sin(theta)*(dia/2.0)
+        yd = y0 + np.cos(theta)*(dia/2.0)
+    else:
+        xd = np.array([x0])
+        yd = np.array([y0])
+
+    # induced velocities from each turbine wake (translating the points relative to the turbine)
+    velxi = np.zeros((t,p))
+    velyi = np.zeros((t,p))
+    velxi[:,:np.size(xd)],velyi[:,:np.size(xd)] = _source_velocity(*(source + (sid,xd - xt[:,np.newaxis],yd - yt[:,np.newaxis])))
+
+    if t == 1: # coupled configuration (only two VAWTs)
+        return velxi[0]*Vinf,velyi[0]*Vinf
+    else: # multiple turbine wake overlap
+        return _wake_sum(velxi,velyi,Vinf)
+
+
+def farm_velocity(xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,diat,theta,pair,tol=0.0):
+    """
+    Calculating the induced velocities of each turbine wake at given angles around the flight path of the blades of
+    every other turbine of a farm (velx[l,j,i] of the wake of turbine j around turbine i; 0 for the pairs not
+    calculated)
+    velx,vely = farm_velocity(xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,diat,theta,pair)
+    """
+    xt = np.asarray(xt,dtype=float)
+    yt = np.asarray(yt,dtype=float)
+    diat = np.asarray(diat,dtype=float)
+    theta = np.asarray(theta,dtype=float)
+    sid = np.asarray(sid)
+    source = _stacked(xg,yg,gw,wx,wy,dias,emg,fac)
+    t = np.size(xt)
+    nth = np.size(theta)
+
+    # points around the flight path of turbine i relative to turbine j (pairs j,i)
+    pair = np.asarray(pair) != 0
+    pair[np.arange(t),np.arange(t)] = False
+    jw,it = np.nonzero(pair)
+    xd = xt[it,np.newaxis] - np.sin(theta)*(diat[it,np.newaxis]/2.0) - xt[jw,np.newaxis]
+    yd = yt[it,np.newaxis] + np.cos(theta)*(diat[it,np.newaxis]/2.0) - yt[jw,np.newaxis]
+
+    velx = np.zeros((nth,t,t),order='F')
+    vely = np.zeros((nth,t,t),order='F')
+    velx[:,jw,it],vely[:,jw,it] = [v.T for v in _source_velocity(*(source + (sid[jw],xd,yd)))]
+
+    return velx,vely
+
+
+def overlap_farm(xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,diat,Vinf,velx,vely,tol=0.0):
+    """
+    Calculating effective velocities around every turbine of a farm due to the wakes of the other turbines
+    (the velocities around turbine i are written to velx[:,i] and vely[:,i])
+    overlap_farm(xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,diat,Vinf,velx,vely)
+    """
+    t = np.size(xt)
+    p = np.shape(velx)[0]
+
+    # point around the flight path of the blades of each turbine
+    theta = (2.0*np.pi/p)*np.arange(1,p+1)-(2.0*np.pi/p)/2.0
+    velxw,velyw = farm_velocity(xt,yt,sid,xg,yg,gw,wx,wy,dias,emg,fac,diat,theta,np.ones((t,t),dtype=np.int32))
+
+    if t == 2: # coupled configuration (only two VAWTs)
+        velx[:,0] = velxw[:,1,0]*Vinf
+        vely[:,0] = velyw[:,1,0]*Vinf
+        velx[:,1] = velxw[:,0,1]*Vinf
+        vely[:,1] = velyw[:,0,1]*Vinf
+    else: # sum of squares of velocity deficits
+        velx[:,:],vely[:,:] = _wake_sum(velxw.transpose(1,0,2),velyw.transpose(1,0,2),Vinf)
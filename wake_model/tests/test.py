@@ -1,8 +1,30 @@
 # Unit test for VAWT_Wake_Model using PIV and wind tunnel experiments as references
 
 import unittest
+import os
+import sys
+import subprocess
+import shutil
+import tempfile
 import numpy as np
-from VAWT_Wake_Model import velocity_field
+from scipy.special import erfc,erfcx
+from VAWT_Wake_Model import velocity_field,velocity_grid,overlap,wake_source,coef_val,emg_kernel,set_threads,batch,\
+    wake_sources,wake_buffers,overlap_farm,_fourier_interp,\
+    InfluenceMap,WakeSurrogate,build_surrogate,wake_surrogate,coef_key,register_coef,get_coef,parameterval,airfoil_data,\
+    set_backend,get_backend,velocity_jacobian,overlap_jacobian,clear_sources,_wake_sources
+from vawt_backend import kernels
+import _vawtnumpy
+try:
+    import _vawtwake
+except ImportError:
+    _vawtwake = None
+
+
+def fortran(test):
+    # the test uses routines only available in _vawtwake (skipped without the Fortran build and by TestNumpyBackend)
+    test.fortran = True
+    return unittest.skipIf(_vawtwake is None,'_vawtwake has not been built')(test)
+
 
 class Testwakemodel(unittest.TestCase):
     def test_PIV(self):
@@ -73,7 +95,735 @@ class Testwakemodel(unittest.TestCase):
             rom15wt[i] = velocity_field(0.0,0.0,1.5*dia,x15wt[i]*dia,velf,dia,rot,chord,B)
 
         np.testing.assert_allclose(rom15wt,y15wt,atol=0.4)
-        
+
+    def test_array(self):
+
+        # Wake model calculation of a velocity profile in a single call compared to point by point
+        rad = 0.5
+        dia = 2*rad
+        velf = 9.308422677
+        tsr = 4.5
+        rot = tsr*velf/rad
+        chord = 0.06
+        B = 2
+        y = np.linspace(-1.2,1.2,9)*dia
+
+        for veltype in ['all','x','y','vort']:
+            rom = velocity_field(0.0,0.0,1.5*dia,y,velf,dia,rot,chord,B,veltype=veltype)
+            for i in range(np.size(y)):
+                np.testing.assert_allclose(rom[i],velocity_field(0.0,0.0,1.5*dia,y[i],velf,dia,rot,chord,B,veltype=veltype),rtol=1e-12,atol=1e-12)
+
+        romind = velocity_field(0.0,0.0,np.array([[1.5],[3.0]])*dia,y,velf,dia,rot,chord,B,veltype='ind')
+        self.assertEqual(romind.shape,(2,2,np.size(y)))
+        np.testing.assert_allclose(romind[:,1,4],velocity_field(0.0,0.0,3.0*dia,y[4],velf,dia,rot,chord,B,veltype='ind'),rtol=1e-12,atol=1e-12)
+
+    def test_overlap(self):
+
+        # Wake overlap using the cached wake sources compared to the Fortran calculation
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        xt = np.array([0.0,1.0,3.0])
+        yt = np.array([0.0,2.0,-1.0])
+        diat = np.ones_like(xt)*dia
+        rott = np.array([rot,-rot,rot])
+        coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9 = coef_val()
+
+        self.assertIs(wake_source(dia,rot,chord,B,velf),wake_source(dia,-rot,chord,B,velf))
+
+        # The cache of wake sources is bounded (e.g. for a sweep of rotation rates) and cleared on request
+        source = wake_source(dia,rot,chord,B,velf)
+        for i in range(100):
+            wake_source(dia,rot*(1. + 0.001*i),chord,B,velf,8,8)
+            self.assertLessEqual(len(_wake_sources),64)
+        clear_sources()
+        self.assertEqual(len(_wake_sources),0)
+        self.assertIsNot(wake_source(dia,rot,chord,B,velf),source)
+
+        for t in [1,3]:
+            velx,vely = overlap(36,xt[:t],yt[:t],diat[:t],rott[:t],chord,B,5.0,0.5,dia,velf,False,integration='simp')
+            velxf,velyf = kernels.overlap(36,xt[:t],yt[:t],diat[:t],rott[:t],chord,B,5.0,0.5,dia,velf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,220,200,1,1)
+            # the Python points around the flight path start one point before the Fortran points
+            np.testing.assert_allclose(velx,np.roll(velxf,1),rtol=1e-10,atol=1e-12)
+            np.testing.assert_allclose(vely,np.roll(velyf,1),rtol=1e-10,atol=1e-12)
+
+        # Simpson's Rule divisions other than the default
+        velx,vely = overlap(36,xt,yt,diat,rott,chord,B,5.0,0.5,dia,velf,False,integration='simp',m=100,n=80)
+        velxf,velyf = kernels.overlap(36,xt,yt,diat,rott,chord,B,5.0,0.5,dia,velf,coef0,coef1,coef2,coef3,coef4,coef5,coef6,coef7,coef8,coef9,100,80,1,1)
+        np.testing.assert_allclose(velx,np.roll(velxf,1),rtol=1e-10,atol=1e-12)
+        np.testing.assert_allclose(vely,np.roll(velyf,1),rtol=1e-10,atol=1e-12)
+
+        # Tree code evaluation of the wake overlap within the requested tolerance
+        velx,vely = overlap(36,xt,yt,diat,rott,chord,B,5.0,0.5,dia,velf,False,integration='simp')
+        velxt,velyt = overlap(36,xt,yt,diat,rott,chord,B,5.0,0.5,dia,velf,False,integration='simp',tol=1e-6)
+        np.testing.assert_allclose(velxt,velx,atol=1e-5)
+        np.testing.assert_allclose(velyt,vely,atol=1e-5)
+
+    @fortran
+    def test_threads(self):
+
+        # Wake overlap with multiple OpenMP threads compared to a single thread
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        xt = np.array([0.0,1.0,3.0])
+        yt = np.array([0.0,2.0,-1.0])
+        diat = np.ones_like(xt)*dia
+        rott = np.array([rot,-rot,rot])
+
+        nthreads = set_threads(1)
+        vel1 = [overlap(36,xt,yt,diat,rott,chord,B,5.0,0.5,dia,velf,False,integration=inte) for inte in ['simp','gskr']]
+        set_threads(4)
+        vel4 = [overlap(36,xt,yt,diat,rott,chord,B,5.0,0.5,dia,velf,False,integration=inte) for inte in ['simp','gskr']]
+        set_threads(nthreads)
+        np.testing.assert_allclose(vel4,vel1,rtol=1e-12,atol=1e-14)
+
+        # the Gauss-Kronrod overlap (evaluated together at all points) compared to the single point calculations
+        theta = (2.0*np.pi/36)*np.arange(36)-(2.0*np.pi/36)/2.0
+        for i in range(0,36,5):
+            velx,vely = overlap(1,xt,yt,diat,rott,chord,B,5.0-np.sin(theta[i])*(dia/2.0),0.5+np.cos(theta[i])*(dia/2.0),dia,velf,True,integration='gskr')
+            np.testing.assert_allclose([velx[0],vely[0]],[vel1[1][0][i],vel1[1][1][i]],rtol=1e-12,atol=1e-14)
+
+    @fortran
+    def test_batch(self):
+
+        # Wake calculations on the thread pool compared to the same calculations in serial
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        x = np.linspace(1.0,10.0,12)*dia
+        y = np.linspace(-0.8,0.8,12)*dia
+
+        cases = [(0.0,0.0,x[i],y[i],velf,dia,rot*(1.0 + 0.05*i),chord,B) for i in range(np.size(x))]
+        velbatch = batch(velocity_field,cases,kwargs={'veltype':'ind','integration':'gauss'},workers=3)
+        for i in range(np.size(x)):
+            vel = velocity_field(*cases[i],veltype='ind',integration='gauss')
+            np.testing.assert_allclose(velbatch[i],vel,rtol=1e-14,atol=1e-15)
+
+    def test_single(self):
+
+        # Single precision wake source, velocity map and wake overlap compared to double precision
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        X,Y = np.meshgrid(np.linspace(-2.0,20.0,45),np.linspace(-1.5,1.5,31))
+
+        vel = velocity_field(0.0,0.0,X,Y,velf,dia,rot,chord,B,veltype='ind',integration='simp')
+        velsp = velocity_field(0.0,0.0,X,Y,velf,dia,rot,chord,B,veltype='ind',integration='simp',precision='single')
+        self.assertEqual(velsp.dtype,np.float32)
+        np.testing.assert_allclose(velsp,vel,rtol=0.,atol=1e-4)
+
+        x = np.linspace(-2.0,20.0,111)
+        y = np.linspace(-2.0,2.0,81)
+        vel = velocity_grid(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind')
+        velsp = velocity_grid(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',precision='single')
+        np.testing.assert_allclose(velsp,vel,rtol=0.,atol=1e-5)
+
+        xt = np.array([0.0,1.0,3.0])
+        yt = np.array([0.0,2.0,-1.0])
+        rott = np.array([rot,-rot,rot])
+        vel = overlap(36,xt,yt,np.ones(3)*dia,rott,chord,B,5.0,0.5,dia,velf,False,integration='simp')
+        velsp = overlap(36,xt,yt,np.ones(3)*dia,rott,chord,B,5.0,0.5,dia,velf,False,integration='simp',precision='single')
+        np.testing.assert_allclose(velsp,vel,rtol=0.,atol=1e-5*velf)
+
+        self.assertRaises(ValueError,velocity_field,0.0,0.0,1.0,0.0,velf,dia,rot,chord,B,integration='gskr',precision='single')
+
+    def test_farm(self):
+
+        # Wake overlap of every turbine of a farm written in place compared to the overlap of each turbine
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        xt = np.array([0.0,1.0,3.0,4.5])
+        yt = np.array([0.0,2.0,-1.0,0.5])
+        diat = np.ones_like(xt)*dia
+        rott = np.array([rot,-rot,rot,rot])
+
+        for t in [2,4]:
+            for tol in [0.,1e-6]:
+                velx,vely = wake_buffers(t,36)
+                address = velx.ctypes.data
+                self.assertIs(overlap_farm(xt[:t],yt[:t],diat[:t],rott[:t],chord,B,velf,velx,vely,tol=tol)[0],velx)
+                self.assertEqual(velx.ctypes.data,address)
+
+                sid,xg,yg,gw,wx,wy,dias,emg,fac = wake_sources(diat[:t],rott[:t],chord,B,velf)
+                for i in range(t):
+                    velxi,velyi = kernels.overlap_source(36,np.delete(xt[:t],i),np.delete(yt[:t],i),np.delete(sid,i),xg,yg,gw,wx,wy,dias,emg,fac,xt[i],yt[i],dia,velf,1,tol=tol)
+                    np.testing.assert_allclose(velx[:,i],velxi,rtol=1e-12,atol=1e-14)
+                    np.testing.assert_allclose(vely[:,i],velyi,rtol=1e-12,atol=1e-14)
+
+        self.assertRaises(ValueError,overlap_farm,xt,yt,diat,rott,chord,B,velf,np.zeros((36,4)),np.zeros((36,4)))
+
+    def test_spectral(self):
+
+        # Fourier interpolation of the wake velocities around the flight paths compared to calculating every point
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        xt = np.array([0.0,1.0,3.0,4.5])
+        yt = np.array([0.0,2.0,-1.0,0.5])
+        diat = np.ones_like(xt)*dia
+        rott = np.array([rot,-rot,rot,rot])
+
+        theta = 2.*np.pi*np.arange(5)/5.
+        val = np.array([np.cos(2.*theta) + 0.5*np.sin(theta)])
+        thetap = 2.*np.pi*np.arange(20)/20.
+        np.testing.assert_allclose(_fourier_interp(val,20)[0],np.cos(2.*thetap) + 0.5*np.sin(thetap),atol=1e-14)
+
+        velx,vely = wake_buffers(4,72)
+        velxs,velys = wake_buffers(4,72)
+        overlap_farm(xt,yt,diat,rott,chord,B,velf,velx,vely)
+        overlap_farm(xt,yt,diat,rott,chord,B,velf,velxs,velys,nsample=9,sample_tol=1e-6)
+        np.testing.assert_allclose(velxs,velx,atol=1e-4*velf)
+        np.testing.assert_allclose(velys,vely,atol=1e-4*velf)
+
+        velx,vely = overlap(72,xt[:3],yt[:3],diat[:3],rott[:3],chord,B,xt[3],yt[3],dia,velf,False,integration='simp')
+        velxs,velys = overlap(72,xt[:3],yt[:3],diat[:3],rott[:3],chord,B,xt[3],yt[3],dia,velf,False,integration='simp',nsample=9,sample_tol=1e-6)
+        np.testing.assert_allclose(velxs,velx,atol=1e-4*velf)
+        np.testing.assert_allclose(velys,vely,atol=1e-4*velf)
+
+    def test_far(self):
+
+        # Far-field velocity from the moments of the wake compared to the integration (within the error bound)
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        x = np.array([-300.0,250.0,0.0,5.0])*dia
+        y = np.array([40.0,-200.0,300.0,0.5])*dia
+
+        source = wake_source(dia,rot,chord,B,velf)
+        _,_,near = source.far_field(x,y,2.0,1e-2)
+        np.testing.assert_equal(near,[False,False,False,True])
+
+        velint = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+        velfar = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='gskr',far=2.0,far_tol=1e-2)
+        err = np.sqrt((velfar[0] - velint[0])**2 + (velfar[1] - velint[1])**2)
+        np.testing.assert_array_less(err,1e-2*np.sqrt(velint[0]**2 + velint[1]**2) + 1e-15)
+        np.testing.assert_equal(velfar[:,3],velint[:,3])
+
+    def test_auto(self):
+
+        # Automatic choice of the method at each point compared to the Gauss-Kronrod integration (within tol)
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        tol = 1e-3
+        x = np.array([-300.0,250.0,-2.0,3.0,8.0,4.0,12.0,0.5])*dia
+        y = np.array([40.0,-200.0,0.5,2.0,-3.0,0.45,0.0,0.55])*dia
+
+        velint = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+        velauto,info = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='auto',tol=tol,full_output=True)
+        err = np.sqrt((velauto[0] - velint[0])**2 + (velauto[1] - velint[1])**2)
+        np.testing.assert_array_less(err,tol)
+        np.testing.assert_equal(info['method'][:2],['far','far'])
+        np.testing.assert_equal(info['method'][2:6],['simp','simp','simp','simp'])
+        self.assertEqual(info['method'][7],'gskr')
+        self.assertTrue(np.all(info['m'][info['method'] != 'simp'] == 0))
+
+    @fortran
+    def test_numpy(self):
+
+        # NumPy routines compared to the Fortran routines, and the wake model calculated with the NumPy backend
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        coef = coef_val()
+        par = parameterval(4.5,0.24)
+        x = np.array([-1.0,0.5,2.0,6.0,15.0])*dia
+        y = np.array([0.2,-0.45,0.5,1.5,-0.1])*dia
+
+        for i in range(np.size(x)):
+            self.assertAlmostEqual(_vawtnumpy.vorticitystrength(x[i],y[i],dia,*par),_vawtwake.vorticitystrength(x[i],y[i],dia,*par),places=10)
+            velxn,velyn = _vawtnumpy.vel_field(0.0,0.0,x[i],y[i],dia,rot,chord,B,velf,*(coef+(100,100,1)))
+            velxf,velyf = _vawtwake.vel_field(0.0,0.0,x[i],y[i],dia,rot,chord,B,velf,*(coef+(100,100,1)))
+            self.assertAlmostEqual(velxn,velxf,places=12)
+            self.assertAlmostEqual(velyn,velyf,places=12)
+
+        xt = np.array([0.0,2.0,0.0])*dia
+        yt = np.array([0.0,0.8,-1.5])*dia
+        diat = np.ones(3)*dia
+        rott = np.array([rot,-rot,1.1*rot])
+        for pointcalc in [0,1]:
+            veln = _vawtnumpy.overlap(36,xt,yt,diat,rott,chord,B,5.0,0.5,dia,velf,*(coef+(100,100,1,pointcalc)))
+            velf_ = _vawtwake.overlap(36,xt,yt,diat,rott,chord,B,5.0,0.5,dia,velf,*(coef+(100,100,1,pointcalc)))
+            np.testing.assert_allclose(veln,velf_,atol=1e-12)
+
+        af_data,cl_data,cd_data = airfoil_data(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','data','airfoils','du06w200.dat'))
+        theta = (2.0*np.pi/36)*np.arange(1,37) - np.pi/36
+        uvec = -0.2*np.cos(theta)**2
+        vvec = 0.05*np.sin(theta)
+        for interp in [1,2]:
+            for omega in [rot,-rot]:
+                resn = _vawtnumpy.radialforce(uvec,vvec,theta,af_data,cl_data,cd_data,dia/2.,chord,0.0,0.0,B,omega,velf,np.zeros(36),np.zeros(36),1.225,interp)
+                resf = _vawtwake.radialforce(uvec,vvec,theta,af_data,cl_data,cd_data,dia/2.,chord,0.0,0.0,B,omega,velf,np.zeros(36),np.zeros(36),1.225,interp)
+                for i in range(6):
+                    np.testing.assert_allclose(resn[i],resf[i],rtol=1e-12,atol=1e-12)
+                Vn,Vt,Cpl = resf[4],resf[5],resf[3]/100.
+                resn = _vawtnumpy.powercalc(theta,velf,uvec*velf,vvec*velf,Vn,Vn,Vt,Vt,Cpl,Cpl,omega,dia/2.,1.0,af_data,cl_data,cd_data,0.0,1.225,interp)
+                resf = _vawtwake.powercalc(theta,velf,uvec*velf,vvec*velf,Vn,Vn,Vt,Vt,Cpl,Cpl,omega,dia/2.,1.0,af_data,cl_data,cd_data,0.0,1.225,interp)
+                np.testing.assert_allclose(resn,resf,rtol=1e-12)
+
+        source = wake_source(dia,rot,chord,B,velf)
+        args = (source.xg,source.yg,source.gw,source.wx,source.wy,source.dia,source.emg,source.fac,x,y)
+        jacn = _vawtnumpy.vel_source_jac(*args)
+        jacf = _vawtwake.vel_source_jac(*args)
+        for i in range(6):
+            np.testing.assert_allclose(jacn[i],jacf[i],atol=1e-12)
+
+        # the backend selected at runtime
+        velfort = _vawtwake.vel_field_mult(0.0,0.0,x,y,dia,rot,chord,B,velf,*(coef+(64,44,1)))
+        ovfort = overlap(36,xt,yt,diat,rott,chord,B,5.0,0.5,dia,velf,False,integration='simp')
+        gskrfort = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+        source = wake_source(dia,rot,chord,B,velf,220,200)
+        self.assertEqual(get_backend(),'fortran')
+        set_backend('numpy')
+        try:
+            velnum = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',m=64,n=44)
+            ovnum = overlap(36,xt,yt,diat,rott,chord,B,5.0,0.5,dia,velf,False,integration='simp')
+            gskrnum = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+            self.assertIsNot(wake_source(dia,rot,chord,B,velf,220,200),source)
+        finally:
+            set_backend('fortran')
+        self.assertIsNot(wake_source(dia,rot,chord,B,velf,220,200),source)
+        np.testing.assert_allclose(velnum,velfort,atol=1e-12)
+        np.testing.assert_allclose(ovnum,ovfort,atol=1e-12)
+        np.testing.assert_allclose(gskrnum,gskrfort,rtol=1e-10,atol=1e-14)
+
+    @fortran
+    def test_map(self):
+
+        # Influence map lookups compared to the integration used for the map, and the stored map read back
+        dia = 2.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.12
+        B = 2
+        directory = tempfile.mkdtemp()
+        x = np.array([3.0,4.0,6.0,12.0,30.0])*dia
+        y = np.array([0.3,-0.6,1.2,0.2,0.0])*dia
+
+        try:
+            imap = InfluenceMap(4.5,0.24,xlim=(2.,8.),ylim=(-1.5,1.5),h=0.1,integration='semi',directory=directory)
+            self.assertTrue(os.path.exists(imap.file))
+            np.testing.assert_equal(InfluenceMap(4.5,0.24,xlim=(2.,8.),ylim=(-1.5,1.5),h=0.1,integration='semi',directory=directory).velx,imap.velx)
+
+            rommap = velocity_field(1.0,-0.5,x+1.0,y-0.5,velf,dia,rot,chord,B,veltype='ind',integration='map',imap=imap)
+            romsemi = velocity_field(1.0,-0.5,x[:3]+1.0,y[:3]-0.5,velf,dia,rot,chord,B,veltype='ind',integration='semi')
+            romgskr = velocity_field(1.0,-0.5,x[3:]+1.0,y[3:]-0.5,velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+            np.testing.assert_allclose(rommap[:,:3],romsemi,atol=1e-4)
+            np.testing.assert_equal(rommap[:,3:],romgskr)
+        finally:
+            shutil.rmtree(directory)
+
+    @fortran
+    def test_surrogate(self):
+
+        # Chebyshev surrogate reproducing the integration at its Chebyshev points, with the held-out error recorded
+        directory = tempfile.mkdtemp()
+        file = os.path.join(directory,'surrogate.npz')
+
+        try:
+            err_max,err_rms = build_surrogate(file,deg=(2,3),xbreak=(0.,0.5,1.),xdeg=(8,6),ybreak=(-1.,1.),ydeg=(6,),ntest=20)
+            surrogate = WakeSurrogate(file)
+            self.assertEqual(surrogate.coef[1][0].shape,(2,2,3,6,6))
+            self.assertEqual(surrogate.err_max,err_max)
+            self.assertTrue(0. < err_rms <= err_max)
+
+            t = [np.cos(np.pi*(np.arange(n) + 0.5)/n) for n in (2,3,6,6)]
+            tsr = 4.25 + 2.75*t[0][1]
+            sol = 0.575 + 0.425*t[1][2]
+            x = (0.75 + 0.25*t[2])*surrogate.length(tsr,sol)
+            y = t[3][1]*np.ones_like(x)
+            romsur = surrogate.velocity(tsr,sol,x,y)
+            romsemi = velocity_field(0.0,0.0,x,y,1.0,1.0,2.*tsr,sol/2.,1,veltype='ind',integration='semi')
+            np.testing.assert_allclose(romsur[0],romsemi[0],atol=1e-5)
+            np.testing.assert_allclose(romsur[1],romsemi[1],atol=1e-5)
+            np.testing.assert_equal(surrogate.velocity(tsr,sol,[-1.,3.],[0.,2.])[2],[True,True])
+            self.assertRaises(ValueError,surrogate.velocity,8.0,sol,x,y)
+        finally:
+            shutil.rmtree(directory)
+
+        # the surrogate of the model within its recorded error of the integration it was fitted to
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        x = np.array([-0.5,1.0,4.0,9.0,14.0])*dia
+        y = np.array([0.2,-0.6,0.45,1.5,0.0])*dia
+        romsur = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='surrogate')
+        romsemi = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='semi')
+        np.testing.assert_allclose(romsur,romsemi,atol=wake_surrogate().err_max)
+
+    def test_registry(self):
+
+        # Coefficient sets kept once by content with the EMG parameters of all of the sets compared to the Fortran
+        coef = coef_val()
+        self.assertIs(coef_val(),coef)
+        self.assertEqual(register_coef([np.array(c) for c in coef]),coef_key(coef))
+
+        refit = tuple(c*1.01 for c in coef)
+        key = register_coef(refit)
+        self.assertNotEqual(key,coef_key(coef))
+        self.assertIs(coef_val(),coef)
+
+        tsr = np.array([1.5,3.0,4.5,7.0])
+        sol = np.array([[0.15],[0.5],[1.0]])
+        for cset in [coef,refit]:
+            param = parameterval(tsr,sol,cset)
+            self.assertEqual(param.shape,(10,3,4))
+            for k in range(10):
+                for i in range(3):
+                    for j in range(4):
+                        self.assertAlmostEqual(param[k,i,j],kernels.parameterval(tsr[j],sol[i,0],cset[k]),places=12)
+        self.assertIs(parameterval(4.5,0.24),parameterval(4.5,0.24))
+
+        # Sets looked up by key in the wake model routines (the caches are keyed on the content of the set)
+        self.assertIs(get_coef(coef_key(coef)),coef)
+        np.testing.assert_array_equal(get_coef(key),refit)
+        self.assertRaises(KeyError,get_coef,coef_key(tuple(c*1.02 for c in coef)))
+        self.assertIs(parameterval(4.5,0.24,key),parameterval(4.5,0.24,refit))
+        self.assertIs(parameterval(4.5,0.24,coef_key(coef)),parameterval(4.5,0.24))
+
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        x = np.array([2.0,6.0])*dia
+        y = np.array([0.45,-0.2])*dia
+        self.assertIs(wake_source(dia,rot,chord,B,velf,40,40,coef=key),wake_source(dia,rot,chord,B,velf,40,40,coef=[np.array(c) for c in refit]))
+        self.assertIsNot(wake_source(dia,rot,chord,B,velf,40,40,coef=key),wake_source(dia,rot,chord,B,velf,40,40))
+
+        velkey = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',m=40,n=40,coef=key)
+        velref = kernels.vel_field_mult(0.0,0.0,x,y,dia,rot,chord,B,velf,*(refit+(40,40,1)))
+        np.testing.assert_allclose(velkey,velref,atol=1e-12)
+        self.assertTrue(np.all(np.abs(velkey[0] - velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',m=40,n=40)[0]) > 1e-4))
+
+        velkey = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='gskr',coef=key)
+        velref = kernels.vel_gskr(x,y,dia,*parameterval(4.5,0.24,refit))[:2]
+        np.testing.assert_allclose(velkey,np.array(velref)*rot/(2.*np.pi*velf),rtol=1e-10)
+
+        xt = np.array([0.0,0.0])
+        yt = np.array([-2.0,2.0])
+        ovkey = overlap(36,xt,yt,np.array([dia,dia]),np.array([rot,rot]),chord,B,4.0,0.0,dia,velf,False,integration='simp',coef=key)
+        ovref = overlap(36,xt,yt,np.array([dia,dia]),np.array([rot,rot]),chord,B,4.0,0.0,dia,velf,False,integration='simp',coef=refit)
+        np.testing.assert_array_equal(ovkey,ovref)
+
+    def test_gskr(self):
+
+        # Native adaptive Gauss-Kronrod integration compared to Simpson's rule away from the wake
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        x = np.array([-2.0,12.0,25.0])*dia
+        y = np.array([0.1,3.0,0.5])*dia
+
+        romgskr = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+        romsimp = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='simp')
+        np.testing.assert_allclose(romgskr,romsimp,atol=1e-7)
+
+    @fortran
+    def test_sym(self):
+
+        # Simpson's rule folded about the wake centerline compared to the full Simpson's rule (at a single point and
+        # from the wake source)
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        x = np.array([0.75,1.0,3.0,6.0,-2.0,12.0,9.12])*dia
+        y = np.array([0.0,0.3,-0.6,0.52,0.1,3.0,-0.53])*dia
+        coef = coef_val()
+
+        velsym = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='sym')
+        for i in range(np.size(x)):
+            velfull = kernels.vel_field(0.0,0.0,x[i],y[i],dia,rot,chord,B,velf,*(coef+(220,200,1)))
+            np.testing.assert_allclose(velsym[:,i],velfull,rtol=1e-9,atol=1e-12)
+        velsimp = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind')
+        np.testing.assert_allclose(velsym,velsimp,rtol=1e-9,atol=1e-12)
+        velsimp = kernels.vel_field_mult(0.0,0.0,x,y,dia,rot,chord,B,velf,*(coef+(220,200,1)))
+        np.testing.assert_allclose(velsym,velsimp,rtol=1e-9,atol=1e-12)
+
+        for n in [198,202]:
+            self.assertRaises(ValueError,velocity_field,0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='sym',n=n)
+
+    def test_kernel(self):
+
+        # Tabulated EMG kernel compared to the EMG distribution from SciPy's erfc and erfcx across the TSR and
+        # solidity range
+        def emgterm(y,loc,spr,skw):
+            u = (loc - y)/spr
+            z = (loc + skw*spr**2 - y)/(np.sqrt(2.)*spr)
+            a = skw/2.*(2.*loc + skw*spr**2 - 2.*y)
+            return np.where(z >= 0.,np.exp(-u**2/2.)*erfcx(np.fabs(z)),np.exp(np.where(z < 0.,a,0.))*erfc(-np.fabs(z)))
+
+        yd = np.linspace(-1.0,1.0,401)
+        coef = coef_val()
+        emg_kernel('tab')
+        for tsr in [1.5,3.0,4.5,7.0]:
+            for sol in [0.15,0.5,1.0]:
+                par = [kernels.parameterval(tsr,sol,c) for c in coef]
+                emg = kernels.emgclamp(*par)
+                for xd in [0.0,2.0,8.0,20.0]:
+                    loc,spr,skw,scl = kernels.emgcolumn(xd,1.0,*emg)
+                    gamtab = kernels.vorticity_column(yd,loc,spr,skw,scl)
+                    gam = scl*skw/2.*(emgterm(yd,loc,spr,skw) - emgterm(-yd,loc,spr,skw))
+                    np.testing.assert_allclose(gamtab,gam,rtol=0.,atol=1e-10*np.fabs(scl*skw))
+        emg_kernel('exact')
+
+    @fortran
+    def test_kernel_default(self):
+
+        # the exact kernel is selected before emg_kernel is first called (in a fresh interpreter)
+        ktab = subprocess.check_output([sys.executable,'-c','import _vawtwake; print(int(_vawtwake.emgkernel.ktab))'])
+        self.assertEqual(int(ktab),0)
+
+    @fortran
+    def test_semi(self):
+
+        # Semi-analytic integration compared to Gauss-Kronrod integration
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        x = np.array([0.75,1.0,3.0,6.0,-2.0,12.0])*dia
+        y = np.array([0.0,0.3,-0.6,0.52,0.1,3.0])*dia
+
+        romsemi = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='semi')
+        for i in range(np.size(x)):
+            romgskr = velocity_field(0.0,0.0,x[i],y[i],velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+            np.testing.assert_allclose(romsemi[:,i],romgskr,atol=5e-3)
+
+    @fortran
+    def test_graded(self):
+
+        # Graded Simpson's rule integration compared to Gauss-Kronrod integration away from the shear layers
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        x = np.array([-2.0,12.0,25.0,2.0])*dia
+        y = np.array([0.1,3.0,0.5,0.0])*dia
+
+        romgraded = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='graded')
+        for i in range(np.size(x)):
+            romgskr = velocity_field(0.0,0.0,x[i],y[i],velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+            np.testing.assert_allclose(romgraded[:,i],romgskr,atol=1e-4)
+
+    @fortran
+    def test_gauss(self):
+
+        # Composite Gauss-Legendre integration compared to Gauss-Kronrod integration away from the wake
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        x = np.array([-2.0,12.0,25.0,-1.0])*dia
+        y = np.array([0.1,3.0,0.5,1.5])*dia
+
+        romgauss = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='gauss',panels=(12,10),order=8)
+        for i in range(np.size(x)):
+            romgskr = velocity_field(0.0,0.0,x[i],y[i],velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+            np.testing.assert_allclose(romgauss[:,i],romgskr,atol=1e-4)
+
+    @fortran
+    def test_subtract(self):
+
+        # Singularity-subtracted integration on a coarse grid compared to Gauss-Kronrod integration inside the wake
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        x = np.array([1.0,3.0,6.0,9.12])*dia
+        y = np.array([0.3,-0.6,0.52,0.53])*dia
+
+        romgauss = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='gauss',panels=(24,20),order=8)
+        for i in range(np.size(x)):
+            romgskr = velocity_field(0.0,0.0,x[i],y[i],velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+            np.testing.assert_allclose(romgauss[:,i],romgskr,atol=1e-3)
+
+    def test_source_subtract(self):
+
+        # Wake sources (Simpson's Rule for many points) with the singularity subtraction compared to Gauss-Kronrod
+        # integration inside the wake, and to the single-point integration at the same divisions
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        coef = coef_val()
+        x = np.array([1.2,1.2,2.5,2.5,6.0,-1.0])*dia
+        y = np.array([0.45,-0.45,0.55,-0.55,0.52,0.3])*dia
+
+        romsimp = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind')
+        romsingle = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',precision='single')
+        velxm,velym = kernels.vel_field_mult(0.0,0.0,x,y,dia,rot,chord,B,velf,*(coef + (220,200,1)))
+        for i in range(np.size(x)):
+            romgskr = velocity_field(0.0,0.0,x[i],y[i],velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+            np.testing.assert_allclose(romsimp[:,i],romgskr,atol=2e-3)
+            np.testing.assert_allclose(romsingle[:,i],romsimp[:,i],atol=1e-5)
+            velx,vely = kernels.vel_field(0.0,0.0,x[i],y[i],dia,rot,chord,B,velf,*(coef + (220,200,1)))
+            np.testing.assert_allclose([velxm[i],velym[i]],[velx,vely],atol=1e-12)
+            np.testing.assert_allclose(romsimp[:,i],[velx,vely],atol=1e-12)
+
+        # points around a turbine in the wake, with direct summation and the tree code
+        xt = np.array([0.0])
+        yt = np.array([0.0])
+        diat = np.array([dia])
+        rott = np.array([rot])
+        for (x0,y0) in [(1.2,0.45),(2.5,-0.55),(5.0,0.5)]:
+            velgskr = np.array(overlap(36,xt,yt,diat,rott,chord,B,x0*dia,y0*dia,dia,velf,True,integration='gskr'))
+            for tol in [0.,1e-6]:
+                velsimp = np.array(overlap(36,xt,yt,diat,rott,chord,B,x0*dia,y0*dia,dia,velf,True,integration='simp',tol=tol))
+                np.testing.assert_allclose(velsimp/velf,velgskr/velf,atol=2e-3)
+
+    @fortran
+    def test_tree(self):
+
+        # Tree code of the wake source compared to direct summation at scattered points (within its tolerance)
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        rng = np.random.RandomState(3)
+        x = rng.uniform(-3.0,25.0,10000)*dia
+        y = rng.uniform(-4.0,4.0,10000)*dia
+
+        source = wake_source(dia,rot,chord,B,velf)
+        velx,vely = source.velocity(x,y,0.)
+        vmax = np.max(np.sqrt(velx**2 + vely**2))
+        for tol in [1e-3,1e-6]:
+            velxt,velyt = source.velocity(x,y,tol)
+            self.assertLessEqual(np.max(np.sqrt((velxt - velx)**2 + (velyt - vely)**2)),tol*vmax)
+
+    @fortran
+    def test_adapt(self):
+
+        # Adaptive Simpson's rule integration compared to Gauss-Kronrod integration away from the wake
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        x = np.array([-2.0,12.0,25.0,-1.0])*dia
+        y = np.array([0.1,3.0,0.5,1.5])*dia
+
+        romadapt,info = velocity_field(0.0,0.0,x,y,velf,dia,rot,chord,B,veltype='ind',integration='adapt',tol=1e-4,full_output=True)
+        for i in range(np.size(x)):
+            romgskr = velocity_field(0.0,0.0,x[i],y[i],velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+            np.testing.assert_allclose(romadapt[:,i],romgskr,atol=1e-4)
+        self.assertTrue(np.all(info['err'] < 1e-4))
+        self.assertTrue(np.sum(info['neval']) < np.size(x)*221*201)
+
+    def test_grid(self):
+
+        # Velocity map calculated by FFT convolution compared to Gauss-Kronrod integration
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        xp = np.linspace(-1.0,9.0,41)*dia
+        yp = np.linspace(-2.0,2.0,33)*dia
+
+        romgrid = velocity_grid(0.0,0.0,xp,yp,velf,dia,rot,chord,B,veltype='ind')
+        self.assertEqual(romgrid.shape,(2,np.size(yp),np.size(xp)))
+        for (i,j) in [(10,4),(14,8),(20,20),(24,30),(16,12)]:
+            romgskr = velocity_field(0.0,0.0,xp[j],yp[i],velf,dia,rot,chord,B,veltype='ind',integration='gskr')
+            np.testing.assert_allclose(romgrid[:,i,j],romgskr,atol=1e-2)
+
+        # On a grid of the trapezoidal rule nodes (spacing shortened by a rounding error so the grid is not
+        # refined) the convolution is the trapezoidal rule at the same nodes; outside the wake it matches the
+        # direct sum, which would differ by a grid misaligned by a fraction of a cell
+        m = 40
+        n = 32
+        source = wake_source(dia,rot,chord,B,velf,m,n,2)
+        xb = source.xg[-1]
+        xp = np.arange(-8,49)*(xb/m)*(1. - 1e-14)
+        yp = np.arange(-24,25)*(2.*dia/n)*(1. - 1e-14)
+        romgrid = velocity_grid(0.0,0.0,xp,yp,velf,dia,rot,chord,B,veltype='ind',m=m,n=n)
+        X,Y = np.meshgrid(xp,yp)
+        out = (X < -1e-9) | (X > xb + 1e-9) | (np.fabs(Y) > dia + 1e-9)
+        velx,vely = source.velocity(X[out],Y[out])
+        np.testing.assert_allclose(romgrid[0][out],velx,atol=1e-12)
+        np.testing.assert_allclose(romgrid[1][out],vely,atol=1e-12)
+
+    def test_jacobian(self):
+
+        # Derivatives with respect to the point and turbine positions compared to central differences
+        dia = 1.0
+        velf = 9.308422677
+        rot = 4.5*velf/(dia/2.)
+        chord = 0.06
+        B = 2
+        h = 1e-5
+        x = np.array([-1.0,0.5,2.0,6.0,15.0])*dia
+        y = np.array([0.2,-0.45,0.5,1.5,-0.1])*dia
+
+        vel,jac0,jact = velocity_jacobian(0.3,0.1,x,y,velf,dia,rot,chord,B)
+        self.assertEqual(jac0.shape,(2,2,np.size(x)))
+        vfield = lambda xt,yt,x0,y0: velocity_field(xt,yt,x0,y0,velf,dia,rot,chord,B,veltype='ind')
+        np.testing.assert_allclose(vel,vfield(0.3,0.1,x,y),atol=1e-14)
+        np.testing.assert_allclose(jac0[:,0],(vfield(0.3,0.1,x+h,y) - vfield(0.3,0.1,x-h,y))/(2.*h),atol=1e-6)
+        np.testing.assert_allclose(jac0[:,1],(vfield(0.3,0.1,x,y+h) - vfield(0.3,0.1,x,y-h))/(2.*h),atol=1e-6)
+        np.testing.assert_allclose(jact[:,0],(vfield(0.3+h,0.1,x,y) - vfield(0.3-h,0.1,x,y))/(2.*h),atol=1e-6)
+        np.testing.assert_allclose(jact[:,1],(vfield(0.3,0.1+h,x,y) - vfield(0.3,0.1-h,x,y))/(2.*h),atol=1e-6)
+
+        xt = np.array([0.0,2.0,0.0])*dia
+        yt = np.array([0.0,0.8,-1.5])*dia
+        diat = np.ones(3)*dia
+        rott = np.array([rot,-rot,1.1*rot])
+        vover = lambda xt,yt,x0,y0: np.array(overlap(1,xt,yt,diat,rott,chord,B,x0,y0,dia,velf,True,integration='simp'))
+        velx,vely,jac0,jact = overlap_jacobian(1,xt,yt,diat,rott,chord,B,5.0,0.5,dia,velf,True)
+        np.testing.assert_allclose([velx,vely],vover(xt,yt,5.0,0.5),atol=1e-12)
+        np.testing.assert_allclose(jac0[:,0],(vover(xt,yt,5.0+h,0.5) - vover(xt,yt,5.0-h,0.5))/(2.*h),atol=1e-5)
+        np.testing.assert_allclose(jac0[:,1],(vover(xt,yt,5.0,0.5+h) - vover(xt,yt,5.0,0.5-h))/(2.*h),atol=1e-5)
+        for j in range(3):
+            dxt = np.zeros(3)
+            dxt[j] = h
+            np.testing.assert_allclose(jact[:,0,j],(vover(xt+dxt,yt,5.0,0.5) - vover(xt-dxt,yt,5.0,0.5))/(2.*h),atol=1e-5)
+            np.testing.assert_allclose(jact[:,1,j],(vover(xt,yt+dxt,5.0,0.5) - vover(xt,yt-dxt,5.0,0.5))/(2.*h),atol=1e-5)
+
+
+@unittest.skipIf(_vawtwake is None,'the NumPy backend is already selected')
+class TestNumpyBackend(Testwakemodel):
+    # the tests of the wake model routines repeated with the NumPy backend (as used without the Fortran build)
+    def setUp(self):
+        if getattr(getattr(self,self._testMethodName),'fortran',False):
+            self.skipTest('uses routines only available in _vawtwake')
+        self.backend = set_backend('numpy')
+
+    def tearDown(self):
+        if hasattr(self,'backend'):
+            set_backend(self.backend)
+
 if __name__ == '__main__':
     unittest.main(exit=False)
         
\ No newline at end of file
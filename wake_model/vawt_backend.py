@@ -0,0 +1,95 @@
+"""
+Backends of the Parameterized VAWT Wake Model routines
+
+'fortran': the compiled module _vawtwake (VAWT_Wake_Model.f90 built with f2py)
+'numpy': the vectorized NumPy module _vawtnumpy (no Fortran compiler needed)
+
+The Fortran backend is selected when _vawtwake can be imported and the NumPy backend otherwise; the routines are
+called through kernels (e.g. kernels.vel_source), which forwards each call to the selected backend, so the backend
+can be changed at runtime with set_backend (e.g. to benchmark the two)
+"""
+
+import _vawtnumpy
+
+try:
+    import _vawtwake
+except ImportError:
+    _vawtwake = None
+
+_backends = {'numpy':_vawtnumpy}
+if _vawtwake is not None:
+    _backends['fortran'] = _vawtwake
+
+
+class Kernels(object):
+    """
+    The routines of the selected backend (attributes are looked up in the backend module on each call)
+
+    Attributes
+    ----------
+    backend : string
+        name of the selected backend ('fortran' or 'numpy')
+    """
+    def __init__(self):
+        if 'fortran' in _backends:
+            self.backend = 'fortran'
+        else:
+            self.backend = 'numpy'
+
+    def __getattr__(self,name):
+        try:
+            return getattr(_backends[self.backend],name)
+        except AttributeError:
+            raise AttributeError("%s is not available in the %s backend (build _vawtwake for the Fortran routines)" % (name,self.backend))
+
+
+kernels = Kernels()
+
+
+def backends():
+    """
+    Returning the available backends
+
+    Returns
+    ----------
+    names : list
+        names of the backends that can be selected ('numpy', and 'fortran' when _vawtwake has been built)
+    """
+    return sorted(_backends)
+
+
+def get_backend():
+    """
+    Returning the selected backend
+
+    Returns
+    ----------
+    name : string
+        name of the selected backend ('fortran' or 'numpy')
+    """
+    return kernels.backend
+
+
+def set_backend(name):
+    """
+    Selecting the backend of the wake model routines
+
+    Parameters
+    ----------
+    name : string
+        'fortran' (the compiled module _vawtwake) or 'numpy' (the vectorized NumPy routines)
+
+    Returns
+    ----------
+    previous : string
+        name of the previously selected backend
+    """
+    if name not in ['fortran','numpy']:
+        raise ValueError("backend must be 'fortran' or 'numpy'")
+    if name not in _backends:
+        raise ValueError("the fortran backend is not available (_vawtwake has not been built)")
+
+    previous = kernels.backend
+    kernels.backend = name
+
+    return previous